@@ -0,0 +1,324 @@
+# coding: utf-8
+
+# Modo batch: roda o mesmo pipeline do relatorio.py sem Streamlit e grava os
+# resultados em disco. O painel carrega esses artefatos quando existem.
+#
+# Exemplo:
+#   python -m artefatos build --uf PB --ano 2024 --ultimo-mes 11 --saida artefatos/
+#   python -m artefatos build --sih dados/sintetico/sih --leitos dados/sintetico/hospitais_leitos.csv --cid10 dados/sintetico/cid10 \
+#       --saida artefatos/sintetico
+#
+# O build também grava a tabela da CID-10 (cid10.CAMINHO_TABELA) a partir dos
+# CSVs do DATASUS quando ela ainda não existe (ou com --atualizar).
+#   python -m artefatos build --uf PE --ano 2024 --sih dados/sih --saida artefatos/PE-2024
+#   python -m artefatos build --uf PE --ano 2024 --sih dados/sih --lotes 500000 --saida artefatos/PE-2024
+#
+# Quando sai uma nova competência do SIH, `atualizar` processa só aquele mês e
+# soma o resultado ao estado incremental que o `build` grava em <saida>/estado
+# (ver incremental.py):
+#   python -m artefatos build --uf PB --ano 2024 --ultimo-mes 11 --sih dados/sih --saida artefatos/PB-2024
+#   python -m artefatos atualizar --uf PB --ano 2024 --mes 12 --sih dados/sih --saida artefatos/PB-2024
+#
+# `limpar-cache` apaga o cache local das fontes (todas ou só as de --url) e
+# as figuras renderizadas pelo painel (figuras.DIR_FIGURAS):
+#   python -m artefatos limpar-cache
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import atributos
+import cid10
+import cubos
+import figuras
+import incremental
+import modelos
+import motor_duckdb
+import pipeline
+from desempenho import Medicoes
+from hospitais import DimensaoHospitais
+from registro_modelos import RegistroModelos
+from carregamento import (DIR_CACHE, URL_HOSPITAL_E_LEITOS_BR, URL_SIH_PB_2024, carregar_hospitais_leitos, carregar_sih, invalidar_cache,
+                          ler_sih_particionado)
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+DIR_MODELOS = 'modelos'
+DIR_ESTADO = 'estado'
+TABELAS = ['df_ocupacao_diaria', 'df_stats', 'contagem_tipos', 'cids_freq_hospitais', 'cids_top_hospitais', 'internacoes_por_capitulo', 'correlacoes',
+           'cubo_hospital_mes', 'cubo_cids', 'censo_especialidade']
+# gravadas só quando pedidas (build --avaliar)
+TABELAS_OPCIONAIS = ['avaliacao_modelos']
+
+
+def carregar_hospitais(uf, atualizar=False, medicoes=None, leitos=URL_HOSPITAL_E_LEITOS_BR):
+    # `leitos`: URL ou caminho local do CSV de Hospitais e Leitos
+    etapa = (medicoes or Medicoes()).executar
+    hospital_e_leitos_br = etapa('ler_hospitais_leitos', carregar_hospitais_leitos, leitos, atualizar=atualizar)
+    return etapa('dimensao_hospitais', lambda: DimensaoHospitais(pipeline.limpar_hospitais_leitos(hospital_e_leitos_br, uf=uf)))
+
+
+def carregar_entradas(uf, ano, sih_dir=None, ultimo_mes_cmpt=pipeline.ULTIMO_MES_CMPT, atualizar=False, medicoes=None,
+                      leitos=URL_HOSPITAL_E_LEITOS_BR):
+    etapa = (medicoes or Medicoes()).executar
+    hospitais = carregar_hospitais(uf, atualizar, medicoes, leitos)
+
+    if sih_dir is not None:
+        sih = etapa('ler_sih', lambda: ler_sih_particionado(sih_dir, ufs=[uf], anos=[ano]).drop(columns=['uf', 'ano', 'mes']))
+    elif (uf, ano) == ('PB', 2024):
+        sih = etapa('ler_sih', carregar_sih, URL_SIH_PB_2024, atualizar=atualizar)
+    else:
+        raise ValueError(f'Sem --sih só há dados publicados para PB/2024 (pedido: {uf}/{ano})')
+    sih = etapa('limpar_sih', pipeline.limpar_sih, sih, ultimo_mes_cmpt=ultimo_mes_cmpt)
+    return hospitais, sih
+
+
+def _resumo_modelo(resultado):
+    # coeficientes e métricas em formato JSON, para quem não usa Python
+    modelo = resultado['modelo']
+    resumo = {'tipo': type(modelo).__name__, 'intercept': np.ravel(modelo.intercept_).tolist()}
+    if 'coeficientes' in resultado:
+        resumo['coeficientes'] = dict(zip(resultado['coeficientes']['Variável'], resultado['coeficientes']['Coeficiente']))
+        resumo['relatorio'] = resultado['relatorio'].to_dict(orient='index')
+    else:
+        resumo['coeficientes'] = modelo.coef_.ravel().tolist()
+        resumo['rmse'] = float(resultado['rmse'])
+        resumo['r2'] = float(resultado['r2'])
+    return resumo
+
+
+def _gravar_tabela(tabela, saida, nome):
+    if isinstance(tabela, pd.Series):
+        tabela = tabela.to_frame()
+    tabela.to_parquet(os.path.join(saida, f'{nome}.parquet'))
+
+
+def gravar(resultados, saida, metadados):
+    os.makedirs(saida, exist_ok=True)
+    # o manifesto é gravado por último: sem ele o diretório não é considerado completo
+    caminho_manifesto = os.path.join(saida, ARQUIVO_MANIFESTO)
+    if os.path.exists(caminho_manifesto):
+        os.remove(caminho_manifesto)
+
+    tabelas = TABELAS + [nome for nome in TABELAS_OPCIONAIS if nome in resultados]
+    for nome in tabelas:
+        _gravar_tabela(resultados[nome], saida, nome)
+    for nome in set(TABELAS_OPCIONAIS) - set(tabelas):
+        # não deixa a tabela de um build anterior passar por atual
+        if os.path.exists(os.path.join(saida, f'{nome}.parquet')):
+            os.remove(os.path.join(saida, f'{nome}.parquet'))
+    # tabela de leitos já limpa, para remontar a dimensão de hospitais usada pelos filtros
+    _gravar_tabela(resultados['hospitais'].tabela, saida, 'hospitais_leitos')
+
+    # modelos ajustados no registro, pela impressão dos dados de treino (ver registro_modelos.py)
+    registro = RegistroModelos(os.path.join(saida, DIR_MODELOS))
+    for nome, resultado in resultados['modelos'].items():
+        registro.registrar(nome, resultado, metadados['impressao'], uf=metadados['uf'], ano=metadados['ano'])
+    with open(os.path.join(saida, 'modelos.json'), 'w', encoding='utf-8') as f:
+        json.dump({nome: _resumo_modelo(r) for nome, r in resultados['modelos'].items()}, f, indent=2, ensure_ascii=False, default=float)
+    # vocabulário das codificações esparsas, para pontuar novas AIHs com as mesmas colunas
+    for nome, resultado in resultados['modelos'].items():
+        if 'codificador' in resultado:
+            resultado['codificador'].salvar_vocabulario(os.path.join(saida, f'vocabulario_{nome}.json'))
+
+    manifesto = {
+        **metadados,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'tabelas': tabelas,
+        'modelos': list(resultados['modelos']),
+    }
+    with open(caminho_manifesto, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+
+def existem(diretorio):
+    return os.path.exists(os.path.join(diretorio, ARQUIVO_MANIFESTO))
+
+
+def ler_manifesto(diretorio):
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def carregar(diretorio):
+    # leitura dos artefatos gravados por `build`, no mesmo formato de pipeline.executar()
+    manifesto = ler_manifesto(diretorio)
+    resultados = {nome: pd.read_parquet(os.path.join(diretorio, f'{nome}.parquet')) for nome in manifesto['tabelas']}
+    resultados['contagem_tipos'] = resultados['contagem_tipos'].iloc[:, 0]
+    resultados['hospitais'] = DimensaoHospitais(pd.read_parquet(os.path.join(diretorio, 'hospitais_leitos.parquet')))
+    registro = RegistroModelos(os.path.join(diretorio, DIR_MODELOS))
+    resultados['modelos'] = {nome: registro.carregar(nome, manifesto['impressao']) for nome in manifesto['modelos']}
+    return resultados
+
+
+def construir(uf, ano, saida, sih_dir=None, ultimo_mes_cmpt=pipeline.ULTIMO_MES_CMPT, atualizar=False, tamanho_lote=None,
+              rastrear_memoria=False, motor=motor_duckdb.MOTOR_PADRAO, avaliar=None, balanceamento='smote', leitos=URL_HOSPITAL_E_LEITOS_BR,
+              fonte_cid10=cid10.URL_CID10_DATASUS):
+    # além dos artefatos, grava desempenho.json/csv com tempo, CPU, memória e linhas de cada etapa;
+    # `avaliar` (argumentos de avaliacao.avaliar) inclui a validação cruzada dos modelos
+    medicoes = Medicoes(rastrear_memoria=rastrear_memoria)
+    with medicoes.etapa('cid10'):
+        # descrições das tabelas de CIDs, aqui e no painel (que as refaz a cada filtro)
+        cid10.preparar_tabela(fonte_cid10, atualizar=atualizar)
+    lotes_sih = None
+    if sih_dir is not None and tamanho_lote:
+        # em lotes o SIH nunca é carregado inteiro (ver pipeline.executar)
+        hospitais, sih = carregar_hospitais(uf, atualizar, medicoes, leitos), None
+
+        def lotes_sih():
+            return atributos.lotes_sih(sih_dir, tamanho_lote, ufs=[uf], anos=[ano])
+    else:
+        hospitais, sih = carregar_entradas(uf, ano, sih_dir, ultimo_mes_cmpt, atualizar, medicoes, leitos)
+    # com --sih o motor duckdb lê o próprio dataset particionado; sem ele, o SIH já carregado
+    motor = motor_duckdb.criar_motor(motor, sih if sih_dir is None else sih_dir, ufs=[uf], anos=[ano], ultimo_mes_cmpt=ultimo_mes_cmpt)
+    resultados = pipeline.executar(sih, hospitais, ano=ano, lotes_sih=lotes_sih, ultimo_mes_cmpt=ultimo_mes_cmpt, medicoes=medicoes, motor=motor,
+                                   avaliar=avaliar, balanceamento=balanceamento)
+    competencias = incremental.competencias_ate(ano, ultimo_mes_cmpt)
+    with medicoes.etapa('estado_incremental'):
+        # ponto de partida do `atualizar`: as mesmas AIHs e competências dos artefatos
+        estado = resultados.get('estado')
+        if estado is None:
+            lotes = [sih] if sih is not None else (pipeline.limpar_sih(lote, ultimo_mes_cmpt=ultimo_mes_cmpt) for lote in lotes_sih())
+            estado = incremental.estado_inicial(lotes, inicio=ano * 10000 + 101, competencias=competencias)
+        incremental.gravar_estado(estado, os.path.join(saida, DIR_ESTADO))
+    with medicoes.etapa('gravar'):
+        gravar(resultados, saida, {
+            'uf': uf,
+            'ano': ano,
+            'ultimo_mes_cmpt': ultimo_mes_cmpt,
+            'competencias': competencias,
+            # sem o SIH inteiro, a impressão vem das somas que o resumem
+            'impressao': (pipeline.impressao_digital(hospitais.tabela, sih) if sih is not None else
+                          pipeline.impressao_digital(hospitais.tabela, estado['grade'], resultados['cubo_cids'])),
+        })
+    medicoes.gravar(os.path.join(saida, 'desempenho'))
+    return resultados
+
+
+def atualizar_mes(uf, ano, mes, sih_dir, saida, dir_estado=None, atualizar=False, leitos=URL_HOSPITAL_E_LEITOS_BR):
+    # processa só a competência ano/mes e refaz ocupação, estatísticas, correlações,
+    # o censo por especialidade e os cubos dos filtros; as demais tabelas de CIDs e
+    # os modelos continuam sendo os do último `build`. Sem `dir_estado`, usa o
+    # estado gravado pelo `build` em <saida>/estado.
+    dir_estado = dir_estado or os.path.join(saida, DIR_ESTADO)
+    competencia = f'{ano}-{mes:02d}'
+    estado = incremental.carregar_estado(dir_estado, inicio=ano * 10000 + 101)
+    manifesto = ler_manifesto(saida) if existem(saida) else None
+    if manifesto is not None:
+        # um estado que não cobre os artefatos trocaria a ocupação do ano pela de um mês só
+        if manifesto['uf'] != uf or manifesto['ano'] != ano:
+            raise ValueError(f"Artefatos em {saida} são de {manifesto['uf']}/{manifesto['ano']}, não de {uf}/{ano}")
+        faltando = sorted(set(manifesto.get('competencias', incremental.competencias_ate(ano, manifesto['ultimo_mes_cmpt'])))
+                          - set(estado['competencias']))
+        if faltando:
+            raise ValueError(f"Estado em {dir_estado} não cobre as competências {', '.join(faltando)} dos artefatos em {saida}; "
+                             f"rode o build de novo (ele grava o estado em {os.path.join(saida, DIR_ESTADO)})")
+
+    hospitais = carregar_hospitais(uf, atualizar, leitos=leitos)
+    sih_mes = ler_sih_particionado(sih_dir, ufs=[uf], anos=[ano], meses=[mes]).drop(columns=['uf', 'ano', 'mes'])
+    sih_mes = pipeline.limpar_sih(sih_mes, ultimo_mes_cmpt=mes)
+    if competencia in estado['competencias']:
+        # competência já somada: só a grade diária e os leitos são refeitos
+        sih_mes = sih_mes.iloc[:0]
+
+    estado = incremental.atualizar(estado, sih_mes, competencia)
+    incremental.gravar_estado(estado, dir_estado)
+
+    df_ocupacao_diaria, df_stats = pipeline.montar_ocupacao_e_stats(estado, hospitais)
+    os.makedirs(saida, exist_ok=True)
+    _gravar_tabela(df_ocupacao_diaria, saida, 'df_ocupacao_diaria')
+    _gravar_tabela(df_stats, saida, 'df_stats')
+    _gravar_tabela(pipeline.correlacoes(df_stats), saida, 'correlacoes')
+    _gravar_tabela(hospitais.tabela, saida, 'hospitais_leitos')
+
+    if manifesto is not None:
+        # cubos e censo do último `build` recebem as AIHs de cada competência uma única vez (as mesmas do estado)
+        sih_periodo = pipeline.filtrar_periodo(sih_mes, inicio_mes=ano * 100 + 1)
+        cubo_hospital_mes = pd.read_parquet(os.path.join(saida, 'cubo_hospital_mes.parquet'))
+        cubo_cids = pd.read_parquet(os.path.join(saida, 'cubo_cids.parquet'))
+        censo = pd.read_parquet(os.path.join(saida, 'censo_especialidade.parquet'))
+        _gravar_tabela(cubos.atualizar_cubo_hospital_mes(cubo_hospital_mes, df_ocupacao_diaria, sih_periodo, hospitais), saida, 'cubo_hospital_mes')
+        _gravar_tabela(cubos.atualizar_cubo_cids(cubo_cids, sih_periodo), saida, 'cubo_cids')
+        _gravar_tabela(pipeline.atualizar_censo_especialidade(censo, sih_mes, df_ocupacao_diaria, inicio=ano * 10000 + 101),
+                       saida, 'censo_especialidade')
+
+        manifesto['competencias'] = estado['competencias']
+        manifesto['ultimo_mes_cmpt'] = max(manifesto['ultimo_mes_cmpt'], mes)
+        manifesto['gerado_em'] = datetime.now().isoformat(timespec='seconds')
+        with open(os.path.join(saida, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    return df_ocupacao_diaria, df_stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pré-calcula os artefatos do relatório de superlotação.')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    build = comandos.add_parser('build', help='roda o pipeline e grava os artefatos')
+    build.add_argument('--uf', default='PB')
+    build.add_argument('--ano', '--year', type=int, default=2024)
+    build.add_argument('--ultimo-mes', type=int, default=pipeline.ULTIMO_MES_CMPT,
+                       help=f'último mês de competência (MES_CMPT) considerado (padrão: {pipeline.ULTIMO_MES_CMPT}, o mesmo do painel)')
+    build.add_argument('--sih', default=None,
+                       help='dataset particionado gerado por extrai-dados-pysus.py')
+    build.add_argument('--leitos', default=URL_HOSPITAL_E_LEITOS_BR,
+                       help='URL ou caminho local do CSV de Hospitais e Leitos (padrão: arquivo do OpenDataSUS)')
+    build.add_argument('--cid10', default=cid10.URL_CID10_DATASUS,
+                       help='URL ou caminho do CID10CSV.zip, ou diretório com os CSVs da CID-10 (padrão: arquivo do DATASUS)')
+    build.add_argument('--saida', '--out', default='artefatos')
+    build.add_argument('--lotes', type=int, default=None,
+                       help='com --sih, processa o SIH em lotes de N AIHs, sem carregá-lo inteiro na memória')
+    build.add_argument('--atualizar', action='store_true',
+                       help='baixa novamente as fontes, ignorando o cache')
+    build.add_argument('--perfil-memoria', action='store_true',
+                       help='mede o pico de memória de cada etapa com tracemalloc (mais lento)')
+    build.add_argument('--motor', choices=motor_duckdb.MOTORES, default=motor_duckdb.MOTOR_PADRAO,
+                       help='motor das agregações (padrão: SUPERLOTACAO_MOTOR ou pandas)')
+    build.add_argument('--balanceamento', choices=modelos.BALANCEAMENTOS, default='smote',
+                       help='balanceamento das classes no modelo sem município')
+    build.add_argument('--avaliar', action='store_true',
+                       help='compara os modelos por validação cruzada com busca de hiperparâmetros')
+    build.add_argument('--busca', choices=['grade', 'aleatoria'], default='grade',
+                       help='com --avaliar, grade completa ou candidatos sorteados')
+    build.add_argument('--jobs', type=int, default=-1,
+                       help='com --avaliar, processos em paralelo (padrão: todos os núcleos)')
+
+    atualizar = comandos.add_parser('atualizar', help='soma uma nova competência mensal aos artefatos')
+    atualizar.add_argument('--uf', default='PB')
+    atualizar.add_argument('--ano', '--year', type=int, default=2024)
+    atualizar.add_argument('--mes', type=int, required=True,
+                           help='mês de competência (MES_CMPT) a processar')
+    atualizar.add_argument('--sih', required=True,
+                           help='dataset particionado gerado por extrai-dados-pysus.py')
+    atualizar.add_argument('--estado', default=None,
+                           help='diretório do estado incremental (padrão: <saida>/estado, gravado pelo build)')
+    atualizar.add_argument('--leitos', default=URL_HOSPITAL_E_LEITOS_BR,
+                           help='URL ou caminho local do CSV de Hospitais e Leitos (padrão: arquivo do OpenDataSUS)')
+    atualizar.add_argument('--saida', '--out', default='artefatos')
+    atualizar.add_argument('--atualizar', action='store_true',
+                           help='baixa novamente as fontes, ignorando o cache')
+
+    limpar = comandos.add_parser('limpar-cache', help='apaga o cache local das fontes baixadas e das figuras')
+    limpar.add_argument('--cache', default=DIR_CACHE, help='diretório do cache (padrão: SUPERLOTACAO_CACHE ou cache)')
+    limpar.add_argument('--url', nargs='+', default=None, help='apaga só as tabelas destas URLs')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'limpar-cache':
+        for url in (args.url or [None]):
+            invalidar_cache(url, dir_cache=args.cache)
+        figuras.limpar_cache()
+        print(f'Cache limpo em {args.cache} e {figuras.DIR_FIGURAS}')
+        return
+    if args.comando == 'build':
+        avaliar = {'busca': args.busca, 'n_jobs': args.jobs} if args.avaliar else None
+        construir(args.uf.upper(), args.ano, args.saida, args.sih, args.ultimo_mes, args.atualizar, args.lotes, args.perfil_memoria, args.motor,
+                  avaliar, args.balanceamento, args.leitos, args.cid10)
+    else:
+        atualizar_mes(args.uf.upper(), args.ano, args.mes, args.sih, args.saida, args.estado, args.atualizar, args.leitos)
+    print(f'Artefatos gravados em {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# coding: utf-8
+
+# Montagem das variáveis dos modelos por AIH (o antigo df_combined) sem o
+# merge completo do SIH com df_ocupacao_diaria. A ocupação diária vira um
+# índice ordenado pela chave (id_cnes, data) e cada AIH busca a sua linha
+# com searchsorted. Como a busca é feita linha a linha, o SIH pode ser
+# processado em lotes: a memória fica limitada ao índice mais um lote.
+
+import numpy as np
+import pandas as pd
+
+from carregamento import iterar_sih_particionado
+
+COLUNAS_OCUPACAO = ['DS_TIPO_UNIDADE', 'MUNICIPIO', 'taxa_ocupacao_diaria_pct']
+
+
+def _chave(id_cnes, data):
+    # CNES tem 7 dígitos e data é AAAAMMDD: a chave cabe em um int64
+    return np.asarray(id_cnes, dtype=np.int64) * 100_000_000 + np.asarray(data, dtype=np.int64)
+
+
+def indexar_ocupacao(df_ocupacao_diaria, colunas=COLUNAS_OCUPACAO):
+    # só os dias com taxa de ocupação conhecida, como no dropna do merge original
+    df = df_ocupacao_diaria[df_ocupacao_diaria['taxa_ocupacao_diaria_pct'].notna()]
+    chaves = _chave(df['id_cnes'], df['data'])
+    ordem = np.argsort(chaves, kind='stable')
+    chaves = chaves[ordem]
+    unicas = np.concatenate([[True], chaves[1:] != chaves[:-1]]) if len(chaves) else np.ones(0, dtype=bool)
+    return {
+        'chaves': chaves[unicas],
+        'colunas': {c: df[c].iloc[ordem[unicas]].reset_index(drop=True) for c in colunas},
+    }
+
+
+def juntar_ocupacao(sih, indice):
+    """AIHs de `sih` com as colunas do índice; AIHs sem ocupação no dia são descartadas.
+
+    `sih` precisa das colunas id_cnes e data (ver pipeline.filtrar_periodo).
+    """
+    chaves = indice['chaves']
+    alvo = _chave(sih['id_cnes'], sih['data'])
+    posicao = np.minimum(np.searchsorted(chaves, alvo), max(len(chaves) - 1, 0))
+    encontradas = (chaves[posicao] == alvo) if len(chaves) else np.zeros(len(sih), dtype=bool)
+    posicao = posicao[encontradas]
+    return sih[encontradas].assign(**{
+        c: valores.iloc[posicao].values for c, valores in indice['colunas'].items()
+    })
+
+
+def lotes_sih(fonte, tamanho_lote=500_000, **filtros):
+    # `fonte` é um DataFrame já carregado ou o diretório do dataset particionado
+    if isinstance(fonte, pd.DataFrame):
+        for inicio in range(0, len(fonte), tamanho_lote):
+            yield fonte.iloc[inicio:inicio + tamanho_lote]
+    else:
+        yield from iterar_sih_particionado(fonte, tamanho_lote=tamanho_lote, **filtros)
+
+
+def lotes_de_atributos(lotes, indice, preparar=None):
+    """Gera um DataFrame de atributos por lote do SIH.
+
+    `preparar` é aplicado a cada lote antes da busca no índice, por exemplo
+    limpeza e filtro de período, que também são feitos linha a linha.
+    """
+    for lote in lotes:
+        if preparar is not None:
+            lote = preparar(lote)
+        lote = juntar_ocupacao(lote, indice)
+        if len(lote):
+            yield lote
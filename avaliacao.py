@@ -0,0 +1,210 @@
+# coding: utf-8
+
+# Validação cruzada e busca de hiperparâmetros dos modelos do relatório.
+# Cada par (candidato, dobra) é uma tarefa independente, distribuída entre os
+# núcleos com joblib; o resultado de cada dobra fica em cache (JSON) pela
+# impressão digital dos dados, pelos parâmetros e pela divisão, e uma nova
+# execução só ajusta as dobras que faltam.
+#
+# As dobras das logísticas são agrupadas por hospital (GroupKFold): todas as
+# AIHs de um hospital caem na mesma dobra, e a avaliação mede a previsão para
+# hospitais não vistos no treino.
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn.model_selection as ms
+from joblib import Parallel, delayed
+from scipy.stats import loguniform
+from sklearn.linear_model import LinearRegression, LogisticRegression, Ridge
+from sklearn.metrics import (balanced_accuracy_score, f1_score, mean_absolute_error, mean_squared_error, r2_score,
+                             recall_score, roc_auc_score)
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import modelos
+from carregamento import DIR_CACHE
+
+DIR_AVALIACAO = os.path.join(DIR_CACHE, 'avaliacao')
+
+GRADE_REGRESSAO = [{'modelo': ['linear']}, {'modelo': ['ridge'], 'alpha': [0.1, 1.0, 10.0, 100.0]}]
+DISTRIBUICOES_REGRESSAO = [{'modelo': ['linear']}, {'modelo': ['ridge'], 'alpha': loguniform(1e-2, 1e3)}]
+GRADE_LOGISTICA = {'C': [0.01, 0.1, 1.0, 10.0], 'solver': ['lbfgs', 'saga'], 'class_weight': [None, 'balanced']}
+DISTRIBUICOES_LOGISTICA = {'C': loguniform(1e-3, 1e2), 'solver': ['lbfgs', 'saga'], 'class_weight': [None, 'balanced']}
+
+# mesmas variáveis dos ajustes de pipeline.py; `esparso` usa modelos.CodificadorEsparso
+MODELOS = {
+    'regressao_simples': {
+        'tipo': 'regressao', 'alvo': 'taxa_ocupacao_mean_pct', 'numericas': ['leitos_sus_mean'], 'categoricas': [],
+    },
+    'regressao_multipla': {
+        'tipo': 'regressao', 'alvo': 'taxa_ocupacao_mean_pct',
+        'numericas': ['leitos_sus_mean', 'obitos_mean', 'ocupacao_media_diaria'], 'categoricas': ['tipo_unidade'],
+    },
+    'logistica_sem_municipio': {
+        'tipo': 'classificacao', 'alvo': 'obito', 'agrupar_por': 'id_cnes',
+        'numericas': ['IDADE', 'taxa_ocupacao_diaria_pct'], 'categoricas': ['DS_TIPO_UNIDADE'],
+    },
+    'logistica_com_municipio': {
+        'tipo': 'classificacao', 'alvo': 'obito', 'agrupar_por': 'id_cnes', 'esparso': True,
+        'numericas': ['IDADE', 'taxa_ocupacao_diaria_pct'], 'categoricas': ['MUNICIPIO', 'DS_TIPO_UNIDADE'],
+    },
+}
+
+# métrica usada para ordenar os candidatos; no RMSE, menor é melhor
+METRICA_PRINCIPAL = {'regressao': 'rmse', 'classificacao': 'roc_auc'}
+
+
+def montar_estimador(nome, parametros):
+    # Pipeline (codificação, escala e modelo) de `nome` com os hiperparâmetros do candidato
+    espec = MODELOS[nome]
+    if espec['tipo'] == 'regressao':
+        parametros = dict(parametros)
+        modelo = Ridge(alpha=parametros['alpha']) if parametros.pop('modelo') == 'ridge' else LinearRegression()
+    else:
+        modelo = LogisticRegression(max_iter=1000, random_state=0, **parametros)
+    if espec.get('esparso'):
+        codificador = modelos.CodificadorEsparso(numericas=tuple(espec['numericas']), categoricas=tuple(espec['categoricas']))
+        return Pipeline([('codificador', codificador), ('modelo', modelo)])
+    return Pipeline([
+        ('codificador', modelos.CodificadorDummies(categoricas=tuple(espec['categoricas']))),
+        ('escala', StandardScaler()),
+        ('modelo', modelo),
+    ])
+
+
+def candidatos(nome, busca='grade', n_candidatos=10, semente=0):
+    # 'grade' percorre todas as combinações; 'aleatoria' sorteia n_candidatos
+    regressao = MODELOS[nome]['tipo'] == 'regressao'
+    if busca == 'grade':
+        return list(ms.ParameterGrid(GRADE_REGRESSAO if regressao else GRADE_LOGISTICA))
+    if busca == 'aleatoria':
+        distribuicoes = DISTRIBUICOES_REGRESSAO if regressao else DISTRIBUICOES_LOGISTICA
+        return [{k: float(v) if isinstance(v, np.floating) else v for k, v in c.items()}
+                for c in ms.ParameterSampler(distribuicoes, n_candidatos, random_state=semente)]
+    raise ValueError(f'Busca desconhecida: {busca} (opções: grade, aleatoria)')
+
+
+def dividir(df, nome, dobras=5, semente=0):
+    # índices (treino, teste) de cada dobra
+    espec = MODELOS[nome]
+    if espec.get('agrupar_por'):
+        divisor = ms.GroupKFold(n_splits=dobras)
+        return list(divisor.split(df, groups=df[espec['agrupar_por']].to_numpy()))
+    if espec['tipo'] == 'classificacao':
+        divisor = ms.StratifiedKFold(n_splits=dobras, shuffle=True, random_state=semente)
+        return list(divisor.split(df, df[espec['alvo']].to_numpy()))
+    return list(ms.KFold(n_splits=dobras, shuffle=True, random_state=semente).split(df))
+
+
+def _metricas(tipo, y_teste, estimador, x_teste):
+    if tipo == 'regressao':
+        y_pred = np.ravel(estimador.predict(x_teste))
+        return {
+            'rmse': float(np.sqrt(mean_squared_error(y_teste, y_pred))),
+            'mae': float(mean_absolute_error(y_teste, y_pred)),
+            'r2': float(r2_score(y_teste, y_pred)),
+        }
+    probabilidade = estimador.predict_proba(x_teste)[:, 1]
+    y_pred = (probabilidade >= 0.5).astype(y_teste.dtype)
+    return {
+        # AUC indefinida se a dobra de teste tiver uma só classe
+        'roc_auc': float(roc_auc_score(y_teste, probabilidade)) if len(np.unique(y_teste)) > 1 else np.nan,
+        'acuracia_balanceada': float(balanced_accuracy_score(y_teste, y_pred)),
+        'f1_macro': float(f1_score(y_teste, y_pred, average='macro', zero_division=0)),
+        'recall_obito': float(recall_score(y_teste, y_pred, zero_division=0)),
+    }
+
+
+def _avaliar_dobra(nome, parametros, x, y, treino, teste):
+    inicio = time.perf_counter()
+    estimador = montar_estimador(nome, parametros).fit(x.iloc[treino], y[treino])
+    tempo_ajuste = time.perf_counter() - inicio
+    return {
+        **_metricas(MODELOS[nome]['tipo'], y[teste], estimador, x.iloc[teste]),
+        'tempo_ajuste_s': round(tempo_ajuste, 4),
+    }
+
+
+def _impressao(df):
+    # como pipeline.impressao_digital, sem importar pipeline (que importa este módulo)
+    sha = hashlib.sha256(repr(list(df.columns)).encode('utf-8'))
+    sha.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return sha.hexdigest()[:16]
+
+
+def _chave(impressao, nome, parametros, dobras, semente, dobra):
+    conteudo = json.dumps([impressao, nome, parametros, dobras, semente, dobra], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:20]
+
+
+def avaliar(nome, df, busca='grade', n_candidatos=10, dobras=5, n_jobs=-1, dir_cache=DIR_AVALIACAO, semente=0):
+    """Validação cruzada de cada candidato de hiperparâmetros de `nome` (ver MODELOS).
+
+    `df` é o df_stats (regressões) ou o df_combined (logísticas). Devolve uma
+    linha por (candidato, dobra) com as métricas no teste e o tempo de ajuste;
+    ver resumir. Com `dir_cache=None` nada é gravado nem lido do disco.
+    """
+    espec = MODELOS[nome]
+    colunas = espec['numericas'] + espec['categoricas']
+    x, y = df[colunas], df[espec['alvo']].to_numpy()
+    lista_candidatos = candidatos(nome, busca, n_candidatos, semente)
+    divisoes = dividir(df, nome, dobras, semente)
+
+    impressao = _impressao(df[colunas + [espec['alvo']] + ([espec['agrupar_por']] if espec.get('agrupar_por') else [])])
+    tarefas = [(i, j) for i in range(len(lista_candidatos)) for j in range(len(divisoes))]
+    caminhos, calculadas = {}, {}
+    if dir_cache is not None:
+        os.makedirs(os.path.join(dir_cache, nome), exist_ok=True)
+        for i, j in tarefas:
+            caminhos[i, j] = os.path.join(dir_cache, nome, _chave(impressao, nome, lista_candidatos[i], dobras, semente, j) + '.json')
+            if os.path.exists(caminhos[i, j]):
+                with open(caminhos[i, j], encoding='utf-8') as f:
+                    calculadas[i, j] = json.load(f)
+
+    pendentes = [t for t in tarefas if t not in calculadas]
+    novas = Parallel(n_jobs=n_jobs)(
+        delayed(_avaliar_dobra)(nome, lista_candidatos[i], x, y, *divisoes[j]) for i, j in pendentes
+    )
+    for tarefa, metricas in zip(pendentes, novas):
+        calculadas[tarefa] = metricas
+        if dir_cache is not None:
+            with open(caminhos[tarefa], 'w', encoding='utf-8') as f:
+                json.dump(metricas, f)
+
+    return pd.DataFrame([
+        {'modelo': nome, 'candidato': i, 'parametros': json.dumps(lista_candidatos[i], sort_keys=True), 'dobra': j,
+         'em_cache': (i, j) not in pendentes, **calculadas[i, j]}
+        for i, j in tarefas
+    ])
+
+
+def resumir(dobras):
+    """Média e desvio de cada métrica por (modelo, candidato), do melhor para o pior.
+
+    O melhor candidato de cada modelo fica com `melhor=True`.
+    """
+    metricas = [c for c in dobras.columns if c not in ('modelo', 'candidato', 'parametros', 'dobra', 'em_cache')]
+    resumo = dobras.groupby(['modelo', 'candidato', 'parametros'], sort=False)[metricas].agg(['mean', 'std'])
+    resumo.columns = [f'{metrica}_{"media" if estatistica == "mean" else "desvio"}' for metrica, estatistica in resumo.columns]
+    resumo = resumo.join(dobras.groupby(['modelo', 'candidato', 'parametros'], sort=False).size().rename('dobras')).reset_index()
+
+    partes = []
+    for nome, parte in resumo.groupby('modelo', sort=False):
+        metrica = METRICA_PRINCIPAL[MODELOS[nome]['tipo']]
+        parte = parte.sort_values(f'{metrica}_media', ascending=metrica == 'rmse', kind='stable')
+        parte['metrica_principal'] = metrica
+        parte['melhor'] = np.arange(len(parte)) == 0
+        partes.append(parte)
+    return pd.concat(partes, ignore_index=True).drop(columns='candidato')
+
+
+def comparar(df_stats, df_combined, nomes=None, **kwargs):
+    # tabela de resumir com todos os modelos; `kwargs` vão para avaliar
+    dados = {'regressao': df_stats, 'classificacao': df_combined}
+    return resumir(pd.concat([avaliar(nome, dados[MODELOS[nome]['tipo']], **kwargs) for nome in (nomes or MODELOS)],
+                             ignore_index=True))
@@ -0,0 +1,32 @@
+# coding: utf-8
+
+# Motor DuckDB (motor_duckdb.py) contra as mesmas etapas em pandas
+# (bench_pipeline.py), lendo o SIH particionado direto do Parquet. A
+# igualdade dos resultados é conferida em tests/test_motor_duckdb.py.
+
+import pytest
+
+duckdb = pytest.importorskip('duckdb')
+
+import motor_duckdb  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def motor(diretorio_dados):
+    return motor_duckdb.MotorDuckDB(str(diretorio_dados / 'sih'), ufs=['PB'], anos=[2024], ultimo_mes_cmpt=12)
+
+
+def bench_duckdb_ocupacao_diaria(medir, motor, hospitais):
+    medir(motor.montar_ocupacao_diaria, hospitais, inicio=20240101)
+
+
+def bench_duckdb_stats(medir, motor, df_ocupacao_diaria, hospitais):
+    medir(motor.calcular_stats, df_ocupacao_diaria, hospitais, inicio_mes=202401)
+
+
+def bench_duckdb_cubos(medir, motor, df_ocupacao_diaria, hospitais):
+    medir(motor.montar_cubos, df_ocupacao_diaria, hospitais, inicio_mes=202401)
+
+
+def bench_duckdb_tipos_unidade(medir, motor, hospitais):
+    medir(motor.contar_tipos_unidade, hospitais)
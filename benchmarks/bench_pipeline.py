@@ -0,0 +1,111 @@
+# coding: utf-8
+
+# Tempo e pico de memória de cada etapa do pipeline sobre dados sintéticos.
+# Cada benchmark recebe as etapas anteriores prontas (ver conftest.py).
+
+import avaliacao
+import pipeline
+import resumo
+from carregamento import carregar_sih, ler_sih_particionado
+from hospitais import DimensaoHospitais
+
+
+# ### Carregamento
+
+def bench_carregar_sih_csv(medir, url_sih_csv, tmp_path):
+    # download local (file://), leitura do CSV e conversão para Parquet
+    medir(carregar_sih, url_sih_csv, atualizar=True, dir_cache=str(tmp_path))
+
+
+def bench_carregar_sih_cache(medir, url_sih_csv, tmp_path):
+    carregar_sih(url_sih_csv, dir_cache=str(tmp_path))
+    medir(carregar_sih, url_sih_csv, dir_cache=str(tmp_path))
+
+
+def bench_ler_sih_particionado(medir, diretorio_dados):
+    medir(ler_sih_particionado, str(diretorio_dados / 'sih'), ufs=['PB'], anos=[2024])
+
+
+# ### Limpeza
+
+def bench_limpar_sih(medir, sih_bruto):
+    medir(pipeline.limpar_sih, sih_bruto, ultimo_mes_cmpt=12)
+
+
+def bench_dimensao_hospitais(medir, hospital_e_leitos_br):
+    medir(lambda: DimensaoHospitais(pipeline.limpar_hospitais_leitos(hospital_e_leitos_br, uf='PB')))
+
+
+# ### Ocupação e estatísticas
+
+def bench_ocupacao_diaria(medir, sih, hospitais):
+    medir(pipeline.montar_ocupacao_diaria, sih, hospitais, inicio=20240101)
+
+
+def bench_stats(medir, df_ocupacao_diaria, sih_periodo, hospitais):
+    medir(pipeline.calcular_stats, df_ocupacao_diaria, sih_periodo, hospitais)
+
+
+def bench_df_combined(medir, sih_periodo, df_ocupacao_diaria):
+    medir(pipeline.montar_df_combined, sih_periodo, df_ocupacao_diaria)
+
+
+# ### CIDs
+
+def bench_cids_mais_frequentes(medir, sih_periodo, df_stats, hospitais):
+    medir(pipeline.cids_mais_frequentes, sih_periodo, df_stats, hospitais)
+
+
+def bench_top_cids_por_hospital(medir, sih_periodo, hospitais):
+    medir(pipeline.cids_por_hospital, sih_periodo, hospitais, k=10)
+
+
+def bench_internacoes_por_capitulo(medir, sih_periodo):
+    medir(pipeline.internacoes_por_capitulo, sih_periodo)
+
+
+# ### Medidas resumo
+
+def bench_resumo_ocupacao_diaria(medir, df_ocupacao_diaria):
+    # todas as colunas de uma vez, no total, por hospital, tipo de unidade e município
+    medir(resumo.resumir, df_ocupacao_diaria, ['leitos_ocupados', 'taxa_ocupacao_diaria_pct', 'taxa_obito_pct', 'qtd_entradas'],
+          por=['id_cnes', 'DS_TIPO_UNIDADE', 'MUNICIPIO'])
+
+
+# ### Correlações
+
+def bench_correlacoes(medir, df_stats):
+    # 2 pares x 3 métodos, 2000 reamostras de bootstrap e 2000 permutações por grupo
+    medir(pipeline.correlacoes, df_stats, rounds=1)
+
+
+# ### Filtros do painel
+
+def bench_montar_cubos(medir, df_ocupacao_diaria, sih_periodo, hospitais):
+    medir(pipeline.montar_cubos, df_ocupacao_diaria, sih_periodo, hospitais)
+
+
+def bench_resultados_filtrados(medir, cubos, hospitais):
+    # o que o painel refaz a cada mudança de filtro
+    tipo = cubos['cubo_hospital_mes']['DS_TIPO_UNIDADE'].cat.categories[0]
+    medir(pipeline.resultados_filtrados, cubos['cubo_hospital_mes'], cubos['cubo_cids'], hospitais,
+          periodo=(202403, 202408), tipos_unidade=[tipo])
+
+
+# ### Modelos
+
+def bench_regressao_multipla(medir, df_stats):
+    medir(pipeline.ajustar_regressao_multipla, df_stats)
+
+
+def bench_logistica_sem_municipio(medir, df_combined):
+    medir(pipeline.ajustar_logistica_sem_municipio, df_combined, rounds=1)
+
+
+def bench_logistica_com_municipio(medir, df_combined):
+    medir(pipeline.ajustar_logistica_com_municipio, df_combined, rounds=1)
+
+
+def bench_validacao_cruzada_logistica(medir, df_combined):
+    # 16 candidatos x 5 dobras, sem o cache de dobras
+    medir(avaliacao.avaliar, 'logistica_sem_municipio', df_combined, dir_cache=None, rounds=1)
@@ -0,0 +1,108 @@
+# coding: utf-8
+
+# Dados sintéticos (ver sintetico.py) e etapas intermediárias do pipeline,
+# gerados uma vez por sessão. A escala vem de SUPERLOTACAO_BENCH_AIH:
+#   SUPERLOTACAO_BENCH_AIH=1000000 pytest benchmarks --benchmark-autosave
+#   pytest benchmarks --benchmark-compare   # compara com a última execução salva
+
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline  # noqa: E402
+import sintetico  # noqa: E402
+from carregamento import carregar_hospitais_leitos, ler_sih_particionado  # noqa: E402
+from hospitais import DimensaoHospitais  # noqa: E402
+
+N_AIH = int(os.environ.get('SUPERLOTACAO_BENCH_AIH', 100_000))
+N_HOSPITAIS = int(os.environ.get('SUPERLOTACAO_BENCH_HOSPITAIS', 80))
+ANO = 2024
+
+
+@pytest.fixture
+def medir(benchmark):
+    """Roda `funcao` no benchmark e guarda o pico de memória e o número de linhas.
+
+    O pico (tracemalloc) é medido numa execução à parte, para não pesar nos tempos.
+    """
+    def medir(funcao, *args, rounds=3, **kwargs):
+        tracemalloc.start()
+        resultado = funcao(*args, **kwargs)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        benchmark.extra_info['pico_memoria_mb'] = round(pico / 2 ** 20, 1)
+        benchmark.extra_info['aih'] = N_AIH
+        if hasattr(resultado, '__len__'):
+            benchmark.extra_info['linhas'] = len(resultado)
+        benchmark.pedantic(funcao, args=args, kwargs=kwargs, rounds=rounds, iterations=1)
+        return resultado
+    return medir
+
+
+@pytest.fixture(scope='session')
+def diretorio_dados(tmp_path_factory):
+    diretorio = tmp_path_factory.mktemp('sintetico')
+    sintetico.gravar(str(diretorio), N_AIH, n_hospitais=N_HOSPITAIS, ano=ANO)
+    return diretorio
+
+
+@pytest.fixture(scope='session')
+def url_hospitais_leitos(diretorio_dados):
+    return (diretorio_dados / 'hospitais_leitos.csv').as_uri()
+
+
+@pytest.fixture(scope='session')
+def url_sih_csv(diretorio_dados):
+    # CSV no formato do arquivo publicado, para medir a leitura com conversão
+    caminho = diretorio_dados / 'sih.csv'
+    ler_sih_particionado(str(diretorio_dados / 'sih')).drop(columns=['uf', 'ano', 'mes']).to_csv(caminho, index=False)
+    return caminho.as_uri()
+
+
+@pytest.fixture(scope='session')
+def sih_bruto(diretorio_dados):
+    return ler_sih_particionado(str(diretorio_dados / 'sih')).drop(columns=['uf', 'ano', 'mes'])
+
+
+@pytest.fixture(scope='session')
+def hospital_e_leitos_br(url_hospitais_leitos, tmp_path_factory):
+    return carregar_hospitais_leitos(url_hospitais_leitos, dir_cache=str(tmp_path_factory.mktemp('cache')))
+
+
+@pytest.fixture(scope='session')
+def hospitais(hospital_e_leitos_br):
+    return DimensaoHospitais(pipeline.limpar_hospitais_leitos(hospital_e_leitos_br, uf='PB'))
+
+
+@pytest.fixture(scope='session')
+def sih(sih_bruto):
+    return pipeline.limpar_sih(sih_bruto, ultimo_mes_cmpt=12)
+
+
+@pytest.fixture(scope='session')
+def sih_periodo(sih):
+    return pipeline.filtrar_periodo(sih, inicio_mes=ANO * 100 + 1)
+
+
+@pytest.fixture(scope='session')
+def df_ocupacao_diaria(sih, hospitais):
+    return pipeline.montar_ocupacao_diaria(sih, hospitais, inicio=ANO * 10000 + 101)
+
+
+@pytest.fixture(scope='session')
+def df_stats(df_ocupacao_diaria, sih_periodo, hospitais):
+    return pipeline.calcular_stats(df_ocupacao_diaria, sih_periodo, hospitais)
+
+
+@pytest.fixture(scope='session')
+def df_combined(sih_periodo, df_ocupacao_diaria):
+    return pipeline.montar_df_combined(sih_periodo, df_ocupacao_diaria)
+
+
+@pytest.fixture(scope='session')
+def cubos(df_ocupacao_diaria, sih_periodo, hospitais):
+    return pipeline.montar_cubos(df_ocupacao_diaria, sih_periodo, hospitais)
@@ -0,0 +1,228 @@
+# coding: utf-8
+
+# Camada de carregamento dos dados de entrada (SIH e OpenDataSUS).
+# Cada CSV remoto é baixado uma única vez, convertido para Parquet tipado e
+# guardado em disco. As execuções seguintes leem o Parquet com memory map.
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import urllib.request
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DIR_CACHE = os.environ.get('SUPERLOTACAO_CACHE', 'cache')
+ARQUIVO_INDICE = 'indice.json'
+
+# Hospitais e Leitos | Fonte: OpenDataSUS
+URL_HOSPITAL_E_LEITOS_BR = "https://drive.google.com/uc?id=1LRPmb12Et55FEBwi8eL2NgX0s4JQvJ5d"
+# SIH Paraíba 2024 | Fonte: PySUS (gerado por extrai-dados-pysus.py)
+URL_SIH_PB_2024 = "https://www.dropbox.com/scl/fi/6pbph1llgydgsbhwi054x/dados_sih_pb_2024.csv?rlkey=ke7suvsvakniipj0hszb85xyk&st=qgipi74x&dl=1"
+
+
+def _ler_indice(dir_cache):
+    caminho = os.path.join(dir_cache, ARQUIVO_INDICE)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_indice(dir_cache, indice):
+    # grava em arquivo temporário e renomeia, para não deixar o índice corrompido
+    caminho = os.path.join(dir_cache, ARQUIVO_INDICE)
+    tmp = caminho + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, caminho)
+
+
+def _chave_fonte(url, kwargs_csv):
+    # a mesma URL lida com parâmetros diferentes gera tabelas diferentes
+    parametros = json.dumps(kwargs_csv, sort_keys=True, default=str)
+    return hashlib.sha256(f'{url}|{parametros}'.encode('utf-8')).hexdigest()[:16]
+
+
+def _como_url(fonte):
+    # caminhos locais viram file://, para usar o mesmo download e o mesmo cache das URLs
+    return pathlib.Path(fonte).resolve().as_uri() if os.path.exists(fonte) else fonte
+
+
+def _baixar(url, destino):
+    # baixa em blocos, calculando o hash do conteúdo durante a cópia
+    sha = hashlib.sha256()
+    with urllib.request.urlopen(_como_url(url)) as resposta, open(destino, 'wb') as f:
+        while True:
+            bloco = resposta.read(1 << 20)
+            if not bloco:
+                break
+            sha.update(bloco)
+            f.write(bloco)
+    return sha.hexdigest()
+
+
+def baixar_arquivo(fonte, destino):
+    # cópia sem cache de uma URL ou caminho local (ex.: arquivos .zip); devolve o hash do conteúdo
+    return _baixar(fonte, destino)
+
+
+def _ler_parquet(caminho):
+    return pd.read_parquet(caminho, engine='pyarrow', memory_map=True)
+
+
+def ler_csv_em_cache(url, atualizar=False, dir_cache=DIR_CACHE, **kwargs_csv):
+    """Lê um CSV remoto (ou um caminho local) usando o cache local em Parquet.
+
+    Com `atualizar=True` o arquivo é baixado de novo; se o conteúdo não mudou
+    (mesmo hash), o Parquet existente é reaproveitado.
+    """
+    os.makedirs(dir_cache, exist_ok=True)
+    indice = _ler_indice(dir_cache)
+    chave = _chave_fonte(url, kwargs_csv)
+    entrada = indice.get(chave)
+
+    if entrada and not atualizar:
+        caminho = os.path.join(dir_cache, entrada['arquivo'])
+        if os.path.exists(caminho):
+            return _ler_parquet(caminho)
+
+    fd, tmp_csv = tempfile.mkstemp(suffix='.csv', dir=dir_cache)
+    os.close(fd)
+    try:
+        hash_conteudo = _baixar(url, tmp_csv)
+        arquivo = f'{chave}-{hash_conteudo[:16]}.parquet'
+        caminho = os.path.join(dir_cache, arquivo)
+        if not os.path.exists(caminho):
+            df = pd.read_csv(tmp_csv, **kwargs_csv)
+            tmp_parquet = caminho + '.tmp'
+            df.to_parquet(tmp_parquet, engine='pyarrow', index=False)
+            os.replace(tmp_parquet, caminho)
+    finally:
+        os.remove(tmp_csv)
+
+    # remove a versão anterior quando o conteúdo da fonte mudou
+    if entrada and entrada['arquivo'] != arquivo:
+        anterior = os.path.join(dir_cache, entrada['arquivo'])
+        if os.path.exists(anterior):
+            os.remove(anterior)
+
+    indice[chave] = {
+        'url': url,
+        'hash_conteudo': hash_conteudo,
+        'arquivo': arquivo,
+        'baixado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    _gravar_indice(dir_cache, indice)
+    return _ler_parquet(caminho)
+
+
+def invalidar_cache(url=None, dir_cache=DIR_CACHE):
+    """Remove do cache as tabelas de uma URL (ou todas, se `url` for None)."""
+    if not os.path.isdir(dir_cache):
+        return
+    if url is None:
+        shutil.rmtree(dir_cache)
+        return
+    indice = _ler_indice(dir_cache)
+    for chave, entrada in list(indice.items()):
+        if entrada['url'] == url:
+            caminho = os.path.join(dir_cache, entrada['arquivo'])
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            del indice[chave]
+    _gravar_indice(dir_cache, indice)
+
+
+# Esquema declarado do SIH/RD: apenas as colunas usadas no relatório.
+# Datas ficam como inteiros AAAAMMDD e os códigos de CID e município como categorias.
+ESQUEMA_SIH = {
+    'ESPEC': 'int8',
+    'PROC_REA': 'int64',
+    'VAL_TOT': 'float64',
+    'DT_INTER': 'int32',
+    'DT_SAIDA': 'int32',
+    'DIAG_PRINC': 'category',
+    'MUNIC_MOV': 'category',
+    'DIAS_PERM': 'int32',
+    'MORTE': 'int8',
+    'CNES': 'int32',
+    'IDADE': 'int16',
+    'MES_CMPT': 'int8',
+}
+
+
+def carregar_sih(url, atualizar=False, dir_cache=DIR_CACHE):
+    # lê só as colunas do esquema, já com os tipos declarados
+    return ler_csv_em_cache(
+        url,
+        atualizar=atualizar,
+        dir_cache=dir_cache,
+        usecols=list(ESQUEMA_SIH),
+        dtype=ESQUEMA_SIH,
+    )
+
+
+# Hospitais e Leitos: CNES e competência como inteiros e os textos usados em
+# agrupamentos e junções como categorias. As demais colunas seguem a inferência do pandas.
+ESQUEMA_HOSPITAIS_LEITOS = {
+    'COMP': 'int32',
+    'CNES': 'int32',
+    'UF': 'category',
+    'MUNICIPIO': 'category',
+    'TP_GESTAO': 'category',
+    'DS_TIPO_UNIDADE': 'category',
+}
+
+
+def carregar_hospitais_leitos(url, atualizar=False, dir_cache=DIR_CACHE):
+    return ler_csv_em_cache(
+        url,
+        atualizar=atualizar,
+        dir_cache=dir_cache,
+        encoding='ISO-8859-1',
+        dtype=ESQUEMA_HOSPITAIS_LEITOS,
+    )
+
+
+def _filtros_particao(ufs=None, anos=None, meses=None):
+    filtros = []
+    if ufs is not None:
+        filtros.append(('uf', 'in', list(ufs)))
+    if anos is not None:
+        filtros.append(('ano', 'in', [int(a) for a in anos]))
+    if meses is not None:
+        filtros.append(('mes', 'in', [int(m) for m in meses]))
+    return filtros or None
+
+
+def ler_sih_particionado(diretorio, ufs=None, anos=None, meses=None):
+    # lê o dataset gerado por extrai-dados-pysus.py (uf=/ano=/mes=),
+    # filtrando partições e colunas antes de carregar
+    df = pd.read_parquet(
+        diretorio,
+        engine='pyarrow',
+        columns=list(ESQUEMA_SIH) + ['uf', 'ano', 'mes'],
+        filters=_filtros_particao(ufs, anos, meses),
+    )
+    return df.astype({**ESQUEMA_SIH, 'ano': 'int16', 'mes': 'int8'})
+
+
+def iterar_sih_particionado(diretorio, ufs=None, anos=None, meses=None, tamanho_lote=500_000):
+    # mesmo dataset de ler_sih_particionado, entregue em lotes de até
+    # `tamanho_lote` linhas; a memória usada não depende do tamanho do dataset
+    filtros = _filtros_particao(ufs, anos, meses)
+    dataset = ds.dataset(diretorio, format='parquet', partitioning='hive')
+    scanner = dataset.scanner(
+        columns=list(ESQUEMA_SIH),
+        filter=pq.filters_to_expression(filtros) if filtros else None,
+        batch_size=tamanho_lote,
+    )
+    for lote in scanner.to_batches():
+        if lote.num_rows:
+            yield lote.to_pandas().astype(ESQUEMA_SIH)
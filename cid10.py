@@ -0,0 +1,224 @@
+# coding: utf-8
+
+# Dimensão CID-10: código, código normalizado, capítulo, grupo e descrição.
+#
+# A tabela completa vem dos arquivos CSV da CID-10 publicados pelo DATASUS
+# (CID10CSV.zip: CID-10-GRUPOS, CID-10-CATEGORIAS e CID-10-SUBCATEGORIAS) e é
+# convertida uma vez para Parquet em tabelas/cid10.parquet. O `artefatos build`
+# e o painel sem artefatos (que segue sem ela se o download falhar) fazem
+# isso quando o arquivo não existe; à mão:
+#   python -m cid10 --datasus caminho/CID10CSV.zip
+# Sem esse arquivo, os capítulos continuam disponíveis (estão abaixo) e as
+# descrições se limitam às já conhecidas no relatório.
+#
+# O mapeamento trabalha sobre as categorias da coluna (alguns milhares de CIDs
+# distintos), não sobre as linhas: o resultado é montado pelos códigos
+# categóricos, então custa o mesmo para mil ou dez milhões de AIHs.
+
+import argparse
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from carregamento import baixar_arquivo
+
+# CSVs da CID-10 do DATASUS (versão 2008)
+URL_CID10_DATASUS = 'http://www2.datasus.gov.br/cid10/V2008/downloads/CID10CSV.zip'
+
+CAMINHO_TABELA = os.environ.get(
+    'SUPERLOTACAO_CID10',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tabelas', 'cid10.parquet'),
+)
+
+# (capítulo, primeira categoria, última categoria, descrição)
+CAPITULOS = [
+    ('I', 'A00', 'B99', 'Algumas doenças infecciosas e parasitárias'),
+    ('II', 'C00', 'D48', 'Neoplasias (tumores)'),
+    ('III', 'D50', 'D89', 'Doenças do sangue e dos órgãos hematopoéticos e alguns transtornos imunitários'),
+    ('IV', 'E00', 'E90', 'Doenças endócrinas, nutricionais e metabólicas'),
+    ('V', 'F00', 'F99', 'Transtornos mentais e comportamentais'),
+    ('VI', 'G00', 'G99', 'Doenças do sistema nervoso'),
+    ('VII', 'H00', 'H59', 'Doenças do olho e anexos'),
+    ('VIII', 'H60', 'H95', 'Doenças do ouvido e da apófise mastóide'),
+    ('IX', 'I00', 'I99', 'Doenças do aparelho circulatório'),
+    ('X', 'J00', 'J99', 'Doenças do aparelho respiratório'),
+    ('XI', 'K00', 'K93', 'Doenças do aparelho digestivo'),
+    ('XII', 'L00', 'L99', 'Doenças da pele e do tecido subcutâneo'),
+    ('XIII', 'M00', 'M99', 'Doenças do sistema osteomuscular e do tecido conjuntivo'),
+    ('XIV', 'N00', 'N99', 'Doenças do aparelho geniturinário'),
+    ('XV', 'O00', 'O99', 'Gravidez, parto e puerpério'),
+    ('XVI', 'P00', 'P96', 'Algumas afecções originadas no período perinatal'),
+    ('XVII', 'Q00', 'Q99', 'Malformações congênitas, deformidades e anomalias cromossômicas'),
+    ('XVIII', 'R00', 'R99', 'Sintomas, sinais e achados anormais de exames clínicos e de laboratório, não classificados em outra parte'),
+    ('XIX', 'S00', 'T98', 'Lesões, envenenamento e algumas outras conseqüências de causas externas'),
+    ('XX', 'V01', 'Y98', 'Causas externas de morbidade e de mortalidade'),
+    ('XXI', 'Z00', 'Z99', 'Fatores que influenciam o estado de saúde e o contato com os serviços de saúde'),
+    ('XXII', 'U00', 'U99', 'Códigos para propósitos especiais'),
+]
+
+# descrições usadas no relatório antes da tabela completa; valem quando o Parquet não existe
+DESCRICOES_CONHECIDAS = {
+    'K359': 'Apendicite aguda',
+    'S525': 'Fratura da extremidade distal do rádio',
+    'Z302': 'Esterilização',
+    'O800': 'Parto espontâneo cefálico',
+    'I64': 'Acidente vascular cerebral',
+    'I219': 'Infarto agudo do miocárdio',
+    'O82': 'Parto por cesariana',
+    'F192': 'Síndrome de dependência',
+}
+
+COLUNAS = ['codigo', 'codigo_normalizado', 'capitulo', 'grupo', 'descricao']
+
+
+def normalizar(codigos):
+    # 'I64 ', 'i64', 'I64.0' -> 'I64', 'I64', 'I640'
+    codigos = pd.Series(codigos, dtype=object).astype(str)
+    return codigos.str.strip().str.upper().str.replace('.', '', regex=False).str.replace('-', '', regex=False)
+
+
+def _intervalo(categorias, inicios, fins):
+    # posição do intervalo [inicio, fim] que contém cada categoria de 3 caracteres, ou -1
+    ordem = np.argsort(inicios)
+    inicios, fins = np.asarray(inicios)[ordem], np.asarray(fins)[ordem]
+    posicao = np.searchsorted(inicios, categorias, side='right') - 1
+    dentro = (posicao >= 0) & (np.asarray(categorias) <= fins[np.maximum(posicao, 0)])
+    return np.where(dentro, ordem[np.maximum(posicao, 0)], -1)
+
+
+def capitulos(categorias):
+    # capítulo (algarismo romano) de cada categoria de 3 caracteres
+    indice = _intervalo(np.asarray(categorias, dtype=object), [c[1] for c in CAPITULOS], [c[2] for c in CAPITULOS])
+    numeros = np.array([c[0] for c in CAPITULOS] + [None], dtype=object)
+    return numeros[indice]
+
+
+def _tabela_embutida():
+    codigos = pd.Series(list(DESCRICOES_CONHECIDAS), dtype=object)
+    return pd.DataFrame({
+        'codigo': codigos,
+        'codigo_normalizado': codigos,
+        'capitulo': capitulos(codigos.str[:3]),
+        'grupo': None,
+        'descricao': list(DESCRICOES_CONHECIDAS.values()),
+    })
+
+
+def carregar_tabela(caminho=None):
+    caminho = caminho or CAMINHO_TABELA
+    if os.path.exists(caminho):
+        return pd.read_parquet(caminho)
+    return _tabela_embutida()
+
+
+def montar_tabela_datasus(fonte):
+    """Tabela completa a partir dos CSVs da CID-10 do DATASUS (separados por ';', ISO-8859-1).
+
+    `fonte` é o diretório com os CSVs ou o CID10CSV.zip publicado pelo DATASUS.
+    """
+    if zipfile.is_zipfile(fonte):
+        with zipfile.ZipFile(fonte) as arquivo:
+            nomes = {os.path.basename(nome).upper(): nome for nome in arquivo.namelist()}
+            return _montar_tabela(lambda nome: arquivo.open(nomes[nome]))
+    return _montar_tabela(lambda nome: os.path.join(fonte, nome))
+
+
+def _montar_tabela(abrir):
+    def ler(nome):
+        return pd.read_csv(abrir(nome), sep=';', encoding='ISO-8859-1', dtype=str, index_col=False)
+
+    grupos = ler('CID-10-GRUPOS.CSV')
+    categorias = ler('CID-10-CATEGORIAS.CSV')[['CAT', 'DESCRICAO']].rename(columns={'CAT': 'codigo'})
+    subcategorias = ler('CID-10-SUBCATEGORIAS.CSV')[['SUBCAT', 'DESCRICAO']].rename(columns={'SUBCAT': 'codigo'})
+    tabela = pd.concat([categorias, subcategorias], ignore_index=True).rename(columns={'DESCRICAO': 'descricao'})
+
+    tabela['codigo_normalizado'] = normalizar(tabela['codigo']).to_numpy()
+    categoria = tabela['codigo_normalizado'].str[:3].to_numpy(dtype=object)
+    tabela['capitulo'] = capitulos(categoria)
+    rotulos_grupo = np.array((grupos['CATINIC'] + '-' + grupos['CATFIM']).tolist() + [None], dtype=object)
+    tabela['grupo'] = rotulos_grupo[_intervalo(categoria, grupos['CATINIC'].to_numpy(dtype=object), grupos['CATFIM'].to_numpy(dtype=object))]
+    return tabela[COLUNAS].astype({'capitulo': 'category', 'grupo': 'category'})
+
+
+def preparar_tabela(fonte=URL_CID10_DATASUS, caminho=None, atualizar=False):
+    """Grava a tabela completa em `caminho` (padrão: CAMINHO_TABELA) se ela ainda não existe.
+
+    `fonte` é a URL ou o caminho do CID10CSV.zip, ou um diretório com os CSVs.
+    Com `atualizar=True` a tabela é refeita mesmo que exista. Devolve o caminho.
+    """
+    caminho = caminho or CAMINHO_TABELA
+    if os.path.exists(caminho) and not atualizar:
+        return caminho
+    if os.path.isdir(fonte):
+        tabela = montar_tabela_datasus(fonte)
+    else:
+        fd, arquivo_zip = tempfile.mkstemp(suffix='.zip')
+        os.close(fd)
+        try:
+            baixar_arquivo(fonte, arquivo_zip)
+            tabela = montar_tabela_datasus(arquivo_zip)
+        finally:
+            os.remove(arquivo_zip)
+    # grava em arquivo temporário e renomeia: o painel nunca lê uma tabela pela metade
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    tmp = caminho + '.tmp'
+    tabela.to_parquet(tmp, index=False)
+    os.replace(tmp, caminho)
+    return caminho
+
+
+def descrever(cids, tabela=None):
+    """Descrição, capítulo e grupo de cada CID de `cids`, alinhados à entrada.
+
+    A normalização e as buscas são feitas uma vez por categoria; as colunas
+    devolvidas são categóricas, com os mesmos códigos por linha da entrada.
+    CIDs de subcategoria sem descrição própria ficam com a da categoria.
+    """
+    tabela = carregar_tabela() if tabela is None else tabela
+    cids = pd.Series(cids)
+    if not isinstance(cids.dtype, pd.CategoricalDtype):
+        cids = cids.astype('category')
+    codigos_linha = cids.cat.codes.to_numpy()
+
+    normalizados = normalizar(cids.cat.categories)
+    por_codigo = tabela.drop_duplicates('codigo_normalizado').set_index('codigo_normalizado')
+    categoria = normalizados.str[:3]
+
+    def buscar(coluna):
+        # pelo código completo e, na falta dele, pela categoria de 3 caracteres
+        valores = normalizados.map(por_codigo[coluna]).astype(object)
+        return valores.where(valores.notna(), categoria.map(por_codigo[coluna]).astype(object))
+
+    por_categoria = {
+        'cid': normalizados,
+        'capitulo': pd.Series(capitulos(categoria.to_numpy(dtype=object)), dtype=object),
+        'grupo': buscar('grupo'),
+        'descricao': buscar('descricao'),
+    }
+
+    resultado = {}
+    for nome, valores in por_categoria.items():
+        # capítulos na ordem da classificação (I, II, ..., XXII), não alfabética
+        categorico = pd.Categorical(valores, categories=[c[0] for c in CAPITULOS], ordered=True) if nome == 'capitulo' else pd.Categorical(valores)
+        codigos = np.where(codigos_linha >= 0, categorico.codes[np.maximum(codigos_linha, 0)], -1) if len(valores) else codigos_linha
+        resultado[nome] = pd.Categorical.from_codes(codigos, dtype=categorico.dtype)
+    return pd.DataFrame(resultado, index=cids.index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Converte os CSVs da CID-10 do DATASUS para o Parquet usado pelo relatório.')
+    parser.add_argument('--datasus', default=URL_CID10_DATASUS,
+                        help='URL ou caminho do CID10CSV.zip, ou diretório com CID-10-GRUPOS.CSV, CID-10-CATEGORIAS.CSV e '
+                             'CID-10-SUBCATEGORIAS.CSV (padrão: arquivo do DATASUS)')
+    parser.add_argument('--saida', default=CAMINHO_TABELA)
+    args = parser.parse_args(argv)
+
+    preparar_tabela(args.datasus, args.saida, atualizar=True)
+    print(f'{len(carregar_tabela(args.saida))} códigos gravados em {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# coding: utf-8
+
+# Correlações de Pearson, Spearman e Kendall com intervalo de confiança por
+# bootstrap e p-valor por permutação, para vários pares de colunas e grupos.
+# As reamostras são uma única matriz de índices (reamostras x linhas),
+# avaliada em lotes de linhas: cada lote calcula os três coeficientes de uma
+# vez, sobre os postos já calculados dos dados originais.
+#
+# O Kendall (tau-b) usa o algoritmo de Knight: ordena por (x, y) e conta as
+# inversões de y com um merge sort vetorizado, em O(n log n) por reamostra em
+# vez de comparar todos os pares.
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+METODOS = ['pearson', 'spearman', 'kendall']
+
+PARES_PADRAO = (('leitos_sus_mean', 'taxa_ocupacao_mean_pct'), ('obitos_mean', 'taxa_ocupacao_mean_pct'))
+
+
+def _pearson_linhas(x, y):
+    # Pearson de cada linha de x com a mesma linha de y; linhas constantes dão NaN
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+
+def _inicio_sequencias(*ordenados):
+    # índice do início da sequência de valores iguais (em todas as colunas) de cada posição
+    linhas, n = ordenados[0].shape
+    indices = np.broadcast_to(np.arange(n), (linhas, n))
+    novo = np.ones((linhas, n), dtype=bool)
+    novo[:, 1:] = np.logical_or.reduce([o[:, 1:] != o[:, :-1] for o in ordenados])
+    return indices, novo, np.maximum.accumulate(np.where(novo, indices, 0), axis=1)
+
+
+def _pares_empatados(*ordenados):
+    # soma de t(t-1)/2 sobre as sequências de valores iguais de cada linha (já ordenada)
+    indices, _, inicio = _inicio_sequencias(*ordenados)
+    return (indices - inicio).sum(axis=1)
+
+
+def _ordem(*chaves):
+    # argsort lexicográfico por linha (última chave é a principal), com
+    # argsorts estáveis, que em postos uint16 são radix sort, lineares em n
+    ordem = np.argsort(chaves[0], axis=1, kind='stable')
+    for chave in chaves[1:]:
+        ordem = np.take_along_axis(ordem, np.argsort(np.take_along_axis(chave, ordem, axis=1), axis=1, kind='stable'), axis=1)
+    return ordem
+
+
+def _postos_medios(postos):
+    # postos médios (1..n, empates com a média), como rankdata, a partir de postos densos
+    ordem = _ordem(postos)
+    indices, novo, inicio = _inicio_sequencias(np.take_along_axis(postos, ordem, axis=1))
+    fim = np.ones(novo.shape, dtype=bool)
+    fim[:, :-1] = novo[:, 1:]
+    n = novo.shape[1]
+    final = np.flip(np.minimum.accumulate(np.flip(np.where(fim, indices, n), axis=1), axis=1), axis=1)
+    medios = np.empty(postos.shape)
+    np.put_along_axis(medios, ordem, (inicio + final) / 2 + 1, axis=1)
+    return medios
+
+
+def _contar_inversoes(a, base=32):
+    # pares i < j com a[i] > a[j] em cada linha (postos densos). Dentro de
+    # blocos de `base` elementos a contagem é por comparação direta; depois,
+    # nível a nível como num merge sort, cada par de blocos vizinhos é
+    # ordenado com argsort estável (radix sort em uint16) e cada elemento da
+    # esquerda soma os elementos da direita que ficaram antes dele.
+    linhas, n = a.shape
+    m = max(1 << max(n - 1, 0).bit_length(), base)
+    # o preenchimento com o maior valor no fim não cria inversões
+    blocos = np.full((linhas, m), int(a.max()) + 1 if a.size else 1, dtype=a.dtype)
+    blocos[:, :n] = a
+    pequenos = blocos.reshape(linhas, m // base, base)
+    inversoes = np.zeros(linhas, dtype=np.int64)
+    for distancia in range(1, base):
+        inversoes += (pequenos[:, :, :-distancia] > pequenos[:, :, distancia:]).sum(axis=(1, 2))
+    largura = base
+    while largura < m:
+        pares = blocos.reshape(linhas, m // (2 * largura), 2 * largura)
+        da_esquerda = np.argsort(pares, axis=-1, kind='stable') < largura
+        # o k-ésimo elemento da esquerda na posição p tem p - k elementos da direita antes dele
+        posicoes = np.where(da_esquerda, np.arange(2 * largura, dtype=np.int64), 0).sum(axis=(1, 2))
+        inversoes += posicoes - pares.shape[1] * (largura * (largura - 1) // 2)
+        largura *= 2
+    return inversoes
+
+
+def kendall_postos(px, py):
+    """Tau-b de Kendall de cada linha, a partir de postos densos (0 <= posto < n).
+
+    Empates são tratados como em scipy.stats.kendalltau (variante b).
+    """
+    n = px.shape[1]
+    ordem = _ordem(py, px)
+    x_ordenado = np.take_along_axis(px, ordem, axis=1)
+    y_ordenado = np.take_along_axis(py, ordem, axis=1)
+
+    total = n * (n - 1) // 2
+    empates_x = _pares_empatados(x_ordenado)
+    empates_y = _pares_empatados(np.sort(py, axis=1, kind='stable'))
+    empates_xy = _pares_empatados(x_ordenado, y_ordenado)
+    discordantes = _contar_inversoes(y_ordenado)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return ((total - empates_x - empates_y + empates_xy - 2 * discordantes)
+                / np.sqrt((total - empates_x).astype(np.float64) * (total - empates_y)))
+
+
+def _postos_densos(valores):
+    # uint16 enquanto couber: os argsorts estáveis viram radix sort
+    postos = rankdata(valores, method='dense') - 1
+    return postos.astype(np.uint16 if len(postos) < 2 ** 16 else np.int64)
+
+
+def _coeficientes(x, y, px, py, metodos):
+    # x, y: valores (reamostras x n); px, py: postos densos dos mesmos valores
+    resultado = {}
+    if 'pearson' in metodos:
+        resultado['pearson'] = _pearson_linhas(x, y)
+    if 'spearman' in metodos:
+        resultado['spearman'] = _pearson_linhas(_postos_medios(px), _postos_medios(py))
+    if 'kendall' in metodos:
+        resultado['kendall'] = kendall_postos(px, py)
+    return resultado
+
+
+def _avaliar_indices(x, y, px, py, indices_x, indices_y, metodos, tamanho_lote):
+    # coeficientes para cada linha das matrizes de índices, em lotes
+    saida = {metodo: np.empty(len(indices_x)) for metodo in metodos}
+    for inicio in range(0, len(indices_x), tamanho_lote):
+        ix, iy = indices_x[inicio:inicio + tamanho_lote], indices_y[inicio:inicio + tamanho_lote]
+        for metodo, valores in _coeficientes(x[ix], y[iy], px[ix], py[iy], metodos).items():
+            saida[metodo][inicio:inicio + len(valores)] = valores
+    return saida
+
+
+def testar_par(x, y, metodos=METODOS, n_reamostras=2000, nivel=0.95, tamanho_lote=500, semente=0):
+    """Coeficientes de x e y com IC por bootstrap (percentil) e p-valor bilateral por permutação.
+
+    Linhas com NaN em x ou y são descartadas, como em Series.corr. Devolve
+    {metodo: {'coeficiente', 'ic_inferior', 'ic_superior', 'p_valor'}} e o n.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[validos], y[validos]
+    n = len(x)
+    if n < 3:
+        vazio = {'coeficiente': np.nan, 'ic_inferior': np.nan, 'ic_superior': np.nan, 'p_valor': np.nan}
+        return {metodo: dict(vazio) for metodo in metodos}, n
+
+    px, py = _postos_densos(x), _postos_densos(y)
+    observados = _coeficientes(x[None], y[None], px[None], py[None], metodos)
+
+    rng = np.random.default_rng(semente)
+    # bootstrap: x e y reamostrados juntos; permutação: só y é embaralhado
+    indices = rng.integers(0, n, size=(n_reamostras, n))
+    bootstrap = _avaliar_indices(x, y, px, py, indices, indices, metodos, tamanho_lote)
+    permutacoes = rng.permuted(np.broadcast_to(np.arange(n), (n_reamostras, n)), axis=1)
+    identidade = np.broadcast_to(np.arange(n), (n_reamostras, n))
+    permutados = _avaliar_indices(x, y, px, py, identidade, permutacoes, metodos, tamanho_lote)
+
+    alfa = (1 - nivel) / 2
+    resultado = {}
+    for metodo in metodos:
+        observado = float(observados[metodo][0])
+        # reamostras com uma coluna constante (coeficiente indefinido) ficam fora do intervalo
+        ic_inferior, ic_superior = np.nanquantile(bootstrap[metodo], [alfa, 1 - alfa])
+        extremos = np.abs(permutados[metodo]) >= abs(observado) - 1e-12
+        resultado[metodo] = {
+            'coeficiente': observado,
+            'ic_inferior': float(ic_inferior),
+            'ic_superior': float(ic_superior),
+            'p_valor': float((extremos.sum() + 1) / (n_reamostras + 1)),
+        }
+    return resultado, n
+
+
+def testar_correlacoes(df, pares=PARES_PADRAO, por=None, metodos=METODOS, n_reamostras=2000, nivel=0.95, semente=0, **kwargs):
+    """Tabela com uma linha por (grupo, par, método): n, coeficiente, IC e p-valor.
+
+    Com `por` (ex.: 'tipo_unidade') cada grupo é testado à parte, além do
+    grupo 'Todos'. `kwargs` vão para testar_par (ex.: tamanho_lote).
+    """
+    grupos = [('Todos', df)]
+    if por is not None:
+        grupos += [(str(nome), parte) for nome, parte in df.groupby(por, observed=True, sort=True)]
+    linhas = []
+    for grupo, parte in grupos:
+        for coluna_x, coluna_y in pares:
+            testes, n = testar_par(parte[coluna_x].to_numpy(), parte[coluna_y].to_numpy(), metodos, n_reamostras, nivel,
+                                   semente=semente, **kwargs)
+            for metodo, teste in testes.items():
+                linhas.append({'grupo': grupo, 'x': coluna_x, 'y': coluna_y, 'metodo': metodo, 'n': n, **teste})
+    return pd.DataFrame(linhas)
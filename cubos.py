@@ -0,0 +1,147 @@
+# coding: utf-8
+
+# Cubos pré-agregados para os filtros do painel (período, município, tipo de
+# unidade, tipo de gestão e hospital). São montados uma vez, junto com os
+# demais resultados, e cada filtro só soma linhas dos cubos, sem voltar às
+# AIHs nem à grade hospital x dia:
+#   - hospital_mes: uma linha por (id_cnes, mes_ano) com contagens, somas e
+#     somas de quadrados das medidas diárias, somas por AIH, registros de
+#     leitos SUS e as dimensões do hospital no mês;
+#   - cids: AIHs e óbitos por (id_cnes, mes_ano, cid_principal).
+# Médias, desvios e intervalos de confiança saem dessas somas e coincidem
+# com os calculados sobre as linhas. As somas por AIH são aditivas, então os
+# cubos também podem ser atualizados mês a mês (ver atualizar_*).
+
+import numpy as np
+import pandas as pd
+
+CHAVES = ['id_cnes', 'mes_ano']
+DIMENSOES = ['MUNICIPIO', 'DS_TIPO_UNIDADE', 'TIPO_GESTAO']
+MEDIDAS_DIARIAS = ['qtd_entradas', 'total_leitos_sus', 'taxa_ocupacao_diaria_pct', 'taxa_obito_pct']
+COLUNAS_AIH = ['qtd_aih', 'soma_dias_permanencia', 'qtd_obitos']
+
+
+def somar_aih(sih):
+    # AIHs, dias de permanência e óbitos por (id_cnes, mes_ano da internação);
+    # `sih` com a coluna mes_ano (pipeline.filtrar_periodo)
+    return sih.groupby(CHAVES, sort=False).agg(
+        qtd_aih=('obito', 'size'),
+        soma_dias_permanencia=('dias_permanencia', 'sum'),
+        qtd_obitos=('obito', 'sum'),
+    )
+
+
+def montar_cubo_hospital_mes(df_ocupacao_diaria, aih, hospitais):
+    """Cubo hospital x mês a partir da grade diária, das somas de somar_aih e da dimensão de hospitais.
+
+    Para cada medida diária guarda n_ (dias com valor), soma_ e soma2_ (soma
+    dos quadrados). As dimensões vêm do registro de leitos do mês; meses sem
+    registro ficam com os atributos do hospital.
+    """
+    diario = df_ocupacao_diaria[CHAVES + MEDIDAS_DIARIAS].astype({c: np.float64 for c in MEDIDAS_DIARIAS})
+    diario = diario.join(diario[MEDIDAS_DIARIAS].pow(2).add_prefix('soma2_'))
+    grupos = diario.groupby(CHAVES, sort=False)
+    ocupacao = pd.concat([
+        grupos.size().rename('dias'),
+        grupos[MEDIDAS_DIARIAS].count().add_prefix('n_'),
+        grupos[MEDIDAS_DIARIAS].sum().add_prefix('soma_'),
+        grupos[[f'soma2_{c}' for c in MEDIDAS_DIARIAS]].sum(),
+    ], axis=1)
+
+    # registros com leitos SUS, para a contagem de unidades por tipo (pipeline.contar_tipos_unidade)
+    tabela = hospitais.tabela
+    leitos = (tabela[tabela['LEITOS_SUS'] > 0].groupby(['ID_CNES', 'mes_ano_leitos'], sort=False).size()
+              .rename('registros_leitos_sus').rename_axis(CHAVES))
+
+    cubo = pd.concat([ocupacao, aih[COLUNAS_AIH], leitos], axis=1).fillna(0).sort_index().reset_index()
+    inteiras = ['dias', 'registros_leitos_sus'] + COLUNAS_AIH + [f'n_{c}' for c in MEDIDAS_DIARIAS]
+    cubo = cubo.astype({'id_cnes': np.int32, 'mes_ano': np.int32, **{c: np.int64 for c in inteiras}})
+
+    do_mes = hospitais.do_mes(cubo['id_cnes'], cubo['mes_ano'], DIMENSOES)
+    for c in DIMENSOES:
+        codigos = do_mes[c].cat.codes.to_numpy()
+        do_hospital = pd.Categorical(hospitais.atributo(c, cubo['id_cnes']), dtype=do_mes[c].dtype).codes
+        cubo[c] = pd.Categorical.from_codes(np.where(codigos >= 0, codigos, do_hospital), dtype=do_mes[c].dtype)
+    return cubo
+
+
+def montar_cubo_cids(sih):
+    # AIHs e óbitos por (id_cnes, mes_ano, cid_principal); `obito` é a soma dos
+    # óbitos, para usar as funções de pipeline com pesos='qtd_aih'
+    # óbitos em int64: a soma por grupo manteria o int8 de `obito` e poderia estourar
+    return (sih.groupby(CHAVES + ['cid_principal'], sort=True, observed=True)['obito']
+            .agg(qtd_aih='size', obito='sum').astype({'qtd_aih': np.int64, 'obito': np.int64}).reset_index())
+
+
+def atualizar_cubo_hospital_mes(cubo, df_ocupacao_diaria, sih_mes, hospitais):
+    # grade diária já atualizada; as somas por AIH de `sih_mes` são somadas às do cubo
+    aih = cubo.set_index(CHAVES)[COLUNAS_AIH].add(somar_aih(sih_mes), fill_value=0)
+    return montar_cubo_hospital_mes(df_ocupacao_diaria, aih, hospitais)
+
+
+def atualizar_cubo_cids(cubo, sih_mes):
+    novo = pd.concat([cubo, montar_cubo_cids(sih_mes)], ignore_index=True)
+    return novo.groupby(CHAVES + ['cid_principal'], sort=True, observed=True)[['qtd_aih', 'obito']].sum().reset_index()
+
+
+# ### Consultas
+
+def filtrar(cubo, periodo=None, municipios=None, tipos_unidade=None, tipos_gestao=None, cnes=None):
+    """Linhas de `cubo` no período (mes_ano inicial e final, inclusive) e nas seleções.
+
+    Seleções vazias ou None não filtram.
+    """
+    mascara = np.ones(len(cubo), dtype=bool)
+    if periodo is not None:
+        mes_ano = cubo['mes_ano'].to_numpy()
+        mascara &= (mes_ano >= periodo[0]) & (mes_ano <= periodo[1])
+    for coluna, valores in [('MUNICIPIO', municipios), ('DS_TIPO_UNIDADE', tipos_unidade), ('TIPO_GESTAO', tipos_gestao), ('id_cnes', cnes)]:
+        if valores:
+            mascara &= cubo[coluna].isin(list(valores)).to_numpy()
+    return cubo[mascara]
+
+
+def _chave(df):
+    return df['id_cnes'].to_numpy(dtype=np.int64) * 1_000_000 + df['mes_ano'].to_numpy(dtype=np.int64)
+
+
+def filtrar_cids(cubo_cids, hospital_mes):
+    # linhas do cubo de CIDs dos pares (id_cnes, mes_ano) presentes em `hospital_mes` já filtrado
+    return cubo_cids[np.isin(_chave(cubo_cids), _chave(hospital_mes))]
+
+
+def medias_mensais(cubo, coluna, por='DS_TIPO_UNIDADE', ic=True):
+    # média diária de `coluna` por mês e grupo, a partir das somas; o intervalo de confiança
+    # de 95% usa a aproximação normal (média ± 1,96 * erro padrão) em vez de bootstrap
+    somas = cubo.groupby(['mes_ano', por], observed=True)[[f'n_{coluna}', f'soma_{coluna}', f'soma2_{coluna}']].sum()
+    somas = somas[somas[f'n_{coluna}'] > 0]
+    n, soma, soma2 = somas[f'n_{coluna}'], somas[f'soma_{coluna}'], somas[f'soma2_{coluna}']
+    media = soma / n
+    agregado = pd.DataFrame({coluna: media, 'count': n}).reset_index()
+    if ic:
+        # variância amostral; com um único dia fica NaN e o intervalo se reduz à média
+        variancia = ((soma2 - soma * media) / (n - 1).where(n > 1)).clip(lower=0)
+        erro = (1.96 * np.sqrt(variancia) / np.sqrt(n)).to_numpy()
+        agregado['ic_inferior'] = agregado[coluna] - np.nan_to_num(erro)
+        agregado['ic_superior'] = agregado[coluna] + np.nan_to_num(erro)
+    return agregado
+
+
+def medias_por_hospital(cubo):
+    # argumentos de pipeline.montar_stats_de_medias (exceto hospitais)
+    somas = cubo.groupby('id_cnes').sum(numeric_only=True)
+    return {
+        'entrada_stats': somas['soma_qtd_entradas'] / somas['n_qtd_entradas'],
+        'permanencia_stats': somas['soma_dias_permanencia'] / somas['qtd_aih'],
+        'leitos_sus_mean': somas['soma_total_leitos_sus'] / somas['n_total_leitos_sus'],
+        'obitos_mean': somas['qtd_obitos'] / somas['qtd_aih'],
+        'taxa_ocupacao_mean_pct': somas['soma_taxa_ocupacao_diaria_pct'] / somas['n_taxa_ocupacao_diaria_pct'],
+    }
+
+
+def contar_tipos_unidade(cubo):
+    # registros de leitos SUS por tipo de unidade, como pipeline.contar_tipos_unidade
+    contagem = cubo.groupby('DS_TIPO_UNIDADE', observed=True)['registros_leitos_sus'].sum()
+    contagem = contagem[contagem > 0].sort_values(ascending=False, kind='stable')
+    contagem.index = contagem.index.remove_unused_categories()
+    return contagem.rename('count')
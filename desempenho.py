@@ -0,0 +1,111 @@
+# coding: utf-8
+
+# Medição leve de cada etapa do pipeline: tempo de relógio, tempo de CPU,
+# memória residente (RSS) e número de linhas do resultado. O RSS vem de
+# ru_maxrss, que é o pico do processo desde o início, não da etapa:
+# rss_pico_processo_mb é esse pico ao fim da etapa e rss_delta_mb o quanto
+# ele subiu durante a etapa (0 se a etapa ficou abaixo de um pico anterior).
+# O pico por etapa via tracemalloc é opcional, pois deixa as alocações
+# mais lentas.
+#
+#   medicoes = Medicoes()
+#   with medicoes.etapa('ocupacao') as etapa:
+#       df = montar_ocupacao_diaria(...)
+#       etapa['linhas'] = len(df)
+#
+# O painel mostra as medições no expander "Performance"; o modo batch grava
+# desempenho.json e desempenho.csv junto dos artefatos.
+
+import contextlib
+import functools
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def rss_pico_mb():
+    if resource is None:
+        return None
+    # pico de memória residente do processo; ru_maxrss é em KiB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+class Medicoes:
+    """Lista de medições por etapa, na ordem em que as etapas terminam.
+
+    Etapas podem ser aninhadas; `nivel` indica a profundidade. Com
+    `rastrear_memoria=True` cada etapa de primeiro nível também registra o
+    pico de alocações Python/NumPy (tracemalloc) durante a etapa.
+    """
+
+    def __init__(self, rastrear_memoria=False):
+        self.rastrear_memoria = rastrear_memoria
+        self.registros = []
+        self._nivel = 0
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **extras):
+        registro = {'etapa': nome, 'nivel': self._nivel, 'inicio': datetime.now().isoformat(timespec='seconds'), 'linhas': None, **extras}
+        rastrear = self.rastrear_memoria and self._nivel == 0 and not tracemalloc.is_tracing()
+        if rastrear:
+            tracemalloc.start()
+        relogio, cpu, rss_antes = time.perf_counter(), time.process_time(), rss_pico_mb()
+        self._nivel += 1
+        try:
+            yield registro
+        finally:
+            self._nivel -= 1
+            registro['tempo_s'] = round(time.perf_counter() - relogio, 4)
+            registro['cpu_s'] = round(time.process_time() - cpu, 4)
+            registro['rss_pico_processo_mb'] = rss_pico_mb()
+            registro['rss_delta_mb'] = None if rss_antes is None else round(registro['rss_pico_processo_mb'] - rss_antes, 1)
+            if rastrear:
+                registro['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+                tracemalloc.stop()
+            self.registros.append(registro)
+
+    def medir(self, nome=None):
+        # decorador: mede cada chamada e usa len() do resultado como número de linhas
+        def decorador(funcao):
+            @functools.wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.etapa(nome or funcao.__name__) as registro:
+                    resultado = funcao(*args, **kwargs)
+                    registro['linhas'] = contar_linhas(resultado)
+                return resultado
+            return envolvida
+        return decorador
+
+    def executar(self, nome, funcao, *args, **kwargs):
+        return self.medir(nome)(funcao)(*args, **kwargs)
+
+    def para_dataframe(self):
+        colunas = ['etapa', 'nivel', 'tempo_s', 'cpu_s', 'rss_pico_processo_mb', 'rss_delta_mb', 'memoria_pico_mb', 'linhas', 'inicio']
+        df = pd.DataFrame(self.registros)
+        if 'linhas' in df:
+            df['linhas'] = df['linhas'].astype('Int64')
+        return df.reindex(columns=colunas + [c for c in df.columns if c not in colunas])
+
+    def gravar(self, caminho_base):
+        # caminho_base sem extensão: grava <caminho_base>.json e <caminho_base>.csv
+        with open(caminho_base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(self.registros, f, indent=2, ensure_ascii=False, default=str)
+        self.para_dataframe().to_csv(caminho_base + '.csv', index=False)
+
+
+def contar_linhas(resultado):
+    if isinstance(resultado, (pd.DataFrame, pd.Series)):
+        return len(resultado)
+    if isinstance(resultado, tuple):
+        return sum(len(r) for r in resultado if isinstance(r, (pd.DataFrame, pd.Series))) or None
+    return None
@@ -1,19 +1,152 @@
 #%%
-from pysus import SIH
+# Extrai os arquivos RD (AIH reduzida) do SIH via PySUS e grava cada mês em um
+# dataset Parquet particionado no formato Hive: <saida>/uf=XX/ano=AAAA/mes=M/
+#
+# Exemplo:
+#   python extrai-dados-pysus.py --ufs PB PE RN --anos 2023 2024 --saida dados/sih --workers 8
+#
+# Partições já existentes são puladas, então a extração pode ser retomada.
+# Os downloads rodam em um pool de threads e a conversão para Parquet em um
+# pool de processos; cada mês é independente dos demais.
+
+import argparse
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
 import pandas as pd
 
+UFS_NORDESTE = ['AL', 'BA', 'CE', 'MA', 'PB', 'PE', 'PI', 'RN', 'SE']
+
+
+#%%
+def particao_do_arquivo(nome):
+    # RDPB2401.dbc -> ('PB', 2024, 1)
+    m = re.match(r'RD([A-Z]{2})(\d{2})(\d{2})', os.path.basename(str(nome)).upper())
+    if not m:
+        raise ValueError(f'Nome de arquivo RD inesperado: {nome}')
+    uf, aa, mm = m.groups()
+    return uf, 2000 + int(aa), int(mm)
+
+
+def caminho_particao(saida, uf, ano, mes):
+    return os.path.join(saida, f'uf={uf}', f'ano={ano}', f'mes={mes}')
+
+
+def gravar_particao(df, destino):
+    # grava em diretório temporário e renomeia no fim: uma partição só
+    # existe quando foi escrita por completo
+    tmp = destino + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    df.to_parquet(os.path.join(tmp, 'parte-0.parquet'), index=False)
+    os.replace(tmp, destino)
+
+
+def baixar(sih, arquivo):
+    # o PySUS devolve um único ParquetSet quando recebe só um arquivo
+    baixados = sih.download([arquivo])
+    return baixados[0] if isinstance(baixados, list) else baixados
+
+
+def baixar_com_retentativas(sih, arquivo, tentativas=3, espera=2.0):
+    # backoff exponencial: espera, 2*espera, 4*espera...
+    inicio = time.perf_counter()
+    for tentativa in range(1, tentativas + 1):
+        try:
+            parquet = baixar(sih, arquivo)
+            return parquet, time.perf_counter() - inicio
+        except Exception as erro:
+            if tentativa == tentativas:
+                raise
+            atraso = espera * 2 ** (tentativa - 1)
+            print(f'{arquivo.name}: falha na tentativa {tentativa} ({erro}), nova tentativa em {atraso:.0f}s')
+            time.sleep(atraso)
+
+
+def converter(origem, destino):
+    # executada em outro processo: lê o Parquet baixado e grava a partição
+    inicio = time.perf_counter()
+    df = pd.read_parquet(origem)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    gravar_particao(df, destino)
+    return len(df), time.perf_counter() - inicio
+
+
+def extrair(ufs, anos, meses, saida, workers=4, tentativas=3, sih=None, espera=2.0):
+    # `sih` pode ser qualquer objeto com get_files/download (ex.: um substituto local);
+    # o PySUS só é importado quando não há substituto
+    if sih is None:
+        from pysus import SIH
+        sih = SIH().load() # Loads the files from DATASUS
+    arquivos = sih.get_files('RD', uf=ufs, year=anos, month=meses)
+
+    pendentes = []
+    for arquivo in arquivos:
+        destino = caminho_particao(saida, *particao_do_arquivo(arquivo.name))
+        if os.path.exists(destino):
+            print(f'{arquivo.name}: partição já existe, pulando')
+        else:
+            pendentes.append((arquivo, destino))
+
+    total = len(pendentes)
+    falhas = []
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as downloads, ProcessPoolExecutor(max_workers=workers) as conversoes:
+        futuros_download = {
+            downloads.submit(baixar_com_retentativas, sih, arquivo, tentativas, espera): (arquivo, destino)
+            for arquivo, destino in pendentes
+        }
+        futuros_conversao = {}
+        for futuro in as_completed(futuros_download):
+            arquivo, destino = futuros_download[futuro]
+            try:
+                parquet, duracao = futuro.result()
+            except Exception as erro:
+                print(f'{arquivo.name}: download falhou ({erro})')
+                falhas.append(arquivo.name)
+                continue
+            print(f'{arquivo.name}: baixado em {duracao:.1f}s')
+            futuros_conversao[conversoes.submit(converter, str(parquet.path), destino)] = arquivo
+
+        for concluidos, futuro in enumerate(as_completed(futuros_conversao), start=1):
+            arquivo = futuros_conversao[futuro]
+            try:
+                linhas, duracao = futuro.result()
+            except Exception as erro:
+                print(f'{arquivo.name}: conversão falhou ({erro})')
+                falhas.append(arquivo.name)
+                continue
+            print(f'[{concluidos}/{total}] {arquivo.name}: {linhas} linhas gravadas em {duracao:.1f}s')
+
+    print(f'{total - len(falhas)}/{total} arquivos extraídos em {time.perf_counter() - inicio:.1f}s')
+    return falhas
+
+
 #%%
-sih = SIH().load() # Loads the files from DATASUS
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extrai dados do SIH/RD via PySUS para Parquet particionado.')
+    parser.add_argument('--ufs', nargs='+', default=['PB'],
+                        help="UFs a extrair (use 'NE' para todo o Nordeste)")
+    parser.add_argument('--anos', nargs='+', type=int, default=[2024])
+    parser.add_argument('--meses', nargs='+', type=int, default=list(range(1, 13)))
+    parser.add_argument('--saida', default=os.path.join('dados', 'sih'))
+    parser.add_argument('--workers', type=int, default=4,
+                        help='downloads e conversões simultâneos')
+    parser.add_argument('--tentativas', type=int, default=3,
+                        help='tentativas de download por arquivo')
+    args = parser.parse_args(argv)
 
-files = sih.get_files("RD", uf="PB", year=2024)
-parquets = sih.download(files)
+    ufs = []
+    for uf in args.ufs:
+        ufs.extend(UFS_NORDESTE if uf.upper() == 'NE' else [uf.upper()])
 
-# %%
-df = pd.DataFrame()
-for parquet in parquets:
-    df = pd.concat([df, parquet.to_dataframe()])
+    falhas = extrair(ufs, args.anos, args.meses, args.saida, workers=args.workers, tentativas=args.tentativas)
+    if falhas:
+        raise SystemExit(f'Falha em {len(falhas)} arquivo(s): {", ".join(falhas)}')
 
-# %%
-df.to_csv('dados/dados_sih_pb_2024.csv', index=False)
 
-# %%
+if __name__ == '__main__':
+    main()
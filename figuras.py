@@ -0,0 +1,104 @@
+# coding: utf-8
+
+# Cache de figuras renderizadas. Cada figura é desenhada uma única vez por
+# combinação de dados (impressão digital) e parâmetros do gráfico; as
+# execuções seguintes do painel só leem os bytes PNG/SVG do disco. Cada
+# filtro do painel gera uma impressão nova, então o diretório tem um teto
+# (MAX_MB_FIGURAS): passando dele, as figuras usadas há mais tempo são
+# apagadas. `python -m artefatos limpar-cache` apaga todas.
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from carregamento import DIR_CACHE
+
+DIR_FIGURAS = os.path.join(DIR_CACHE, 'figuras')
+MAX_MB_FIGURAS = 200
+
+
+def renderizar(fig, formato='png', dpi=100):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=formato, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def chave_figura(nome, impressao, params):
+    conteudo = json.dumps({'nome': nome, 'impressao': impressao, 'params': params, 'matplotlib': matplotlib.__version__},
+                          sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:20]
+
+
+def figura_em_cache(nome, desenhar, impressao, formato='png', dir_figuras=DIR_FIGURAS, **params):
+    """Bytes da figura `nome`; `desenhar(**params)` só é chamada se não houver cache.
+
+    `impressao` identifica os dados usados no gráfico (ver
+    pipeline.impressao_digital); dados novos geram uma nova entrada.
+    """
+    os.makedirs(dir_figuras, exist_ok=True)
+    caminho = os.path.join(dir_figuras, f'{nome}-{chave_figura(nome, impressao, params)}.{formato}')
+    if os.path.exists(caminho):
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+        # a data de modificação marca o último uso (ver podar)
+        with contextlib.suppress(OSError):
+            os.utime(caminho)
+        return conteudo
+
+    conteudo = renderizar(desenhar(**params), formato=formato)
+    tmp = caminho + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+    podar(dir_figuras)
+    return conteudo
+
+
+def podar(dir_figuras=DIR_FIGURAS):
+    # apaga as figuras usadas há mais tempo até o diretório caber em MAX_MB_FIGURAS
+    entradas = []
+    for entrada in os.scandir(dir_figuras):
+        if entrada.is_file() and not entrada.name.endswith('.tmp'):
+            info = entrada.stat()
+            entradas.append((info.st_mtime_ns, info.st_size, entrada.path))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= MAX_MB_FIGURAS * 2 ** 20:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(caminho)
+        total -= tamanho
+
+
+def limpar_cache(dir_figuras=None):
+    shutil.rmtree(dir_figuras or DIR_FIGURAS, ignore_errors=True)
+
+
+def grafico_linha_mensal(medias, coluna, titulo, ylabel, por='DS_TIPO_UNIDADE', x='mes_ano'):
+    # equivalente ao sns.lineplot(hue=por, marker='o'), desenhado sobre as médias já agregadas
+    fig, ax = plt.subplots(figsize=(10, 6))
+    rotulos = sorted(medias[x].astype(str).unique())
+    posicao = {rotulo: i for i, rotulo in enumerate(rotulos)}
+    cores = sns.color_palette('bright')
+    for i, (grupo, dados) in enumerate(medias.groupby(por, observed=True)):
+        dados = dados.sort_values(x)
+        xs = dados[x].astype(str).map(posicao)
+        ax.plot(xs, dados[coluna], marker='o', label=grupo, color=cores[i % len(cores)])
+        if 'ic_inferior' in dados:
+            ax.fill_between(xs, dados['ic_inferior'], dados['ic_superior'], alpha=0.2, color=cores[i % len(cores)])
+    ax.set_xticks(range(len(rotulos)), rotulos)
+    ax.set_title(titulo)
+    ax.set_xlabel(x)
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    ax.tick_params(axis='x', rotation=45)
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig
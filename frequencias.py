@@ -0,0 +1,89 @@
+# coding: utf-8
+
+# Valores mais frequentes por grupo (ex.: top-K CIDs por hospital, município
+# ou tipo de unidade) sem ordenar a tabela inteira: as combinações
+# grupo x valor são contadas sobre códigos inteiros e, em cada grupo, só os K
+# maiores são selecionados com argpartition.
+
+import numpy as np
+import pandas as pd
+
+# acima disso a contagem usa np.unique em vez de uma bincount densa grupo x valor
+MAX_CELULAS_BINCOUNT = 50_000_000
+
+
+def _codificar(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int64), serie.cat.categories
+    codigos, rotulos = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), rotulos
+
+
+def _contar_pares(codigos_grupo, codigos_valor, n_grupos, n_valores, pesos=None):
+    # contagem (ou soma de `pesos` inteiros) de cada par (grupo, valor) presente, em ordem de grupo
+    chaves = codigos_grupo * n_valores + codigos_valor
+    if n_grupos * n_valores <= MAX_CELULAS_BINCOUNT:
+        contagem = np.bincount(chaves, weights=pesos, minlength=n_grupos * n_valores)
+        chaves = np.flatnonzero(contagem)
+        contagem = contagem[chaves]
+    elif pesos is None:
+        chaves, contagem = np.unique(chaves, return_counts=True)
+    else:
+        chaves, inverso = np.unique(chaves, return_inverse=True)
+        contagem = np.bincount(inverso, weights=pesos)
+    return chaves // n_valores, chaves % n_valores, contagem.astype(np.int64)
+
+
+def mais_frequentes_por_grupo(df, grupo, valor, k=10, nome_contagem='qtd', nome_participacao='participacao', pesos=None):
+    """Os `k` valores mais frequentes de `valor` em cada grupo.
+
+    `grupo` é uma coluna ou lista de colunas. Devolve uma linha por grupo e
+    posição (1 a k) com a contagem e a participação do valor no total do
+    grupo; empates ficam com o menor código (ordem das categorias). Linhas
+    com grupo ou valor ausente são ignoradas. Com `pesos` (coluna de
+    contagens inteiras, ex.: um cubo já agregado) cada linha conta o seu peso.
+    """
+    grupos = [grupo] if isinstance(grupo, str) else list(grupo)
+    if len(grupos) == 1:
+        codigos_grupo, rotulos_grupo = _codificar(df[grupos[0]])
+        rotulos_grupo = pd.DataFrame({grupos[0]: rotulos_grupo})
+    else:
+        # o factorize do MultiIndex trata NaN como um nível comum; descarta-se à parte
+        completos = df[grupos].notna().all(axis=1).to_numpy()
+        codigos, rotulos_grupo = pd.MultiIndex.from_frame(df.loc[completos, grupos]).factorize(sort=True)
+        codigos_grupo = np.full(len(df), -1, dtype=np.int64)
+        codigos_grupo[completos] = codigos
+        rotulos_grupo = rotulos_grupo.to_frame(index=False, name=grupos)
+    codigos_valor, rotulos_valor = _codificar(df[valor])
+
+    validos = (codigos_grupo >= 0) & (codigos_valor >= 0)
+    n_grupos, n_valores = len(rotulos_grupo), len(rotulos_valor)
+    pesos = None if pesos is None else df[pesos].to_numpy(dtype=np.float64)[validos]
+    par_grupo, par_valor, contagem = _contar_pares(codigos_grupo[validos], codigos_valor[validos], n_grupos, n_valores, pesos)
+
+    # chave de ordenação sem empates: contagem maior primeiro, depois o menor código
+    prioridade = contagem * n_valores + (n_valores - 1 - par_valor)
+    limites = np.flatnonzero(np.diff(par_grupo, prepend=-1, append=n_grupos))
+    selecionados = []
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        segmento = prioridade[inicio:fim]
+        if len(segmento) > k:
+            escolhidos = np.argpartition(-segmento, k - 1)[:k]
+        else:
+            escolhidos = np.arange(len(segmento))
+        selecionados.append(inicio + escolhidos[np.argsort(-segmento[escolhidos])])
+    selecionados = np.concatenate(selecionados) if selecionados else np.zeros(0, dtype=np.int64)
+
+    grupo_sel = par_grupo[selecionados]
+    total_grupo = np.bincount(par_grupo, weights=contagem, minlength=n_grupos)
+    posicao = np.arange(len(selecionados)) - np.searchsorted(grupo_sel, grupo_sel)
+    valores = rotulos_valor[par_valor[selecionados]]
+    if isinstance(df[valor].dtype, pd.CategoricalDtype):
+        valores = pd.Categorical(valores, dtype=df[valor].dtype)
+
+    resultado = rotulos_grupo.iloc[grupo_sel].reset_index(drop=True)
+    resultado[valor] = valores
+    resultado['posicao'] = posicao + 1
+    resultado[nome_contagem] = contagem[selecionados]
+    resultado[nome_participacao] = contagem[selecionados] / total_grupo[grupo_sel]
+    return resultado
@@ -0,0 +1,83 @@
+# coding: utf-8
+
+# Dimensão de hospitais, montada uma única vez a partir da tabela de
+# Hospitais e Leitos já limpa (pipeline.limpar_hospitais_leitos). Todas as
+# junções por CNES passam por aqui, com o CNES sempre em int32 (o mesmo tipo
+# do SIH, ver carregamento.ESQUEMA_SIH).
+
+import numpy as np
+import pandas as pd
+
+ATRIBUTOS = ['NOME_ESTABELECIMENTO', 'MUNICIPIO', 'DS_TIPO_UNIDADE', 'TIPO_GESTAO']
+COLUNAS_MES = ['LEITOS_SUS', 'DS_TIPO_UNIDADE', 'MUNICIPIO', 'TIPO_GESTAO']
+
+
+def _chave(id_cnes, mes_ano):
+    # CNES tem 7 dígitos e mes_ano é AAAAMM
+    return np.asarray(id_cnes, dtype=np.int64) * 1_000_000 + np.asarray(mes_ano, dtype=np.int64)
+
+
+class DimensaoHospitais:
+    """Atributos por hospital e leitos por (CNES, competência).
+
+    `atributos` é indexado por id_cnes (ordenado); `por_mes` guarda uma linha
+    por (id_cnes, mes_ano), ordenada pela mesma chave usada nas buscas com
+    searchsorted. Linhas repetidas de um mesmo hospital e mês ficam com a
+    primeira ocorrência.
+    """
+
+    def __init__(self, hospital_e_leitos):
+        tabela = hospital_e_leitos.assign(
+            ID_CNES=hospital_e_leitos['ID_CNES'].astype(np.int32),
+            mes_ano_leitos=hospital_e_leitos['mes_ano_leitos'].astype(np.int32),
+        )
+        self.tabela = tabela
+
+        self.atributos = (tabela.groupby('ID_CNES', sort=True)[[c for c in ATRIBUTOS if c in tabela]].first()
+                          .rename_axis('id_cnes'))
+
+        por_mes = tabela[['ID_CNES', 'mes_ano_leitos'] + [c for c in COLUNAS_MES if c in tabela]].rename(columns={'ID_CNES': 'id_cnes', 'mes_ano_leitos': 'mes_ano'})
+        chaves = _chave(por_mes['id_cnes'], por_mes['mes_ano'])
+        ordem = np.argsort(chaves, kind='stable')
+        chaves = chaves[ordem]
+        unicas = np.concatenate([[True], chaves[1:] != chaves[:-1]]) if len(chaves) else np.ones(0, dtype=bool)
+        self._chaves = chaves[unicas]
+        self.por_mes = por_mes.iloc[ordem[unicas]].reset_index(drop=True)
+
+    def posicoes(self, id_cnes, mes_ano):
+        # linha de por_mes de cada par (id_cnes, mes_ano), ou -1 se não houver
+        alvo = _chave(id_cnes, mes_ano)
+        if not len(self._chaves):
+            return np.full(len(alvo), -1)
+        posicao = np.minimum(np.searchsorted(self._chaves, alvo), len(self._chaves) - 1)
+        return np.where(self._chaves[posicao] == alvo, posicao, -1)
+
+    def do_mes(self, id_cnes, mes_ano, colunas=None):
+        # colunas de por_mes alinhadas aos pares pedidos (NaN onde não há registro)
+        colunas = self.por_mes.columns[2:] if colunas is None else colunas
+        posicao = self.posicoes(id_cnes, mes_ano)
+        encontradas = posicao >= 0
+        resultado = {}
+        linhas = np.where(encontradas, posicao, 0)
+        for c in colunas:
+            serie = self.por_mes[c]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                # categorias continuam categorias; código -1 é ausente
+                codigos = np.where(encontradas, serie.cat.codes.to_numpy()[linhas], -1)
+                resultado[c] = pd.Categorical.from_codes(codigos, dtype=serie.dtype)
+                continue
+            valores = serie.to_numpy()[linhas]
+            valores = valores.astype(np.float64) if valores.dtype.kind in 'iubf' else valores.astype(object)
+            valores[~encontradas] = np.nan
+            resultado[c] = valores
+        return pd.DataFrame(resultado)
+
+    def atributo(self, coluna, id_cnes):
+        return self.atributos[coluna].reindex(np.asarray(id_cnes, dtype=np.int32)).values
+
+    def juntar_atributos(self, df, colunas, cnes='id_cnes', nomes=None):
+        # acrescenta a `df` os atributos do hospital de cada linha;
+        # com cnes=None o CNES é o índice de `df`
+        nomes = nomes or {}
+        chaves = df.index if cnes is None else df[cnes]
+        return df.assign(**{nomes.get(c, c): self.atributo(c, chaves) for c in colunas})
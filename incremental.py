@@ -0,0 +1,122 @@
+# coding: utf-8
+
+# Atualização incremental da ocupação e das estatísticas por hospital.
+# O SIH é publicado por mês de competência (MES_CMPT). Em vez de reprocessar o
+# ano inteiro a cada mês, guardamos um estado com estatísticas somáveis:
+#   - grade hospital x dia com entradas, saídas, óbitos e leitos ocupados
+#     (a contribuição de cada AIH ao censo é aditiva, inclusive em dias de
+#     meses anteriores);
+#   - por hospital, quantidade de AIHs e somas de dias de permanência e óbitos.
+# Cada novo mês só processa as próprias AIHs e soma o resultado ao estado.
+# O `build` grava o estado das competências que processou (estado_inicial), e
+# `atualizar` só soma meses a um estado que cobre os artefatos existentes.
+# pipeline.montar_ocupacao_e_stats monta df_ocupacao_diaria e df_stats do estado.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from ocupacao import aaaammdd_para_dias, dias_para_aaaammdd, ocupacao_diaria
+
+COLUNAS_GRADE = ['qtd_entradas', 'qtd_saidas', 'qtd_obitos', 'leitos_ocupados']
+COLUNAS_HOSPITAL = ['qtd_aih', 'soma_dias_permanencia', 'soma_obitos']
+
+
+def estado_vazio(inicio):
+    return {
+        'inicio': inicio,
+        'competencias': [],
+        'grade': pd.DataFrame(columns=['id_cnes', 'data'] + COLUNAS_GRADE).astype(np.int32),
+        'hospitais': pd.DataFrame(columns=COLUNAS_HOSPITAL, index=pd.Index([], name='id_cnes')).astype(np.int64),
+    }
+
+
+def _densificar(grade, inicio):
+    # todos os hospitais em todos os dias, do início do período ao último dia visto
+    dias = np.arange(aaaammdd_para_dias([inicio])[0], aaaammdd_para_dias([grade['data'].max()])[0] + 1)
+    indice = pd.MultiIndex.from_product(
+        [np.sort(grade['id_cnes'].unique()), dias_para_aaaammdd(dias)],
+        names=['id_cnes', 'data'],
+    )
+    grade = grade.set_index(['id_cnes', 'data']).reindex(indice, fill_value=0).reset_index()
+    return grade.astype({'id_cnes': np.int32, 'data': np.int32, **{c: np.int32 for c in COLUNAS_GRADE}})
+
+
+def _somar(estado, sih_mes):
+    # soma ao estado as AIHs de `sih_mes` (limpo, sem filtro de período), sem mexer nas competências
+    inicio = estado['inicio']
+    if sih_mes.empty:
+        return estado
+
+    grade_mes = ocupacao_diaria(sih_mes, inicio=inicio)[['id_cnes', 'data'] + COLUNAS_GRADE]
+    grade = pd.concat([estado['grade'], grade_mes]).groupby(['id_cnes', 'data'], as_index=False)[COLUNAS_GRADE].sum()
+
+    # médias por hospital só consideram internações a partir do início do período
+    periodo = sih_mes[sih_mes['dt_internacao'] >= inicio]
+    hospitais_mes = periodo.groupby('id_cnes').agg(
+        qtd_aih=('obito', 'size'),
+        soma_dias_permanencia=('dias_permanencia', 'sum'),
+        soma_obitos=('obito', 'sum'),
+    )
+    hospitais = estado['hospitais'].add(hospitais_mes, fill_value=0).astype(np.int64)
+
+    return {
+        'inicio': inicio,
+        'competencias': estado['competencias'],
+        'grade': _densificar(grade, inicio),
+        'hospitais': hospitais,
+    }
+
+
+def atualizar(estado, sih_mes, competencia):
+    """Soma ao estado as AIHs de uma competência ('AAAA-MM') e devolve o novo estado.
+
+    `sih_mes` já limpo (pipeline.limpar_sih), sem filtro de período. Uma
+    competência já processada é ignorada.
+    """
+    if competencia in estado['competencias']:
+        return estado
+    return {**_somar(estado, sih_mes), 'competencias': sorted(estado['competencias'] + [competencia])}
+
+
+def estado_inicial(lotes, inicio, competencias):
+    """Estado com as AIHs de `lotes` (DataFrames limpos, ex.: [sih]), já somadas como `competencias`.
+
+    É o estado que o `build` grava junto dos artefatos: a grade e as somas são
+    aditivas, então o SIH pode vir em lotes.
+    """
+    estado = estado_vazio(inicio)
+    for lote in lotes:
+        estado = _somar(estado, lote)
+    return {**estado, 'competencias': sorted(competencias)}
+
+
+def competencias_ate(ano, ultimo_mes_cmpt):
+    # competências 'AAAA-MM' de janeiro até ultimo_mes_cmpt
+    return [f'{ano}-{mes:02d}' for mes in range(1, ultimo_mes_cmpt + 1)]
+
+
+def carregar_estado(diretorio, inicio):
+    caminho = os.path.join(diretorio, 'estado.json')
+    if not os.path.exists(caminho):
+        return estado_vazio(inicio)
+    with open(caminho, encoding='utf-8') as f:
+        metadados = json.load(f)
+    if metadados['inicio'] != inicio:
+        raise ValueError(f"Estado em {diretorio} começa em {metadados['inicio']}, não em {inicio}")
+    return {
+        **metadados,
+        'grade': pd.read_parquet(os.path.join(diretorio, 'grade.parquet')),
+        'hospitais': pd.read_parquet(os.path.join(diretorio, 'hospitais.parquet')),
+    }
+
+
+def gravar_estado(estado, diretorio):
+    os.makedirs(diretorio, exist_ok=True)
+    estado['grade'].to_parquet(os.path.join(diretorio, 'grade.parquet'), index=False)
+    estado['hospitais'].to_parquet(os.path.join(diretorio, 'hospitais.parquet'))
+    # estado.json por último: lista as competências já somadas às tabelas acima
+    with open(os.path.join(diretorio, 'estado.json'), 'w', encoding='utf-8') as f:
+        json.dump({'inicio': estado['inicio'], 'competencias': estado['competencias']}, f, indent=2)
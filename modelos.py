@@ -0,0 +1,271 @@
+# coding: utf-8
+
+# Regressão logística sobre matrizes esparsas, para bases com muitos
+# municípios e milhões de AIHs. As variáveis categóricas viram colunas
+# one-hot em uma matriz CSR (scipy.sparse) com vocabulário persistido, e o
+# desbalanceamento das classes é tratado com pesos em vez de SMOTE.
+# Para os modelos densos, etapas_balanceamento escolhe entre pesos,
+# subamostragem e SMOTE sobre uma amostra de tamanho limitado.
+
+import json
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import sklearn.model_selection as ms
+from imblearn import FunctionSampler
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import RandomUnderSampler
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.class_weight import compute_class_weight
+
+
+class CodificadorEsparso(BaseEstimator, TransformerMixin):
+    """Codifica colunas numéricas e categóricas em uma matriz CSR.
+
+    As numéricas são padronizadas (média 0, desvio 1) com os parâmetros do
+    ajuste; cada categoria vista no ajuste vira uma coluna 0/1. Categorias
+    novas na transformação ficam com todas as colunas zeradas.
+    """
+
+    def __init__(self, numericas=(), categoricas=()):
+        self.numericas = numericas
+        self.categoricas = categoricas
+
+    def fit(self, X, y=None):
+        for atributo in ('n_', 'soma_', 'soma_quadrados_', 'vocabulario_'):
+            if hasattr(self, atributo):
+                delattr(self, atributo)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        # acumula contagens, somas e categorias; permite ajustar o codificador
+        # lote a lote (ver ajustar_sgd_em_lotes)
+        if not hasattr(self, 'n_'):
+            self.n_ = {c: 0 for c in self.numericas}
+            self.soma_ = {c: 0.0 for c in self.numericas}
+            self.soma_quadrados_ = {c: 0.0 for c in self.numericas}
+            self.vocabulario_ = {c: [] for c in self.categoricas}
+        for c in self.numericas:
+            valores = X[c].to_numpy(dtype=np.float64)
+            valores = valores[~np.isnan(valores)]
+            self.n_[c] += len(valores)
+            self.soma_[c] += float(valores.sum())
+            self.soma_quadrados_[c] += float((valores ** 2).sum())
+        for c in self.categoricas:
+            novas = pd.unique(X[c].dropna().astype(str))
+            self.vocabulario_[c] = sorted(set(self.vocabulario_[c]).union(novas))
+
+        self.media_ = {c: self.soma_[c] / self.n_[c] if self.n_[c] else 0.0 for c in self.numericas}
+        self.desvio_ = {}
+        for c in self.numericas:
+            variancia = self.soma_quadrados_[c] / self.n_[c] - self.media_[c] ** 2 if self.n_[c] else 0.0
+            self.desvio_[c] = float(np.sqrt(max(variancia, 0.0))) or 1.0
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        nomes = list(self.numericas)
+        for c in self.categoricas:
+            nomes += [f'{c}_{valor}' for valor in self.vocabulario_[c]]
+        return np.array(nomes, dtype=object)
+
+    def transform(self, X):
+        n = len(X)
+        blocos = []
+        if self.numericas:
+            numericas = np.column_stack([
+                (X[c].to_numpy(dtype=np.float64) - self.media_[c]) / self.desvio_[c] for c in self.numericas
+            ])
+            blocos.append(sp.csr_matrix(numericas))
+        for c in self.categoricas:
+            vocabulario = self.vocabulario_[c]
+            codigos = pd.Categorical(X[c].astype(str), categories=vocabulario).codes
+            conhecidas = codigos >= 0
+            linhas = np.flatnonzero(conhecidas)
+            blocos.append(sp.csr_matrix(
+                (np.ones(len(linhas)), (linhas, codigos[conhecidas])),
+                shape=(n, len(vocabulario)),
+            ))
+        return sp.hstack(blocos, format='csr')
+
+    def salvar_vocabulario(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump({
+                'numericas': list(self.numericas),
+                'categoricas': list(self.categoricas),
+                'media': self.media_,
+                'desvio': self.desvio_,
+                'vocabulario': self.vocabulario_,
+            }, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def carregar_vocabulario(cls, caminho):
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        codificador = cls(numericas=tuple(dados['numericas']), categoricas=tuple(dados['categoricas']))
+        codificador.media_ = dados['media']
+        codificador.desvio_ = dados['desvio']
+        codificador.vocabulario_ = dados['vocabulario']
+        return codificador
+
+
+class CodificadorDummies(BaseEstimator, TransformerMixin):
+    """Dummies (pd.get_dummies com drop_first) com as colunas fixadas no ajuste.
+
+    Na transformação as categorias ausentes no ajuste, assim como a de
+    referência, ficam com todas as colunas zeradas; as demais colunas passam
+    sem alteração.
+    """
+
+    def __init__(self, categoricas=()):
+        self.categoricas = categoricas
+
+    def fit(self, X, y=None):
+        self.colunas_ = list(pd.get_dummies(X, columns=list(self.categoricas), drop_first=True).columns)
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(self.colunas_, dtype=object)
+
+    def transform(self, X):
+        dummies = pd.get_dummies(X, columns=list(self.categoricas), dtype=np.float64)
+        return dummies.reindex(columns=self.colunas_, fill_value=0.0).astype(np.float64)
+
+
+BALANCEAMENTOS = ['pesos', 'subamostragem', 'smote']
+
+
+def _amostrar(X, y, max_amostras, semente):
+    # amostra estratificada de no máximo max_amostras linhas
+    if len(y) <= max_amostras:
+        return X, y
+    indices = ms.train_test_split(np.arange(len(y)), train_size=max_amostras, stratify=y, random_state=semente)[0]
+    return X[indices], y[indices]
+
+
+def etapas_balanceamento(balanceamento='smote', max_amostras=200_000, k_vizinhos=5, semente=0):
+    """Etapas de reamostragem (imblearn) e class_weight do modelo para cada estratégia.
+
+    - 'pesos': sem reamostragem, class_weight='balanced';
+    - 'subamostragem': a classe majoritária é reduzida ao tamanho da minoritária;
+    - 'smote': SMOTE sobre uma amostra estratificada de no máximo
+      `max_amostras` linhas, com vizinhos por k-d tree. O custo do k-NN fica
+      limitado pela amostra e não cresce com o número de AIHs.
+
+    As etapas só atuam no ajuste (imblearn.pipeline.Pipeline); a previsão
+    usa as linhas como vieram.
+    """
+    if balanceamento == 'pesos':
+        return [], 'balanced'
+    if balanceamento == 'subamostragem':
+        return [('subamostragem', RandomUnderSampler(random_state=semente))], None
+    if balanceamento == 'smote':
+        vizinhos = NearestNeighbors(n_neighbors=k_vizinhos + 1, algorithm='kd_tree')
+        return [
+            ('amostra', FunctionSampler(func=_amostrar, kw_args={'max_amostras': max_amostras, 'semente': semente})),
+            ('smote', SMOTE(k_neighbors=vizinhos, random_state=semente)),
+        ], None
+    raise ValueError(f'Balanceamento desconhecido: {balanceamento} (opções: {", ".join(BALANCEAMENTOS)})')
+
+
+def _lotes(n, tamanho_lote, semente):
+    ordem = np.random.default_rng(semente).permutation(n)
+    for inicio in range(0, n, tamanho_lote):
+        yield ordem[inicio:inicio + tamanho_lote]
+
+
+def ajustar_sgd(x, y, epocas=5, tamanho_lote=50_000, alpha=1e-4, semente=0):
+    # regressão logística por SGD em mini-lotes (partial_fit); os pesos
+    # 'balanced' entram como sample_weight, pois partial_fit não aceita class_weight
+    classes = np.unique(y)
+    pesos_classe = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y)))
+    pesos = np.vectorize(pesos_classe.get)(y)
+    modelo = SGDClassifier(loss='log_loss', alpha=alpha, random_state=semente)
+    for epoca in range(epocas):
+        for lote in _lotes(x.shape[0], tamanho_lote, semente + epoca):
+            modelo.partial_fit(x[lote], y[lote], classes=classes, sample_weight=pesos[lote])
+    return modelo
+
+
+def ajustar_logistica_esparsa(df, alvo, numericas, categoricas, solver='saga', max_iter=2000, test_size=0.2, random_state=0):
+    """Ajusta a regressão logística com codificação esparsa.
+
+    `solver='saga'` usa LogisticRegression (aceita CSR diretamente);
+    `solver='sgd'` treina em mini-lotes com partial_fit. Devolve o modelo,
+    o codificador e os dados de teste já codificados.
+    """
+    indices = np.arange(len(df))
+    treino, teste = ms.train_test_split(indices, test_size=test_size, random_state=random_state)
+    y = df[alvo].to_numpy()
+
+    codificador = CodificadorEsparso(numericas=tuple(numericas), categoricas=tuple(categoricas))
+    x_train = codificador.fit(df.iloc[treino]).transform(df.iloc[treino])
+    x_test = codificador.transform(df.iloc[teste])
+
+    if solver == 'sgd':
+        modelo = ajustar_sgd(x_train, y[treino], semente=random_state)
+    else:
+        modelo = LogisticRegression(solver='saga', class_weight='balanced', max_iter=max_iter, random_state=random_state)
+        modelo.fit(x_train, y[treino])
+
+    return {
+        'modelo': modelo,
+        'codificador': codificador,
+        'colunas': codificador.get_feature_names_out(),
+        'x_test': x_test,
+        'y_test': y[teste],
+    }
+
+
+def _separar_teste(n, test_size, semente, numero_lote):
+    # sorteio reprodutível por lote: a mesma AIH cai no teste em todas as passadas
+    return np.random.default_rng([semente, numero_lote]).random(n) < test_size
+
+
+def ajustar_sgd_em_lotes(gerar_lotes, alvo, numericas, categoricas, epocas=5, alpha=1e-4, test_size=0.2, random_state=0):
+    """Regressão logística por SGD sem carregar todas as AIHs na memória.
+
+    `gerar_lotes()` devolve um iterador novo de DataFrames a cada chamada
+    (ver atributos.lotes_de_atributos); os lotes são percorridos uma vez para
+    ajustar o codificador e os pesos das classes, `epocas` vezes para treinar
+    e uma última vez para avaliar. Só os rótulos e as previsões do conjunto
+    de teste ficam em memória.
+    """
+    codificador = CodificadorEsparso(numericas=tuple(numericas), categoricas=tuple(categoricas))
+    contagem = pd.Series(dtype=np.int64)
+    for i, lote in enumerate(gerar_lotes()):
+        treino = lote[~_separar_teste(len(lote), test_size, random_state, i)]
+        codificador.partial_fit(treino)
+        contagem = contagem.add(treino[alvo].value_counts(), fill_value=0)
+
+    classes = np.sort(contagem.index.to_numpy())
+    # mesmo cálculo de class_weight='balanced'
+    pesos_classe = contagem.sum() / (len(classes) * contagem)
+    modelo = SGDClassifier(loss='log_loss', alpha=alpha, random_state=random_state)
+    for epoca in range(epocas):
+        for i, lote in enumerate(gerar_lotes()):
+            treino = lote[~_separar_teste(len(lote), test_size, random_state, i)]
+            if len(treino):
+                y = treino[alvo].to_numpy()
+                modelo.partial_fit(codificador.transform(treino), y, classes=classes,
+                                   sample_weight=pesos_classe.reindex(y).to_numpy())
+
+    distribuicao = pd.Series(dtype=np.int64)
+    y_test, y_pred = [], []
+    for i, lote in enumerate(gerar_lotes()):
+        distribuicao = distribuicao.add(lote[alvo].value_counts(), fill_value=0)
+        teste = lote[_separar_teste(len(lote), test_size, random_state, i)]
+        if len(teste):
+            y_test.append(teste[alvo].to_numpy())
+            y_pred.append(modelo.predict(codificador.transform(teste)))
+
+    return {
+        'modelo': modelo,
+        'codificador': codificador,
+        'colunas': codificador.get_feature_names_out(),
+        'distribuicao': distribuicao.astype(np.int64).sort_values(ascending=False).rename_axis(alvo).rename('count'),
+        'y_test': np.concatenate(y_test),
+        'y_pred': np.concatenate(y_pred),
+    }
@@ -0,0 +1,250 @@
+# coding: utf-8
+
+# Motor opcional das agregações em SQL, com DuckDB embutido no processo (sem
+# servidor). As mesmas contas de ocupacao.py, pipeline.calcular_stats,
+# pipeline.contar_tipos_unidade e dos cubos de cubos.py rodam direto sobre o
+# Parquet do SIH: o dataset particionado de extrai-dados-pysus.py
+# (uf=/ano=/mes=, com os filtros de partição empurrados para a leitura) ou um
+# DataFrame já carregado. A varredura usa todos os núcleos e o DuckDB grava
+# em disco o que não couber na memória.
+#
+# Os resultados são os mesmos do caminho em pandas (ver
+# tests/test_motor_duckdb.py). Escolha do motor:
+#   SUPERLOTACAO_MOTOR=duckdb streamlit run relatorio.py
+#   python -m artefatos build --sih dados/sih --motor duckdb
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import cubos
+import pipeline
+from carregamento import ESQUEMA_SIH
+from ocupacao import dias_para_aaaammdd
+
+try:
+    import duckdb
+except ImportError:  # dependência opcional: pip install duckdb
+    duckdb = None
+
+MOTORES = ['pandas', 'duckdb']
+MOTOR_PADRAO = os.environ.get('SUPERLOTACAO_MOTOR', 'pandas')
+
+# tipos SQL equivalentes aos de carregamento.ESQUEMA_SIH; o Parquet do PySUS guarda tudo como texto
+TIPOS_SQL = {'int8': 'TINYINT', 'int16': 'SMALLINT', 'int32': 'INTEGER', 'int64': 'BIGINT', 'float64': 'DOUBLE', 'category': 'VARCHAR'}
+
+# SIH com os nomes de pipeline.limpar_sih
+COLUNAS_SIH = {
+    'ESPEC': 'especialidade_leito',
+    'PROC_REA': 'procedimento_realizado',
+    'VAL_TOT': 'valor_total_aih',
+    'DT_INTER': 'dt_internacao',
+    'DT_SAIDA': 'dt_saida',
+    'DIAG_PRINC': 'cid_principal',
+    'MUNIC_MOV': 'municipio_estabelecimento',
+    'DIAS_PERM': 'dias_permanencia',
+    'MORTE': 'obito',
+    'CNES': 'id_cnes',
+}
+
+# entradas, saídas e óbitos por hospital e dia, e o censo pela varredura de
+# eventos de ocupacao._censo_intervalos (+1 na entrada ou no 1º dia do
+# período, -1 na saída), acumulados por hospital na ordem dos dias
+SQL_OCUPACAO = '''
+WITH aih AS (
+    SELECT id_cnes, obito,
+           make_date(dt_internacao // 10000, dt_internacao // 100 % 100, dt_internacao % 100) AS entrada,
+           make_date(dt_saida // 10000, dt_saida // 100 % 100, dt_saida % 100) AS saida
+    FROM sih
+),
+limites AS (SELECT $inicio::DATE AS d0, max(saida) AS d1 FROM aih),
+hospitais AS (SELECT DISTINCT id_cnes FROM aih),
+dias AS (SELECT unnest(generate_series(d0, d1, INTERVAL 1 DAY))::DATE AS dia FROM limites),
+entradas AS (
+    SELECT id_cnes, entrada AS dia, count(*) AS qtd_entradas, sum(obito)::BIGINT AS qtd_obitos
+    FROM aih, limites WHERE entrada BETWEEN d0 AND d1 GROUP BY ALL
+),
+saidas AS (
+    SELECT id_cnes, saida AS dia, count(*) AS qtd_saidas
+    FROM aih, limites WHERE saida BETWEEN d0 AND d1 GROUP BY ALL
+),
+intervalos AS (
+    SELECT id_cnes, greatest(entrada, d0) AS entrada, saida, d1
+    FROM aih, limites WHERE saida > d0 AND saida > entrada AND entrada <= d1
+),
+eventos AS (
+    SELECT id_cnes, dia, sum(delta) AS delta FROM (
+        SELECT id_cnes, entrada AS dia, 1 AS delta FROM intervalos
+        UNION ALL
+        SELECT id_cnes, saida AS dia, -1 AS delta FROM intervalos WHERE saida <= d1
+    ) GROUP BY ALL
+)
+SELECT h.id_cnes, d.dia,
+       coalesce(e.qtd_entradas, 0) AS qtd_entradas,
+       coalesce(s.qtd_saidas, 0) AS qtd_saidas,
+       coalesce(e.qtd_obitos, 0) AS qtd_obitos,
+       sum(coalesce(v.delta, 0)) OVER (PARTITION BY h.id_cnes ORDER BY d.dia) AS leitos_ocupados
+FROM hospitais h CROSS JOIN dias d
+LEFT JOIN entradas e ON e.id_cnes = h.id_cnes AND e.dia = d.dia
+LEFT JOIN saidas s ON s.id_cnes = h.id_cnes AND s.dia = d.dia
+LEFT JOIN eventos v ON v.id_cnes = h.id_cnes AND v.dia = d.dia
+ORDER BY h.id_cnes, d.dia
+'''
+
+SQL_SOMAS_AIH = '''
+SELECT id_cnes, (dt_internacao // 100)::INTEGER AS mes_ano,
+       count(*) AS qtd_aih, sum(dias_permanencia)::BIGINT AS soma_dias_permanencia, sum(obito)::BIGINT AS qtd_obitos
+FROM sih WHERE dt_internacao // 100 >= $inicio_mes
+GROUP BY ALL ORDER BY id_cnes, mes_ano
+'''
+
+SQL_CUBO_CIDS = '''
+SELECT id_cnes, (dt_internacao // 100)::INTEGER AS mes_ano, cid_principal, count(*) AS qtd_aih, sum(obito)::BIGINT AS obito
+FROM sih WHERE dt_internacao // 100 >= $inicio_mes
+GROUP BY ALL ORDER BY id_cnes, mes_ano, cid_principal
+'''
+
+# médias diárias por hospital; a taxa de ocupação usa soma de Kahan (fsum),
+# como a média do groupby do pandas, e ignora dias sem taxa
+SQL_MEDIAS_OCUPACAO = '''
+SELECT id_cnes,
+       avg(qtd_entradas) AS entrada_stats,
+       avg(total_leitos_sus) AS leitos_sus_mean,
+       fsum(taxa_ocupacao_diaria_pct) FILTER (WHERE NOT isnan(taxa_ocupacao_diaria_pct))
+         / count(taxa_ocupacao_diaria_pct) FILTER (WHERE NOT isnan(taxa_ocupacao_diaria_pct)) AS taxa_ocupacao_mean_pct
+FROM ocupacao GROUP BY id_cnes ORDER BY id_cnes
+'''
+
+SQL_TIPOS_UNIDADE = '''
+SELECT DS_TIPO_UNIDADE, count(*) AS count
+FROM leitos WHERE LEITOS_SUS > 0 AND DS_TIPO_UNIDADE IS NOT NULL
+GROUP BY ALL ORDER BY count DESC, DS_TIPO_UNIDADE
+'''
+
+
+def _literal(valor):
+    return str(int(valor)) if isinstance(valor, (int, np.integer)) else "'" + str(valor).replace("'", "''") + "'"
+
+
+def _lista(valores):
+    return '(' + ', '.join(_literal(v) for v in valores) + ')'
+
+
+class MotorDuckDB:
+    """Agregações do relatório em SQL sobre o SIH.
+
+    `fonte` é o diretório do dataset particionado (filtrado por `ufs`, `anos`
+    e `ultimo_mes_cmpt`, como em artefatos.carregar_entradas) ou um DataFrame
+    já limpo (pipeline.limpar_sih). `threads` e `memoria` (ex.: '4GB') limitam
+    os recursos do DuckDB; por padrão ele usa todos os núcleos e 80% da memória.
+    """
+
+    def __init__(self, fonte, ufs=None, anos=None, ultimo_mes_cmpt=pipeline.ULTIMO_MES_CMPT, threads=None, memoria=None):
+        if duckdb is None:
+            raise ImportError('O motor duckdb precisa do pacote duckdb (pip install duckdb)')
+        self.conexao = duckdb.connect()
+        if threads:
+            self.conexao.execute(f'SET threads = {int(threads)}')
+        if memoria:
+            self.conexao.execute(f'SET memory_limit = {_literal(memoria)}')
+
+        # DataFrame registrado só existe no cursor que o registra (ver _consultar)
+        self._sih = fonte if isinstance(fonte, pd.DataFrame) else None
+        if self._sih is not None:
+            return
+        filtros = [f'CAST(MES_CMPT AS TINYINT) <= {int(ultimo_mes_cmpt)}']
+        if ufs is not None:
+            filtros.append(f'uf IN {_lista(ufs)}')
+        if anos is not None:
+            filtros.append(f'ano IN {_lista(int(a) for a in anos)}')
+        colunas = ', '.join(f'CAST({c} AS {TIPOS_SQL[tipo]}) AS {COLUNAS_SIH.get(c, c)}' for c, tipo in ESQUEMA_SIH.items())
+        arquivos = _literal(os.path.join(fonte, '**', '*.parquet'))
+        self.conexao.execute(f'''
+            CREATE VIEW sih AS
+            SELECT {colunas}
+            FROM read_parquet({arquivos}, hive_partitioning = true)
+            WHERE {' AND '.join(filtros)}
+        ''')
+
+    def _consultar(self, sql, tabelas=None, **parametros):
+        # um cursor por consulta: no painel o motor fica em st.cache_resource e é usado
+        # por várias sessões e threads ao mesmo tempo. Os DataFrames de `tabelas` (e o
+        # SIH, quando a fonte é um DataFrame) são registrados só neste cursor.
+        tabelas = {**({'sih': self._sih} if self._sih is not None else {}), **(tabelas or {})}
+        cursor = self.conexao.cursor()
+        try:
+            for nome, df in tabelas.items():
+                cursor.register(nome, df)
+            return cursor.execute(sql, parametros).df()
+        finally:
+            cursor.close()
+
+    def ocupacao_diaria(self, inicio):
+        # o mesmo que ocupacao.ocupacao_diaria(sih, inicio=inicio)
+        df = self._consultar(SQL_OCUPACAO, inicio=str(pd.Timestamp(str(inicio)).date()))
+        datas = dias_para_aaaammdd(df['dia'].to_numpy().astype('datetime64[D]'))
+        entradas = df['qtd_entradas'].to_numpy()
+        obitos = df['qtd_obitos'].to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            taxa_obito = np.where(entradas > 0, obitos / entradas * 100, 0.0)
+        return pd.DataFrame({
+            'id_cnes': df['id_cnes'].to_numpy().astype(np.int32),
+            'data': datas,
+            'mes_ano': datas // 100,
+            'qtd_entradas': entradas.astype(np.int32),
+            'qtd_saidas': df['qtd_saidas'].to_numpy().astype(np.int32),
+            'qtd_obitos': obitos.astype(np.int32),
+            'leitos_ocupados': df['leitos_ocupados'].to_numpy().astype(np.int32),
+            'taxa_obito_pct': taxa_obito.round(2),
+        })
+
+    def montar_ocupacao_diaria(self, hospitais, inicio=20240101):
+        return pipeline.juntar_leitos(self.ocupacao_diaria(inicio), hospitais)
+
+    def somar_aih(self, inicio_mes):
+        # o mesmo que cubos.somar_aih(pipeline.filtrar_periodo(sih, inicio_mes))
+        df = self._consultar(SQL_SOMAS_AIH, inicio_mes=int(inicio_mes))
+        return df.astype({'id_cnes': np.int32, 'mes_ano': np.int32}).set_index(cubos.CHAVES)
+
+    def montar_cubo_cids(self, inicio_mes):
+        df = self._consultar(SQL_CUBO_CIDS, inicio_mes=int(inicio_mes))
+        # ENUM (SIH em DataFrame) volta como categoria ordenada; VARCHAR (Parquet) como texto
+        if isinstance(df['cid_principal'].dtype, pd.CategoricalDtype):
+            df['cid_principal'] = df['cid_principal'].cat.as_unordered()
+        else:
+            df['cid_principal'] = df['cid_principal'].astype('category')
+        return df.astype({'id_cnes': np.int32, 'mes_ano': np.int32})
+
+    def calcular_stats(self, df_ocupacao_diaria, hospitais, inicio_mes=202401):
+        # o mesmo que pipeline.calcular_stats(df_ocupacao_diaria, filtrar_periodo(sih, inicio_mes), hospitais)
+        ocupacao = df_ocupacao_diaria[['id_cnes', 'qtd_entradas', 'total_leitos_sus', 'taxa_ocupacao_diaria_pct']]
+        medias = self._consultar(SQL_MEDIAS_OCUPACAO, tabelas={'ocupacao': ocupacao}).astype({'id_cnes': np.int32}).set_index('id_cnes')
+        somas = self.somar_aih(inicio_mes).groupby('id_cnes').sum()
+        return pipeline.montar_stats_de_medias(
+            medias['entrada_stats'],
+            somas['soma_dias_permanencia'] / somas['qtd_aih'],
+            medias['leitos_sus_mean'],
+            somas['qtd_obitos'] / somas['qtd_aih'],
+            medias['taxa_ocupacao_mean_pct'],
+            hospitais,
+        )
+
+    def contar_tipos_unidade(self, hospitais):
+        tabela = hospitais.tabela
+        contagem = self._consultar(SQL_TIPOS_UNIDADE, tabelas={'leitos': tabela[['DS_TIPO_UNIDADE', 'LEITOS_SUS']]})
+        indice = pd.CategoricalIndex(contagem['DS_TIPO_UNIDADE'].astype(object), dtype=tabela['DS_TIPO_UNIDADE'].dtype, name='DS_TIPO_UNIDADE')
+        return pd.Series(contagem['count'].to_numpy(), index=indice.remove_unused_categories(), name='count')
+
+    def montar_cubos(self, df_ocupacao_diaria, hospitais, inicio_mes=202401):
+        return {
+            'cubo_hospital_mes': cubos.montar_cubo_hospital_mes(df_ocupacao_diaria, self.somar_aih(inicio_mes), hospitais),
+            'cubo_cids': self.montar_cubo_cids(inicio_mes),
+        }
+
+
+def criar_motor(nome, fonte, **kwargs):
+    # None para o motor pandas (padrão de pipeline.executar)
+    if nome not in MOTORES:
+        raise ValueError(f'Motor desconhecido: {nome} (opções: {", ".join(MOTORES)})')
+    return MotorDuckDB(fonte, **kwargs) if nome == 'duckdb' else None
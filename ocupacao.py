@@ -0,0 +1,143 @@
+# coding: utf-8
+
+# Cálculo da ocupação diária dos hospitais a partir das AIHs do SIH.
+# Monta uma grade densa (hospital x dia do calendário) em arrays NumPy e conta
+# entradas, saídas e óbitos em uma única passada, sem groupbys nem merges.
+# O censo de leitos ocupados vem dos intervalos de internação de cada AIH.
+
+import numpy as np
+import pandas as pd
+
+
+def aaaammdd_para_dias(valores):
+    # converte inteiros AAAAMMDD em datetime64[D] de forma vetorizada
+    valores = np.asarray(valores, dtype=np.int64)
+    ano = valores // 10000
+    mes = (valores // 100) % 100
+    dia = valores % 100
+    meses = ((ano - 1970) * 12 + (mes - 1)).astype('datetime64[M]')
+    return meses.astype('datetime64[D]') + (dia - 1).astype('timedelta64[D]')
+
+
+def dias_para_aaaammdd(dias):
+    dias = np.asarray(dias, dtype='datetime64[D]')
+    meses = dias.astype('datetime64[M]')
+    ano = meses.astype(np.int64) // 12 + 1970
+    mes = meses.astype(np.int64) % 12 + 1
+    dia = (dias - meses.astype('datetime64[D]')).astype(np.int64) + 1
+    return (ano * 10000 + mes * 100 + dia).astype(np.int32)
+
+
+def _contar(hospital, dia, n_hospitais, n_dias, pesos=None):
+    # equivale a np.add.at em uma grade (hospital, dia), porém mais rápido
+    grade = np.bincount(hospital * n_dias + dia, weights=pesos, minlength=n_hospitais * n_dias)
+    return grade.reshape(n_hospitais, n_dias)
+
+
+def _censo_intervalos(grupo, entrada, saida, n_grupos, n_dias):
+    # cada AIH ocupa um leito no intervalo [entrada, saida), em dias relativos
+    # ao início do período. Varredura de eventos: +1 na entrada, -1 na saída,
+    # ordenados por (grupo, dia) e acumulados; o censo de um dia é a soma dos
+    # eventos do grupo até aquele dia inclusive.
+    validos = (saida > 0) & (saida > entrada) & (entrada < n_dias)
+    grupo, entrada, saida = grupo[validos], entrada[validos], saida[validos]
+    entrada = np.maximum(entrada, 0)  # internações anteriores ao período já ocupam o leito no 1º dia
+
+    # saídas depois do fim do período não alteram o censo dentro dele
+    sai_no_periodo = saida < n_dias
+    chave = np.concatenate([grupo * n_dias + entrada, grupo[sai_no_periodo] * n_dias + saida[sai_no_periodo]])
+    delta = np.concatenate([np.ones(len(entrada), np.int64), -np.ones(sai_no_periodo.sum(), np.int64)])
+    ordem = np.argsort(chave, kind='stable')
+    chave = chave[ordem]
+    acumulado = np.concatenate([[0], np.cumsum(delta[ordem])])
+
+    consulta = np.arange(n_grupos)[:, None] * n_dias + np.arange(n_dias)[None, :]
+    fim_grupo = np.searchsorted(chave, consulta, side='right')
+    inicio_grupo = np.searchsorted(chave, np.arange(n_grupos) * n_dias, side='left')
+    return acumulado[fim_grupo] - acumulado[inicio_grupo][:, None]
+
+
+def _periodo(entrada, saida, inicio, fim):
+    d0 = entrada.min() if inicio is None else aaaammdd_para_dias([inicio])[0]
+    d1 = saida.max() if fim is None else aaaammdd_para_dias([fim])[0]
+    return d0, int((d1 - d0).astype(np.int64)) + 1
+
+
+def censo_por_intervalos(sih, inicio=None, fim=None, por_especialidade=False):
+    """Leitos ocupados por hospital e dia a partir dos intervalos das AIHs.
+
+    Conta as internações iniciadas antes de `inicio` que ainda estavam
+    abertas no período. Com `por_especialidade=True` o censo é quebrado
+    também por especialidade_leito.
+    """
+    entrada = aaaammdd_para_dias(sih['dt_internacao'].to_numpy())
+    saida = aaaammdd_para_dias(sih['dt_saida'].to_numpy())
+    d0, n_dias = _periodo(entrada, saida, inicio, fim)
+
+    colunas = ['id_cnes', 'especialidade_leito'] if por_especialidade else ['id_cnes']
+    grupos, grupo = np.unique(sih[colunas].to_numpy(), axis=0, return_inverse=True)
+    grupo = grupo.ravel()
+
+    censo = _censo_intervalos(
+        grupo,
+        (entrada - d0).astype(np.int64),
+        (saida - d0).astype(np.int64),
+        len(grupos),
+        n_dias,
+    )
+
+    datas = dias_para_aaaammdd(d0 + np.arange(n_dias))
+    df = pd.DataFrame({
+        'id_cnes': np.repeat(grupos[:, 0], n_dias).astype(np.int32),
+        'data': np.tile(datas, len(grupos)),
+        'mes_ano': np.tile(datas // 100, len(grupos)),
+    })
+    if por_especialidade:
+        df['especialidade_leito'] = np.repeat(grupos[:, 1], n_dias).astype(np.int8)
+    df['leitos_ocupados'] = censo.ravel().astype(np.int32)
+    return df
+
+
+def ocupacao_diaria(sih, inicio=None, fim=None):
+    """Entradas, saídas, óbitos e leitos ocupados por hospital e dia.
+
+    `sih` precisa das colunas id_cnes, dt_internacao, dt_saida (AAAAMMDD) e
+    obito. `inicio` e `fim` (AAAAMMDD) limitam o período; por padrão vão da
+    primeira internação à última saída. Todos os dias do período aparecem,
+    mesmo sem movimento. Internações anteriores a `inicio` devem ser mantidas
+    em `sih`: não contam como entradas, mas ocupam leitos até a saída.
+    """
+    cnes, hospital = np.unique(sih['id_cnes'].to_numpy(), return_inverse=True)
+    entrada = aaaammdd_para_dias(sih['dt_internacao'].to_numpy())
+    saida = aaaammdd_para_dias(sih['dt_saida'].to_numpy())
+
+    d0, n_dias = _periodo(entrada, saida, inicio, fim)
+    n_hospitais = len(cnes)
+
+    dia_entrada = (entrada - d0).astype(np.int64)
+    dia_saida = (saida - d0).astype(np.int64)
+    ok_entrada = (dia_entrada >= 0) & (dia_entrada < n_dias)
+    ok_saida = (dia_saida >= 0) & (dia_saida < n_dias)
+
+    obito = sih['obito'].to_numpy(dtype=np.float64)
+    entradas = _contar(hospital[ok_entrada], dia_entrada[ok_entrada], n_hospitais, n_dias)
+    obitos = _contar(hospital[ok_entrada], dia_entrada[ok_entrada], n_hospitais, n_dias, obito[ok_entrada])
+    saidas = _contar(hospital[ok_saida], dia_saida[ok_saida], n_hospitais, n_dias)
+
+    # censo à meia-noite pelos intervalos [entrada, saida) de cada AIH
+    leitos_ocupados = _censo_intervalos(hospital, dia_entrada, dia_saida, n_hospitais, n_dias)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa_obito = np.where(entradas > 0, obitos / entradas * 100, 0.0)
+
+    datas = dias_para_aaaammdd(d0 + np.arange(n_dias))
+    return pd.DataFrame({
+        'id_cnes': np.repeat(cnes, n_dias).astype(np.int32),
+        'data': np.tile(datas, n_hospitais),
+        'mes_ano': np.tile(datas // 100, n_hospitais),
+        'qtd_entradas': entradas.ravel().astype(np.int32),
+        'qtd_saidas': saidas.ravel().astype(np.int32),
+        'qtd_obitos': obitos.ravel().astype(np.int32),
+        'leitos_ocupados': leitos_ocupados.ravel().astype(np.int32),
+        'taxa_obito_pct': taxa_obito.ravel().round(2),
+    })
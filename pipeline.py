@@ -0,0 +1,651 @@
+# coding: utf-8
+
+# Etapas do relatório como funções puras (sem Streamlit): recebem DataFrames e
+# devolvem novos DataFrames ou modelos ajustados, sem alterar as entradas.
+# O relatorio.py envolve essas funções com o cache do Streamlit.
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import sklearn.linear_model as lm
+import sklearn.model_selection as ms
+from imblearn.pipeline import Pipeline as PipelineReamostragem
+from sklearn.metrics import classification_report, confusion_matrix, mean_squared_error, r2_score
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import atributos
+import avaliacao
+import cid10
+import correlacao
+import cubos
+import frequencias
+import incremental
+import modelos
+from desempenho import Medicoes
+from ocupacao import censo_por_intervalos, ocupacao_diaria
+
+
+def impressao_digital(*dfs):
+    # hash do conteúdo (valores, índice e colunas) de um ou mais DataFrames
+    sha = hashlib.sha256()
+    for df in dfs:
+        sha.update(repr(list(df.columns)).encode('utf-8'))
+        sha.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return sha.hexdigest()[:16]
+
+
+# ### Limpeza
+
+COLUNAS_CATEGORICAS_HOSPITAIS = ['MUNICIPIO', 'TIPO_GESTAO', 'DS_TIPO_UNIDADE']
+
+
+def remover_categorias_vazias(df):
+    # subconjuntos herdam todas as categorias da tabela de origem; sem isso
+    # groupbys, dummies e legendas dos gráficos listariam valores ausentes
+    categoricas = df.select_dtypes('category').columns
+    return df.assign(**{c: df[c].cat.remove_unused_categories() for c in categoricas})
+
+
+def limpar_hospitais_leitos(hospital_e_leitos_br, uf='PB'):
+    hospital_e_leitos = hospital_e_leitos_br[(hospital_e_leitos_br['UF'] == uf)]
+
+    hospital_e_leitos = hospital_e_leitos.drop(['REGIAO', 'UF', 'MOTIVO_DESABILITACAO', 'CO_TIPO_UNIDADE', 'NATUREZA_JURIDICA', 'NO_COMPLEMENTO'], axis=1)
+
+    hospital_e_leitos[['NU_TELEFONE', 'NO_EMAIL']] = hospital_e_leitos[['NU_TELEFONE', 'NO_EMAIL']].fillna('Não se aplica')
+
+    hospital_e_leitos = hospital_e_leitos.rename(columns={
+        'COMP':'ANO_MES_COMPETENCIA',
+        'CNES':'ID_CNES',
+        'TP_GESTAO':'TIPO_GESTAO'
+    })
+
+    # categorias (ver carregamento.ESQUEMA_HOSPITAIS_LEITOS) só com os valores da UF
+    hospital_e_leitos = remover_categorias_vazias(hospital_e_leitos.astype({c: 'category' for c in COLUNAS_CATEGORICAS_HOSPITAIS}))
+
+    tipos_gestao = {
+        'M':'Municipal',
+        'E':'Estadual',
+        'D':'Dupla',
+        'S':'Sem Gestão'
+    }
+    hospital_e_leitos['TIPO_GESTAO'] = hospital_e_leitos['TIPO_GESTAO'].cat.rename_categories(lambda c: tipos_gestao.get(c, c))
+
+    # mesmo tipo do CNES no SIH (ver carregamento.ESQUEMA_SIH), para as junções
+    hospital_e_leitos['ID_CNES'] = hospital_e_leitos['ID_CNES'].astype(np.int32)
+    hospital_e_leitos['mes_ano_leitos'] = hospital_e_leitos['ANO_MES_COMPETENCIA'].astype(np.int32)
+    return hospital_e_leitos
+
+
+# último mês de competência (MES_CMPT) considerado por padrão, no painel e no
+# `build`: o relatório cobre as internações de janeiro a novembro
+ULTIMO_MES_CMPT = 11
+
+
+def limpar_sih(sih, ultimo_mes_cmpt=ULTIMO_MES_CMPT):
+    # as colunas não utilizadas já são descartadas na leitura, ver ESQUEMA_SIH
+    sih = sih.rename(columns={
+        'ESPEC': 'especialidade_leito',
+        'PROC_REA': 'procedimento_realizado',
+        'VAL_TOT': 'valor_total_aih',
+        'DT_INTER': 'dt_internacao',
+        'DT_SAIDA': 'dt_saida',
+        'DIAG_PRINC': 'cid_principal',
+        'MUNIC_MOV': 'municipio_estabelecimento',
+        'DIAS_PERM': 'dias_permanencia',
+        'MORTE': 'obito',
+        'CNES': 'id_cnes',
+    })
+    return sih[sih['MES_CMPT'] <= ultimo_mes_cmpt]
+
+
+def filtrar_periodo(sih, inicio_mes=202401):
+    # pegando apenas o ano e mes (AAAAMM) das internações a partir de inicio_mes
+    sih = sih.assign(mes_ano=sih['dt_internacao'] // 100)
+    sih = sih[sih['mes_ano'] >= inicio_mes]
+    return sih.assign(data=sih['dt_internacao'])
+
+
+# ### Ocupação e estatísticas por hospital
+
+def montar_ocupacao_diaria(sih, hospitais, inicio=20240101):
+    # `sih` sem o filtro de período: internações anteriores a `inicio` entram no censo
+    return juntar_leitos(ocupacao_diaria(sih, inicio=inicio), hospitais)
+
+
+# códigos de ESPEC (especialidade do leito) do SIH/RD
+ESPECIALIDADES_LEITO = {
+    1: 'Cirúrgico', 2: 'Obstétrico', 3: 'Clínico', 4: 'Crônico', 5: 'Psiquiatria', 6: 'Tisiologia', 7: 'Pediátrico',
+    8: 'Reabilitação', 9: 'Leito dia / cirúrgico', 10: 'Leito dia / AIDS', 11: 'Leito dia / fibrose cística',
+    12: 'Leito dia / pós-transplante', 13: 'Leito dia / geriatria', 14: 'Leito dia / saúde mental', 87: 'Saúde mental (clínico)',
+}
+
+
+def montar_censo_especialidade(sih, df_ocupacao_diaria, inicio=20240101):
+    """Leito-dias ocupados por hospital, mês e especialidade do leito (ocupacao.censo_por_intervalos).
+
+    Mesmos dias e hospitais de df_ocupacao_diaria; `dias` é o número de dias
+    do hospital no mês, e leito_dias / dias é a média diária de leitos
+    ocupados. As somas são aditivas entre hospitais e entre lotes do SIH.
+    """
+    censo = censo_por_intervalos(sih, inicio=inicio, fim=int(df_ocupacao_diaria['data'].max()), por_especialidade=True)
+    leito_dias = (censo.groupby(['id_cnes', 'mes_ano', 'especialidade_leito'], sort=True)['leitos_ocupados']
+                  .sum().rename('leito_dias').reset_index())
+    return _juntar_dias(leito_dias, df_ocupacao_diaria)
+
+
+def atualizar_censo_especialidade(censo, sih_mes, df_ocupacao_diaria, inicio=20240101):
+    # df_ocupacao_diaria já atualizada; os leito-dias das AIHs de `sih_mes` são somados aos do censo
+    leito_dias = censo[['id_cnes', 'mes_ano', 'especialidade_leito', 'leito_dias']]
+    if len(sih_mes):
+        novo = montar_censo_especialidade(sih_mes, df_ocupacao_diaria, inicio=inicio)
+        leito_dias = (pd.concat([leito_dias, novo[leito_dias.columns]], ignore_index=True)
+                      .groupby(['id_cnes', 'mes_ano', 'especialidade_leito'], sort=True)['leito_dias'].sum().reset_index())
+    return _juntar_dias(leito_dias, df_ocupacao_diaria)
+
+
+def _juntar_dias(leito_dias, df_ocupacao_diaria):
+    # dias de cada hospital no mês, só para os hospitais e meses de df_ocupacao_diaria
+    dias = df_ocupacao_diaria.groupby(['id_cnes', 'mes_ano'], sort=False).size().rename('dias').reset_index()
+    leito_dias = leito_dias[leito_dias['leito_dias'] > 0].merge(dias, on=['id_cnes', 'mes_ano'])
+    return leito_dias.astype({'leito_dias': np.int64, 'dias': np.int64})
+
+
+def montar_ocupacao_e_stats(estado, hospitais):
+    # df_ocupacao_diaria e df_stats a partir de um estado de incremental.py, sem voltar às AIHs
+    grade = estado['grade']
+    entradas = grade['qtd_entradas'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa_obito = np.where(entradas > 0, grade['qtd_obitos'] / entradas * 100, 0.0)
+    # mesmas colunas, na mesma ordem, de ocupacao.ocupacao_diaria
+    df_ocupacao_diaria = grade.assign(
+        mes_ano=(grade['data'] // 100).astype(np.int32),
+        taxa_obito_pct=taxa_obito.round(2),
+    )[['id_cnes', 'data', 'mes_ano'] + incremental.COLUNAS_GRADE + ['taxa_obito_pct']]
+    df_ocupacao_diaria = juntar_leitos(df_ocupacao_diaria, hospitais)
+
+    somas = estado['hospitais']
+    df_stats = montar_stats(
+        df_ocupacao_diaria,
+        somas['soma_dias_permanencia'] / somas['qtd_aih'],
+        somas['soma_obitos'] / somas['qtd_aih'],
+        hospitais,
+    )
+    return df_ocupacao_diaria, df_stats
+
+
+def juntar_leitos(df_ocupacao_diaria, hospitais):
+    # juntando os leitos SUS do mês de cada dia (hospitais: DimensaoHospitais)
+    do_mes = hospitais.do_mes(df_ocupacao_diaria['id_cnes'], df_ocupacao_diaria['mes_ano'], ['LEITOS_SUS', 'DS_TIPO_UNIDADE', 'MUNICIPIO'])
+    df_ocupacao_diaria = df_ocupacao_diaria.assign(
+        total_leitos_sus=do_mes['LEITOS_SUS'].values,
+        DS_TIPO_UNIDADE=do_mes['DS_TIPO_UNIDADE'].values,
+        MUNICIPIO=do_mes['MUNICIPIO'].values,
+    )
+    df_ocupacao_diaria = df_ocupacao_diaria[df_ocupacao_diaria['total_leitos_sus'].notna()]
+    df_ocupacao_diaria['total_leitos_sus'] = df_ocupacao_diaria['total_leitos_sus'].astype(int)
+
+    # Calculando a taxa de ocupação diária
+    df_ocupacao_diaria['taxa_ocupacao_diaria_pct'] = (df_ocupacao_diaria['leitos_ocupados'] / df_ocupacao_diaria['total_leitos_sus']) * 100
+    df_ocupacao_diaria['taxa_ocupacao_diaria_pct'] = df_ocupacao_diaria['taxa_ocupacao_diaria_pct'].round(2)
+    return remover_categorias_vazias(df_ocupacao_diaria)
+
+
+def calcular_stats(df_ocupacao_diaria, sih, hospitais):
+    permanencia_stats = sih.groupby(['id_cnes'])['dias_permanencia'].mean()
+    obitos_mean = sih.groupby(['id_cnes'])['obito'].mean()
+    return montar_stats(df_ocupacao_diaria, permanencia_stats, obitos_mean, hospitais)
+
+
+def montar_stats(df_ocupacao_diaria, permanencia_stats, obitos_mean, hospitais):
+    # permanencia_stats e obitos_mean: média de dias de permanência e proporção
+    # de óbitos por hospital (id_cnes), calculadas sobre as AIHs do período
+    por_hospital = df_ocupacao_diaria.groupby(['id_cnes'])
+    return montar_stats_de_medias(
+        por_hospital['qtd_entradas'].mean(numeric_only=True),
+        permanencia_stats,
+        por_hospital['total_leitos_sus'].mean(),
+        obitos_mean,
+        por_hospital['taxa_ocupacao_diaria_pct'].mean(),
+        hospitais,
+    )
+
+
+def montar_stats_de_medias(entrada_stats, permanencia_stats, leitos_sus_mean, obitos_mean, taxa_ocupacao_mean_pct, hospitais):
+    # médias diárias e por AIH já calculadas por hospital (id_cnes), ex.: a partir de cubos.py
+    entrada_stats = entrada_stats.round(2)
+    permanencia_stats = permanencia_stats.round(2)
+    leitos_sus_mean = leitos_sus_mean.round(2)
+    obitos_mean = obitos_mean.mul(100).round(0)
+    taxa_ocupacao_mean_pct = taxa_ocupacao_mean_pct.round(2)
+
+    df_stats = pd.DataFrame({
+        'qtd_entradas_mean': entrada_stats,
+        'dias_permanencia_mean': permanencia_stats,
+        'leitos_sus_mean': leitos_sus_mean,
+        'obitos_mean': obitos_mean,
+        'taxa_ocupacao_mean_pct': taxa_ocupacao_mean_pct
+        })
+
+    df_stats = df_stats.dropna(subset=['leitos_sus_mean'])
+    # Em leitos_sus_mean está faltando 5 hospitais que estão registrados em sih_pb_2024, mas não estão em hospital_e_leitos_pb
+    # Porém, esses hospitais tiveram a ocupacão média diária igual a 0, devido a baixa quantidade de entradas e nenhum dia de permanêcia
+
+    df_stats['qtd_entradas_mean'] = df_stats['qtd_entradas_mean'].fillna(0)
+    df_stats['dias_permanencia_mean'] = df_stats['dias_permanencia_mean'].fillna(0)
+
+    # ocupacao_media_diaria = entrada_media * dias_permanencia_media
+    df_stats['ocupacao_media_diaria'] = df_stats['qtd_entradas_mean'] * df_stats['dias_permanencia_mean']
+    df_stats['ocupacao_media_diaria'] = df_stats['ocupacao_media_diaria'].round(2)
+
+    df_stats = hospitais.juntar_atributos(
+        df_stats,
+        ['DS_TIPO_UNIDADE', 'NOME_ESTABELECIMENTO', 'MUNICIPIO'],
+        cnes=None,
+        nomes={'DS_TIPO_UNIDADE': 'tipo_unidade', 'NOME_ESTABELECIMENTO': 'nome_hospital', 'MUNICIPIO': 'municipio'},
+    )
+    return remover_categorias_vazias(df_stats)
+
+
+def contar_tipos_unidade(hospitais):
+    # quantificar os tipos de unidades com leitos SUS
+    tabela = hospitais.tabela
+    tipos_unidades_sus = tabela[tabela['LEITOS_SUS'] > 0]
+    return tipos_unidades_sus['DS_TIPO_UNIDADE'].cat.remove_unused_categories().value_counts()
+
+
+def correlacoes(df_stats, pares=correlacao.PARES_PADRAO, por='tipo_unidade', **kwargs):
+    # Pearson, Spearman e Kendall de cada par, com IC por bootstrap e p-valor por permutação,
+    # para todos os hospitais e por tipo de unidade; `kwargs` vão para correlacao.testar_correlacoes
+    return correlacao.testar_correlacoes(df_stats, pares, por=por, **kwargs)
+
+
+# ### CIDs
+
+
+def cids_mais_frequentes(sih, df_stats, hospitais, n_hospitais=10, pesos=None):
+    # CID principal mais frequente nos n hospitais mais ocupados; com `pesos`
+    # (ex.: 'qtd_aih') `sih` pode ser um cubo já agregado (ver cubos.py)
+    top_ocupacao = df_stats.nlargest(n_hospitais, 'ocupacao_media_diaria')
+    cids_frequentes = sih[sih['id_cnes'].isin(top_ocupacao.index)]
+
+    cids_freq_hospitais = frequencias.mais_frequentes_por_grupo(
+        cids_frequentes, 'id_cnes', 'cid_principal', k=1, nome_contagem='qtd_cids_frequentes', pesos=pesos,
+    )[['id_cnes', 'cid_principal', 'qtd_cids_frequentes']]
+    cids_freq_hospitais = hospitais.juntar_atributos(
+        cids_freq_hospitais,
+        ['NOME_ESTABELECIMENTO', 'MUNICIPIO', 'DS_TIPO_UNIDADE'],
+        nomes={'NOME_ESTABELECIMENTO': 'nome_hospital', 'MUNICIPIO': 'municipio'},
+    )
+    # descrição da CID-10 quando conhecida, senão o código
+    descricao = cid10.descrever(cids_freq_hospitais['cid_principal'])
+    cids_freq_hospitais['cid_principal'] = descricao['descricao'].astype(object).fillna(descricao['cid'].astype(object))
+    return remover_categorias_vazias(cids_freq_hospitais)
+
+
+def cids_por_hospital(sih, hospitais, k=10, pesos=None):
+    # os k CIDs principais mais frequentes de cada hospital, com a participação no total de AIHs
+    top_cids = frequencias.mais_frequentes_por_grupo(
+        sih, 'id_cnes', 'cid_principal', k=k, nome_contagem='qtd_aih', nome_participacao='participacao_pct', pesos=pesos,
+    )
+    top_cids['participacao_pct'] = (top_cids['participacao_pct'] * 100).round(2)
+    descricao = cid10.descrever(top_cids['cid_principal'])
+    top_cids['descricao'] = descricao['descricao']
+    top_cids['capitulo'] = descricao['capitulo']
+    top_cids = hospitais.juntar_atributos(
+        top_cids,
+        ['NOME_ESTABELECIMENTO', 'MUNICIPIO'],
+        nomes={'NOME_ESTABELECIMENTO': 'nome_hospital', 'MUNICIPIO': 'municipio'},
+    )
+    return remover_categorias_vazias(top_cids)
+
+
+def internacoes_por_capitulo(sih, pesos=None):
+    # AIHs e óbitos por capítulo da CID-10 do diagnóstico principal; com
+    # `pesos` cada linha vale `pesos` AIHs e `obito` é a soma dos óbitos
+    descricao = cid10.descrever(sih['cid_principal'])
+    aih = np.ones(len(sih), dtype=np.int64) if pesos is None else sih[pesos].to_numpy()
+    por_capitulo = (pd.DataFrame({'capitulo': descricao['capitulo'], 'aih': aih, 'obito': sih['obito'].to_numpy()})
+                    .groupby('capitulo', observed=True).agg(qtd_aih=('aih', 'sum'), qtd_obitos=('obito', 'sum')))
+    por_capitulo['taxa_obito_pct'] = (por_capitulo['qtd_obitos'] / por_capitulo['qtd_aih'] * 100).round(2)
+    por_capitulo['descricao'] = por_capitulo.index.map({c[0]: c[3] for c in cid10.CAPITULOS})
+    return por_capitulo.reset_index()
+
+
+# ### Filtros do painel
+
+def montar_cubos(df_ocupacao_diaria, sih, hospitais):
+    # `sih` do período (filtrar_periodo); ver cubos.py
+    return {
+        'cubo_hospital_mes': cubos.montar_cubo_hospital_mes(df_ocupacao_diaria, cubos.somar_aih(sih), hospitais),
+        'cubo_cids': cubos.montar_cubo_cids(sih),
+    }
+
+
+def resultados_filtrados(cubo_hospital_mes, cubo_cids, hospitais, **filtros):
+    """df_stats, contagem de tipos e tabelas de CIDs respondidos pelos cubos.
+
+    `filtros` são os argumentos de cubos.filtrar (periodo, municipios,
+    tipos_unidade, tipos_gestao, cnes). Sem filtros os resultados coincidem
+    com os de executar().
+    """
+    hospital_mes = cubos.filtrar(cubo_hospital_mes, **filtros)
+    cids = cubos.filtrar_cids(cubo_cids, hospital_mes)
+    df_stats = montar_stats_de_medias(**cubos.medias_por_hospital(hospital_mes), hospitais=hospitais)
+    return {
+        'cubo_hospital_mes': hospital_mes,
+        'df_stats': df_stats,
+        'contagem_tipos': cubos.contar_tipos_unidade(hospital_mes),
+        'cids_freq_hospitais': cids_mais_frequentes(cids, df_stats, hospitais, n_hospitais=10, pesos='qtd_aih'),
+        'cids_top_hospitais': cids_por_hospital(cids, hospitais, k=10, pesos='qtd_aih'),
+        'internacoes_por_capitulo': internacoes_por_capitulo(cids, pesos='qtd_aih'),
+    }
+
+
+# ### Modelos
+
+def montar_df_combined(sih, df_ocupacao_diaria):
+    # uma linha por AIH com a ocupação do hospital no dia da internação;
+    # busca no índice (id_cnes, data) em vez do merge com todas as colunas
+    return remover_categorias_vazias(atributos.juntar_ocupacao(sih, atributos.indexar_ocupacao(df_ocupacao_diaria)))
+
+
+def _avaliar_regressao(modelo, x, y):
+    fitted = modelo.predict(x)
+    return {
+        'fitted': fitted,
+        'residuals': y - fitted,
+        'rmse': np.sqrt(mean_squared_error(y, fitted)),
+        'r2': r2_score(y, fitted),
+    }
+
+
+def ajustar_regressao_simples(df_stats):
+    # Prevendo a Taxa de Ocupação com Base na Média de Leitos SUS
+    x = df_stats[['leitos_sus_mean']]
+    y = df_stats[['taxa_ocupacao_mean_pct']]
+
+    # Separar os dados em Treino e Teste
+    x_train, x_test, y_train, y_test = ms.train_test_split(x, y, test_size=0.2, random_state=0)
+
+    # Treinando o modelo
+    regressor = lm.LinearRegression()
+    regressor.fit(x_train, y_train)
+
+    return {
+        'modelo': regressor,
+        'pipeline': Pipeline([('modelo', regressor)]),
+        'variaveis': list(x.columns),
+        'x': x,
+        'x_train': x_train,
+        'y_train': y_train,
+        'x_test': x_test,
+        'y_test': y_test,
+        'y_pred': regressor.predict(x_test),
+        **_avaliar_regressao(regressor, x, y),
+    }
+
+
+def ajustar_regressao_multipla(df_stats):
+    x = df_stats[['leitos_sus_mean', 'tipo_unidade', 'obitos_mean', 'ocupacao_media_diaria']]
+    y = df_stats[['taxa_ocupacao_mean_pct']]
+
+    # Transformar a variável categórica 'tipo_unidade' em variáveis dummy
+    # Hospital especializado é o dummies de referência
+    codificador = modelos.CodificadorDummies(categoricas=('tipo_unidade',))
+    x_dummies = codificador.fit_transform(x)
+
+    # Separar os dados em Treino e Teste
+    x_train, x_test, y_train, y_test = ms.train_test_split(x_dummies, y, test_size=0.2, random_state=0)
+
+    # Treinando o modelo
+    regressor_multiple = lm.LinearRegression()
+    regressor_multiple.fit(x_train, y_train)
+
+    return {
+        'modelo': regressor_multiple,
+        'pipeline': Pipeline([('codificador', codificador), ('modelo', regressor_multiple)]),
+        'variaveis': list(x.columns),
+        'colunas': list(x_dummies.columns),
+        'y_pred': regressor_multiple.predict(x_test),
+        **_avaliar_regressao(regressor_multiple, x_dummies, y),
+    }
+
+
+def _avaliar_logistica(modelo, colunas, y_outcome, x_test, y_test):
+    return _resumir_logistica(modelo, colunas, y_outcome.value_counts(), y_test, modelo.predict(x_test))
+
+
+def _resumir_logistica(modelo, colunas, distribuicao, y_test, y_pred):
+    coef_df = pd.DataFrame({
+        'Variável': colunas,
+        'Coeficiente': modelo.coef_[0].round(3)
+    }).sort_values(by='Coeficiente', ascending=False)
+    return {
+        'modelo': modelo,
+        'distribuicao': distribuicao,
+        'matriz_confusao': confusion_matrix(y_test, y_pred),
+        'relatorio': pd.DataFrame(classification_report(y_test, y_pred, output_dict=True)).transpose(),
+        'coeficientes': coef_df,
+    }
+
+
+def ajustar_logistica_sem_municipio(df_combined, balanceamento='smote', max_amostras=200_000):
+    """Probabilidade de óbito pela taxa de ocupação, tipo de unidade e idade.
+
+    Dummies, escala, balanceamento e modelo formam um Pipeline do imblearn
+    ajustado só com o treino: a escala usa os parâmetros do treino também no
+    teste, e a reamostragem não toca no teste. Ver
+    modelos.etapas_balanceamento para as estratégias de balanceamento.
+    """
+    x_predictors = df_combined[['DS_TIPO_UNIDADE', 'IDADE', 'taxa_ocupacao_diaria_pct']]
+    y_outcome = df_combined['obito']
+
+    # Separar os dados em Treino e Teste
+    x_train, x_test, y_train, y_test = ms.train_test_split(x_predictors, y_outcome, test_size=0.2, random_state=0)
+
+    # Dummies -> escala -> balanceamento -> modelo
+    reamostragem, pesos_classes = modelos.etapas_balanceamento(balanceamento, max_amostras=max_amostras)
+    modelo = PipelineReamostragem([
+        ('codificador', modelos.CodificadorDummies(categoricas=('DS_TIPO_UNIDADE',))),
+        ('escala', StandardScaler()),
+        *reamostragem,
+        ('modelo', LogisticRegression(class_weight=pesos_classes, max_iter=1000)),
+    ])
+    modelo.fit(x_train, y_train)
+
+    logistic_regressor = modelo.named_steps['modelo']
+    resultado = _resumir_logistica(logistic_regressor, modelo.named_steps['codificador'].get_feature_names_out(),
+                                   y_outcome.value_counts(), y_test, modelo.predict(x_test))
+    resultado['pipeline'] = modelo
+    resultado['variaveis'] = list(x_predictors.columns)
+    resultado['balanceamento'] = balanceamento
+    return resultado
+
+
+def ajustar_logistica_com_municipio(df_combined, solver='saga'):
+    # com MUNICIPIO o número de dummies cresce com a UF; a codificação é esparsa
+    # (CSR) e o desbalanceamento é tratado com class_weight, sem SMOTE
+    ajuste = modelos.ajustar_logistica_esparsa(
+        df_combined,
+        alvo='obito',
+        numericas=['IDADE', 'taxa_ocupacao_diaria_pct'],
+        categoricas=['MUNICIPIO', 'DS_TIPO_UNIDADE'],
+        solver=solver,
+    )
+    resultado = _avaliar_logistica(ajuste['modelo'], ajuste['colunas'], df_combined['obito'], ajuste['x_test'], ajuste['y_test'])
+    resultado['codificador'] = ajuste['codificador']
+    resultado['pipeline'] = Pipeline([('codificador', ajuste['codificador']), ('modelo', ajuste['modelo'])])
+    resultado['variaveis'] = ['IDADE', 'taxa_ocupacao_diaria_pct', 'MUNICIPIO', 'DS_TIPO_UNIDADE']
+    return resultado
+
+
+def ajustar_logistica_em_lotes(lotes_sih, df_ocupacao_diaria, ano=2024, ultimo_mes_cmpt=ULTIMO_MES_CMPT):
+    """Mesmo modelo de ajustar_logistica_com_municipio, treinado lote a lote.
+
+    `lotes_sih()` devolve um iterador novo de lotes do SIH bruto a cada
+    chamada (ver atributos.lotes_sih); limpeza, filtro de período e busca da
+    ocupação são feitos em cada lote.
+    """
+    indice = atributos.indexar_ocupacao(df_ocupacao_diaria)
+
+    def preparar(lote):
+        return filtrar_periodo(limpar_sih(lote, ultimo_mes_cmpt=ultimo_mes_cmpt), inicio_mes=ano * 100 + 1)
+
+    ajuste = modelos.ajustar_sgd_em_lotes(
+        lambda: atributos.lotes_de_atributos(lotes_sih(), indice, preparar),
+        alvo='obito',
+        numericas=['IDADE', 'taxa_ocupacao_diaria_pct'],
+        categoricas=['MUNICIPIO', 'DS_TIPO_UNIDADE'],
+    )
+    resultado = _resumir_logistica(ajuste['modelo'], ajuste['colunas'], ajuste['distribuicao'], ajuste['y_test'], ajuste['y_pred'])
+    resultado['codificador'] = ajuste['codificador']
+    resultado['pipeline'] = Pipeline([('codificador', ajuste['codificador']), ('modelo', ajuste['modelo'])])
+    resultado['variaveis'] = ['IDADE', 'taxa_ocupacao_diaria_pct', 'MUNICIPIO', 'DS_TIPO_UNIDADE']
+    return resultado
+
+
+# ### SIH em lotes
+
+# linhas de df_combined guardadas para os modelos que precisam delas na memória
+MAX_AMOSTRA_LOTES = 500_000
+
+
+def somar_em_lotes(lotes, df_ocupacao_diaria, hospitais, inicio=20240101, amostra=MAX_AMOSTRA_LOTES, semente=0):
+    """Cubos, censo por especialidade e uma amostra de df_combined, somados lote a lote.
+
+    `lotes` é um iterável de lotes do SIH já limpos (limpar_sih), sem o filtro
+    de período. As somas dos cubos e os leito-dias são aditivos entre lotes
+    (as mesmas contas de `atualizar` em artefatos.py). A amostra tem até
+    `amostra` linhas de df_combined, sorteadas com a mesma probabilidade em
+    todos os lotes: fica com as de menor chave aleatória, sem precisar saber
+    o total de antemão.
+    """
+    indice = atributos.indexar_ocupacao(df_ocupacao_diaria)
+    rng = np.random.default_rng(semente)
+    aih = cubo_cids = censo = sorteadas = None
+    chaves = np.empty(0)
+    for lote in lotes:
+        if lote.empty:
+            continue
+        periodo = filtrar_periodo(lote, inicio_mes=inicio // 100)
+        aih = cubos.somar_aih(periodo) if aih is None else aih.add(cubos.somar_aih(periodo), fill_value=0)
+        cubo_cids = cubos.montar_cubo_cids(periodo) if cubo_cids is None else cubos.atualizar_cubo_cids(cubo_cids, periodo)
+        censo = (montar_censo_especialidade(lote, df_ocupacao_diaria, inicio=inicio) if censo is None
+                 else atualizar_censo_especialidade(censo, lote, df_ocupacao_diaria, inicio=inicio))
+
+        combinado = atributos.juntar_ocupacao(periodo, indice)
+        sorteadas = combinado if sorteadas is None else pd.concat([sorteadas, combinado])
+        chaves = np.concatenate([chaves, rng.random(len(combinado))])
+        if len(chaves) > amostra:
+            manter = np.sort(np.argpartition(chaves, amostra)[:amostra])
+            sorteadas, chaves = sorteadas.iloc[manter], chaves[manter]
+    if aih is None:
+        raise ValueError('Nenhuma AIH nos lotes do SIH')
+    agregados = {
+        'cubo_hospital_mes': cubos.montar_cubo_hospital_mes(df_ocupacao_diaria, aih, hospitais),
+        'cubo_cids': cubo_cids,
+        'censo_especialidade': censo,
+    }
+    return agregados, remover_categorias_vazias(sorteadas.reset_index(drop=True))
+
+
+def tabelas_de_cids(cubo_cids, df_stats, hospitais, medicoes=None):
+    # tabelas de CIDs a partir do cubo de CIDs, com as contagens já feitas (motor duckdb ou lotes)
+    etapa = (medicoes or Medicoes()).executar
+    return {
+        'cids_freq_hospitais': etapa('cids_mais_frequentes', cids_mais_frequentes, cubo_cids, df_stats, hospitais, pesos='qtd_aih'),
+        'cids_top_hospitais': etapa('cids_por_hospital', cids_por_hospital, cubo_cids, hospitais, pesos='qtd_aih'),
+        'internacoes_por_capitulo': etapa('internacoes_por_capitulo', internacoes_por_capitulo, cubo_cids, pesos='qtd_aih'),
+    }
+
+
+# ### Execução completa
+
+def executar(sih, hospitais, ano=2024, lotes_sih=None, ultimo_mes_cmpt=ULTIMO_MES_CMPT, medicoes=None, motor=None, avaliar=None,
+             balanceamento='smote', amostra=MAX_AMOSTRA_LOTES):
+    """Roda todas as etapas do relatório para um ano e devolve os resultados.
+
+    `sih` já limpo (limpar_sih) e `hospitais` montado a partir de
+    limpar_hospitais_leitos (hospitais.DimensaoHospitais).
+    Com `lotes_sih` (função que devolve um iterador novo de lotes do SIH
+    bruto, ver atributos.lotes_sih) o SIH nunca é carregado inteiro e `sih`
+    pode ser None: ocupação e estatísticas saem do estado incremental
+    (incremental.estado_inicial, devolvido em 'estado'), cubos, CIDs e censo
+    são somados lote a lote (somar_em_lotes), o modelo com município é
+    treinado lote a lote (ajustar_logistica_em_lotes) e o sem município e a
+    avaliação usam uma amostra de até `amostra` AIHs.
+    Cada etapa é registrada em `medicoes` (desempenho.Medicoes), se
+    informado. Com `motor` (motor_duckdb.MotorDuckDB) ocupação,
+    estatísticas, contagem de tipos, cubos e CIDs são agregados em SQL;
+    `sih` só alimenta os modelos. Com `avaliar` (dict, possivelmente vazio,
+    de argumentos de avaliacao.avaliar) os resultados incluem a comparação
+    dos modelos por validação cruzada em 'avaliacao_modelos'.
+    `balanceamento` é a estratégia do modelo sem município
+    (modelos.etapas_balanceamento).
+    """
+    medicoes = medicoes or Medicoes()
+    etapa = medicoes.executar
+    inicio, inicio_mes = ano * 10000 + 101, ano * 100 + 1
+    estado = None
+    if lotes_sih is not None:
+        def lotes_limpos():
+            for lote in lotes_sih():
+                yield limpar_sih(lote, ultimo_mes_cmpt=ultimo_mes_cmpt)
+
+        if motor is None:
+            estado = etapa('estado_em_lotes', incremental.estado_inicial, lotes_limpos(), inicio,
+                           incremental.competencias_ate(ano, ultimo_mes_cmpt))
+            df_ocupacao_diaria, df_stats = etapa('ocupacao_e_stats', montar_ocupacao_e_stats, estado, hospitais)
+            contagem_tipos = etapa('contagem_tipos', contar_tipos_unidade, hospitais)
+        else:
+            df_ocupacao_diaria = etapa('ocupacao_diaria', motor.montar_ocupacao_diaria, hospitais, inicio=inicio)
+            df_stats = etapa('stats', motor.calcular_stats, df_ocupacao_diaria, hospitais, inicio_mes=inicio_mes)
+            contagem_tipos = etapa('contagem_tipos', motor.contar_tipos_unidade, hospitais)
+        agregados, df_combined = etapa('somar_em_lotes', somar_em_lotes, lotes_limpos(), df_ocupacao_diaria, hospitais,
+                                       inicio=inicio, amostra=amostra)
+        agregados.update({'contagem_tipos': contagem_tipos, **tabelas_de_cids(agregados['cubo_cids'], df_stats, hospitais, medicoes)})
+        logistica_com_municipio = etapa('logistica_com_municipio', ajustar_logistica_em_lotes, lotes_sih, df_ocupacao_diaria, ano, ultimo_mes_cmpt)
+    else:
+        if motor is None:
+            df_ocupacao_diaria = etapa('ocupacao_diaria', montar_ocupacao_diaria, sih, hospitais, inicio=inicio)
+            sih_periodo = etapa('filtrar_periodo', filtrar_periodo, sih, inicio_mes=inicio_mes)
+            df_stats = etapa('stats', calcular_stats, df_ocupacao_diaria, sih_periodo, hospitais)
+            agregados = {
+                **etapa('cubos', montar_cubos, df_ocupacao_diaria, sih_periodo, hospitais),
+                'contagem_tipos': etapa('contagem_tipos', contar_tipos_unidade, hospitais),
+                'cids_freq_hospitais': etapa('cids_mais_frequentes', cids_mais_frequentes, sih_periodo, df_stats, hospitais),
+                'cids_top_hospitais': etapa('cids_por_hospital', cids_por_hospital, sih_periodo, hospitais),
+                'internacoes_por_capitulo': etapa('internacoes_por_capitulo', internacoes_por_capitulo, sih_periodo),
+            }
+        else:
+            df_ocupacao_diaria = etapa('ocupacao_diaria', motor.montar_ocupacao_diaria, hospitais, inicio=inicio)
+            sih_periodo = etapa('filtrar_periodo', filtrar_periodo, sih, inicio_mes=inicio_mes)
+            df_stats = etapa('stats', motor.calcular_stats, df_ocupacao_diaria, hospitais, inicio_mes=inicio_mes)
+            agregados = etapa('cubos', motor.montar_cubos, df_ocupacao_diaria, hospitais, inicio_mes=inicio_mes)
+            agregados.update({
+                'contagem_tipos': etapa('contagem_tipos', motor.contar_tipos_unidade, hospitais),
+                **tabelas_de_cids(agregados['cubo_cids'], df_stats, hospitais, medicoes),
+            })
+        agregados['censo_especialidade'] = etapa('censo_especialidade', montar_censo_especialidade, sih, df_ocupacao_diaria, inicio=inicio)
+        df_combined = etapa('df_combined', montar_df_combined, sih_periodo, df_ocupacao_diaria)
+        logistica_com_municipio = etapa('logistica_com_municipio', ajustar_logistica_com_municipio, df_combined)
+    if avaliar is not None:
+        agregados['avaliacao_modelos'] = etapa('avaliacao_modelos', avaliacao.comparar, df_stats, df_combined, **avaliar)
+    if estado is not None:
+        agregados['estado'] = estado
+    return {
+        'hospitais': hospitais,
+        'df_ocupacao_diaria': df_ocupacao_diaria,
+        'df_stats': df_stats,
+        **agregados,
+        'correlacoes': etapa('correlacoes', correlacoes, df_stats),
+        'modelos': {
+            'regressao_simples': etapa('regressao_simples', ajustar_regressao_simples, df_stats),
+            'regressao_multipla': etapa('regressao_multipla', ajustar_regressao_multipla, df_stats),
+            'logistica_sem_municipio': etapa('logistica_sem_municipio', ajustar_logistica_sem_municipio, df_combined, balanceamento),
+            'logistica_com_municipio': logistica_com_municipio,
+        },
+    }
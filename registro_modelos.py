@@ -0,0 +1,199 @@
+# coding: utf-8
+
+# Registro dos modelos ajustados: cada modelo é gravado uma vez por impressão
+# digital dos dados de treino e depois só é lido para exibir ou pontuar novos
+# lotes, sem novo ajuste. Os resultados de pipeline.ajustar_* trazem um
+# `pipeline` (sklearn) que recebe as variáveis originais, sem dummies nem
+# escala, e devolve a previsão.
+#
+#   <diretorio>/<nome>/<impressao>.joblib   resultado do ajuste (pipeline, métricas, dados de avaliação)
+#   <diretorio>/<nome>/<impressao>.json     metadados: variáveis, colunas, métricas, data do ajuste
+#
+# Exemplo:
+#   python -m registro_modelos listar --registro artefatos/modelos
+#   python -m registro_modelos pontuar --registro artefatos/modelos --entrada aihs.parquet --saida pontuacao.parquet
+
+import argparse
+import glob
+import json
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+# alvo de cada modelo de pipeline.executar; nas logísticas a pontuação é a probabilidade de óbito
+ALVOS = {
+    'regressao_simples': 'taxa_ocupacao_mean_pct',
+    'regressao_multipla': 'taxa_ocupacao_mean_pct',
+    'logistica_sem_municipio': 'obito',
+    'logistica_com_municipio': 'obito',
+}
+
+
+def metricas(resultado):
+    if 'relatorio' not in resultado:
+        return {'rmse': float(resultado['rmse']), 'r2': float(resultado['r2'])}
+    relatorio = resultado['relatorio']
+    classes = [c for c in relatorio.index if c not in ('accuracy', 'macro avg', 'weighted avg')]
+    return {
+        'acuracia': float(relatorio.loc['accuracy', 'precision']),
+        'f1_macro': float(relatorio.loc['macro avg', 'f1-score']),
+        'recall': {c: float(relatorio.loc[c, 'recall']) for c in classes},
+    }
+
+
+def colunas_codificadas(resultado):
+    # colunas que entram no modelo, depois de dummies e escala; etapas de reamostragem não mudam as colunas
+    colunas = list(resultado['variaveis'])
+    for _, etapa in resultado['pipeline'].steps[:-1]:
+        if hasattr(etapa, 'get_feature_names_out'):
+            colunas = etapa.get_feature_names_out(colunas)
+    return [str(c) for c in colunas]
+
+
+def pontuar(resultado, frame, tamanho_lote=None):
+    """Previsão do modelo para cada linha de `frame`, sem reajuste.
+
+    Logísticas devolvem a probabilidade da classe positiva (óbito); regressões,
+    o valor previsto. `frame` precisa das colunas em resultado['variaveis'];
+    com `tamanho_lote` a pontuação é feita em fatias, para limitar a memória
+    da codificação.
+    """
+    pipeline = resultado['pipeline']
+    x = frame[resultado['variaveis']]
+    prever = (lambda parte: pipeline.predict_proba(parte)[:, 1]) if hasattr(pipeline, 'predict_proba') else pipeline.predict
+    if not tamanho_lote or len(x) <= tamanho_lote:
+        return np.ravel(prever(x))
+    return np.concatenate([np.ravel(prever(x.iloc[inicio:inicio + tamanho_lote])) for inicio in range(0, len(x), tamanho_lote)])
+
+
+def pontuar_modelos(modelos, frame, nomes=None, tamanho_lote=None):
+    """Uma coluna por modelo de `modelos` ({nome: resultado}) com a pontuação de cada linha de `frame`.
+
+    Sem `nomes`, usa os modelos cujas variáveis estão em `frame` (hospitais
+    para as regressões, AIHs para as logísticas).
+    """
+    pontuacao = pd.DataFrame(index=frame.index)
+    for nome in (modelos if nomes is None else nomes):
+        faltando = set(modelos[nome]['variaveis']) - set(frame.columns)
+        if faltando:
+            if nomes is not None:
+                raise ValueError(f'Faltam variáveis para {nome}: {", ".join(sorted(faltando))}')
+            continue
+        pontuacao[nome] = pontuar(modelos[nome], frame, tamanho_lote)
+    return pontuacao
+
+
+class RegistroModelos:
+    """Modelos ajustados gravados em disco, um por (nome, impressão dos dados de treino)."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def _caminho(self, nome, impressao, extensao):
+        return os.path.join(self.diretorio, nome, f'{impressao}.{extensao}')
+
+    def registrar(self, nome, resultado, impressao, **extras):
+        # o JSON é gravado por último: sem ele a entrada não é considerada completa
+        os.makedirs(os.path.join(self.diretorio, nome), exist_ok=True)
+        joblib.dump(resultado, self._caminho(nome, impressao, 'joblib'))
+        metadados = {
+            'nome': nome,
+            'impressao': impressao,
+            'tipo': type(resultado['pipeline'][-1]).__name__,
+            'alvo': ALVOS.get(nome),
+            'variaveis': list(resultado['variaveis']),
+            'colunas': colunas_codificadas(resultado),
+            'metricas': metricas(resultado),
+            'balanceamento': resultado.get('balanceamento'),
+            # microssegundos: dois registros no mesmo segundo ainda têm ordem (ver metadados)
+            'treinado_em': datetime.now().isoformat(timespec='microseconds'),
+            'versao_sklearn': sklearn.__version__,
+            **extras,
+        }
+        with open(self._caminho(nome, impressao, 'json'), 'w', encoding='utf-8') as f:
+            json.dump(metadados, f, indent=2, ensure_ascii=False)
+        return metadados
+
+    def metadados(self, nome, impressao=None):
+        # entrada da impressão pedida ou, sem ela, a mais recente; None se não houver.
+        # Empates em treinado_em (entradas antigas, gravadas com segundos) ficam com o JSON modificado por último
+        if impressao is None:
+            caminhos = glob.glob(os.path.join(self.diretorio, nome, '*.json'))
+            ordem = [(self._ler_json(c), os.stat(c).st_mtime_ns) for c in caminhos]
+            mais_recente = max(ordem, key=lambda par: (par[0]['treinado_em'], par[1]), default=None)
+            return None if mais_recente is None else mais_recente[0]
+        caminho = self._caminho(nome, impressao, 'json')
+        return self._ler_json(caminho) if os.path.exists(caminho) else None
+
+    @staticmethod
+    def _ler_json(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+
+    def carregar(self, nome, impressao=None):
+        metadados = self.metadados(nome, impressao)
+        if metadados is None:
+            return None
+        return joblib.load(self._caminho(nome, metadados['impressao'], 'joblib'))
+
+    def nomes(self):
+        if not os.path.isdir(self.diretorio):
+            return []
+        return sorted(n for n in os.listdir(self.diretorio) if glob.glob(os.path.join(self.diretorio, n, '*.json')))
+
+    def listar(self):
+        linhas = []
+        for nome in self.nomes():
+            for caminho in glob.glob(os.path.join(self.diretorio, nome, '*.json')):
+                metadados = self._ler_json(caminho)
+                linhas.append({
+                    **{c: metadados[c] for c in ('nome', 'impressao', 'tipo', 'alvo', 'treinado_em')},
+                    **pd.json_normalize(metadados['metricas']).iloc[0].to_dict(),
+                })
+        return pd.DataFrame(linhas).sort_values(['nome', 'treinado_em'], ignore_index=True) if linhas else pd.DataFrame()
+
+    def pontuar(self, frame, nomes=None, impressao=None, tamanho_lote=None):
+        # pontuar_modelos com os modelos do registro (os mais recentes, sem `impressao`)
+        modelos = {}
+        for nome in (self.nomes() if nomes is None else nomes):
+            modelos[nome] = self.carregar(nome, impressao)
+            if modelos[nome] is None:
+                raise ValueError(f'Modelo não registrado: {nome}')
+        return pontuar_modelos(modelos, frame, nomes, tamanho_lote)
+
+
+def _ler_tabela(caminho):
+    return pd.read_csv(caminho) if caminho.endswith('.csv') else pd.read_parquet(caminho)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lista e aplica os modelos registrados.')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    listar = comandos.add_parser('listar', help='mostra os modelos registrados e suas métricas')
+    listar.add_argument('--registro', default='modelos')
+
+    aplicar = comandos.add_parser('pontuar', help='pontua um lote de AIHs ou hospitais sem reajustar os modelos')
+    aplicar.add_argument('--registro', default='modelos')
+    aplicar.add_argument('--entrada', required=True, help='Parquet ou CSV com as variáveis dos modelos')
+    aplicar.add_argument('--saida', required=True, help='Parquet com a entrada e uma coluna por modelo')
+    aplicar.add_argument('--modelos', nargs='+', default=None,
+                          help='nomes dos modelos (padrão: todos os aplicáveis à entrada)')
+    aplicar.add_argument('--lotes', type=int, default=None, help='pontua em fatias de N linhas')
+    args = parser.parse_args(argv)
+
+    registro = RegistroModelos(args.registro)
+    if args.comando == 'listar':
+        print(registro.listar().to_string(index=False))
+    else:
+        entrada = _ler_tabela(args.entrada)
+        pontuacao = registro.pontuar(entrada, args.modelos, tamanho_lote=args.lotes)
+        entrada.join(pontuacao.add_prefix('pontuacao_')).to_parquet(args.saida)
+        print(f'{len(entrada)} linhas pontuadas por {", ".join(pontuacao.columns)} em {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
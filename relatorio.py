@@ -6,6 +6,22 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
+import json
+import os
+import zipfile
+
+import artefatos
+import avaliacao
+import cid10
+import cubos
+import figuras
+import motor_duckdb
+import pipeline
+import registro_modelos
+import resumo
+from carregamento import URL_HOSPITAL_E_LEITOS_BR, URL_SIH_PB_2024, carregar_hospitais_leitos, carregar_sih
+from desempenho import Medicoes
+from hospitais import DimensaoHospitais
 
 st.set_page_config(page_title='Análise de Superlotação em Hospitais da Paraíba', layout='wide')
 st.title('Análise de Superlotação em Hospitais da Paraíba')
@@ -40,183 +56,260 @@ st.divider()
 
 # In[1]:
 
-# ### Hospital e Leito
-# Fonte: OpenDataSUS
+# Todo o processamento fica em pipeline.py. Aqui cada etapa é envolvida pelo
+# cache do Streamlit, indexado pela impressão digital dos dados de entrada,
+# para que interações com a página só redesenhem os gráficos.
+TTL_CACHE = 24 * 60 * 60
+MAX_ENTRADAS_CACHE = 4
 
-url_hospital_e_leitos_br = "https://drive.google.com/uc?id=1LRPmb12Et55FEBwi8eL2NgX0s4JQvJ5d"
-hospital_e_leitos_br = pd.read_csv(url_hospital_e_leitos_br, encoding='ISO-8859-1')
+# diretório gerado por `python -m artefatos build`; se existir, o painel só lê os resultados
+DIR_ARTEFATOS = os.environ.get('SUPERLOTACAO_ARTEFATOS', 'artefatos')
 
-# Limpeza de dados
-hospital_e_leitos_pb = hospital_e_leitos_br[(hospital_e_leitos_br['UF'] == 'PB')]
+# sem artefatos, os modelos ajustados ficam neste registro e só são reajustados quando os dados mudam
+registro = registro_modelos.RegistroModelos(os.environ.get('SUPERLOTACAO_MODELOS', 'modelos'))
 
-hospital_e_leitos_pb = hospital_e_leitos_pb.drop(['REGIAO', 'UF', 'MOTIVO_DESABILITACAO', 'CO_TIPO_UNIDADE', 'NATUREZA_JURIDICA', 'NO_COMPLEMENTO'], axis=1)
+# tempo, CPU e memória de cada etapa desta execução da página (expander "Performance" no fim);
+# etapas servidas pelo cache do Streamlit aparecem com tempo quase zero
+medicoes = Medicoes()
 
-hospital_e_leitos_pb[['NU_TELEFONE', 'NO_EMAIL']] = hospital_e_leitos_pb[['NU_TELEFONE', 'NO_EMAIL']].fillna('Não se aplica')
+# Os CSVs ficam em cache local (Parquet); o botão força um novo download
+atualizar_dados = st.sidebar.button('Atualizar dados')
+if atualizar_dados:
+    st.cache_data.clear()
+    st.cache_resource.clear()
 
-hospital_e_leitos_pb = hospital_e_leitos_pb.rename(columns={
-    'COMP':'ANO_MES_COMPETENCIA',
-    'CNES':'ID_CNES',
-    'TP_GESTAO':'TIPO_GESTAO'
-})
+# ### Hospital e Leito (OpenDataSUS) e SIH Paraíba (PySUS)
+# URLs em carregamento.py
+# Dicionário de Variáveis (https://pcdas.icict.fiocruz.br/conjunto-de-dados/sistema-de-informacoes-hospitalares-do-sus-sihsus/dicionario-de-variaveis/)
 
-hospital_e_leitos_pb['TIPO_GESTAO'] = hospital_e_leitos_pb['TIPO_GESTAO'].replace({
-    'M':'Municipal',
-    'E':'Estadual',
-    'D':'Dupla',
-    'S':'Sem Gestão'
-})
 
+@st.cache_resource(ttl=TTL_CACHE, max_entries=1, show_spinner='Carregando os dados...')
+def carregar_dados(atualizar=False):
+    # descrições da CID-10 (o `artefatos build` também grava esta tabela); sem a
+    # fonte do DATASUS o painel segue com as descrições embutidas em cid10.py
+    try:
+        cid10.preparar_tabela(atualizar=atualizar)
+    except (OSError, zipfile.BadZipFile, KeyError, ValueError) as erro:
+        st.warning(f'Tabela da CID-10 indisponível ({erro}); usando só as descrições já conhecidas.')
+    hospital_e_leitos_br = carregar_hospitais_leitos(URL_HOSPITAL_E_LEITOS_BR, atualizar=atualizar)
+    hospitais = DimensaoHospitais(pipeline.limpar_hospitais_leitos(hospital_e_leitos_br, uf='PB'))
+    sih = pipeline.limpar_sih(carregar_sih(URL_SIH_PB_2024, atualizar=atualizar))
+    return hospitais, sih, pipeline.impressao_digital(hospitais.tabela, sih)
 
-# ### SIH João Pessoa
-# Fonte: PySUS
 
-# In[2]:
+@st.cache_resource(ttl=TTL_CACHE, max_entries=1, show_spinner=False)
+def obter_motor(impressao, _sih):
+    # None com o motor pandas; SUPERLOTACAO_MOTOR=duckdb agrega em SQL (ver motor_duckdb.py)
+    return motor_duckdb.criar_motor(motor_duckdb.MOTOR_PADRAO, _sih)
 
-import streamlit as st
-import pandas as pd 
 
-# Dicionário de Variáveis (https://pcdas.icict.fiocruz.br/conjunto-de-dados/sistema-de-informacoes-hospitalares-do-sus-sihsus/dicionario-de-variaveis/)
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_ocupacao_diaria(impressao, _sih, _hospitais):
+    motor = obter_motor(impressao, _sih)
+    if motor is not None:
+        return motor.montar_ocupacao_diaria(_hospitais, inicio=20240101)
+    return pipeline.montar_ocupacao_diaria(_sih, _hospitais, inicio=20240101)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_censo_especialidade(impressao, _sih, _df_ocupacao_diaria):
+    return pipeline.montar_censo_especialidade(_sih, _df_ocupacao_diaria, inicio=20240101)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_sih_periodo(impressao, _sih):
+    return pipeline.filtrar_periodo(_sih, inicio_mes=202401)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_stats(impressao, _df_ocupacao_diaria, _sih, _hospitais, _sih_completo):
+    motor = obter_motor(impressao, _sih_completo)
+    if motor is not None:
+        return motor.calcular_stats(_df_ocupacao_diaria, _hospitais, inicio_mes=202401)
+    return pipeline.calcular_stats(_df_ocupacao_diaria, _sih, _hospitais)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_cubos(impressao, _df_ocupacao_diaria, _sih, _hospitais, _sih_completo):
+    motor = obter_motor(impressao, _sih_completo)
+    if motor is not None:
+        return motor.montar_cubos(_df_ocupacao_diaria, _hospitais, inicio_mes=202401)
+    return pipeline.montar_cubos(_df_ocupacao_diaria, _sih, _hospitais)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=64, show_spinner=False)
+def obter_resultados_filtrados(impressao, periodo, municipios, tipos_unidade, tipos_gestao, cnes, _resultados):
+    # só soma linhas dos cubos; cada combinação de filtros fica em cache
+    return pipeline.resultados_filtrados(
+        _resultados['cubo_hospital_mes'], _resultados['cubo_cids'], _resultados['hospitais'],
+        periodo=periodo, municipios=municipios, tipos_unidade=tipos_unidade, tipos_gestao=tipos_gestao, cnes=cnes,
+    )
+
+
+def obter_modelo(nome, impressao, ajustar):
+    # lê do registro o modelo treinado com estes dados; ajusta e registra se ainda não existir
+    resultado = registro.carregar(nome, impressao)
+    if resultado is None:
+        resultado = ajustar()
+        registro.registrar(nome, resultado, impressao)
+    return resultado
+
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner='Ajustando os modelos...')
+def obter_modelos_regressao(impressao, _df_stats):
+    return (obter_modelo('regressao_simples', impressao, lambda: pipeline.ajustar_regressao_simples(_df_stats)),
+            obter_modelo('regressao_multipla', impressao, lambda: pipeline.ajustar_regressao_multipla(_df_stats)))
+
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner='Ajustando os modelos...')
+def obter_modelos_logisticos(impressao, _sih, _df_ocupacao_diaria):
+    # df_combined só é montado quando algum modelo precisa ser ajustado
+    combinado = []
+
+    def df_combined():
+        if not combinado:
+            combinado.append(pipeline.montar_df_combined(_sih, _df_ocupacao_diaria))
+        return combinado[0]
+
+    return (obter_modelo('logistica_sem_municipio', impressao, lambda: pipeline.ajustar_logistica_sem_municipio(df_combined())),
+            obter_modelo('logistica_com_municipio', impressao, lambda: pipeline.ajustar_logistica_com_municipio(df_combined())))
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner='Rodando a validação cruzada...')
+def obter_avaliacao_modelos(impressao, _df_stats, _sih, _df_ocupacao_diaria):
+    # as dobras já avaliadas ficam em cache/avaliacao e não são reajustadas
+    df_combined = pipeline.montar_df_combined(_sih, _df_ocupacao_diaria)
+    return avaliacao.comparar(_df_stats, df_combined)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner='Calculando as correlações...')
+def obter_correlacoes(impressao, _df_stats):
+    # depende dos filtros: `impressao` é a do painel
+    return pipeline.correlacoes(_df_stats)
+
+
+@st.cache_data(ttl=TTL_CACHE, max_entries=MAX_ENTRADAS_CACHE, show_spinner=False)
+def obter_resumo(impressao, _df_stats):
+    # uma única tabela para todas as colunas e grupos; `impressao` é a do painel
+    return resumo.resumir(_df_stats, por=['tipo_unidade', 'municipio'])
+
+
+@st.cache_resource(ttl=TTL_CACHE, max_entries=1, show_spinner='Carregando os artefatos...')
+def obter_artefatos(diretorio, gerado_em):
+    return artefatos.carregar(diretorio)
+
+
+if artefatos.existem(DIR_ARTEFATOS):
+    # painel somente leitura: tudo foi pré-calculado por `python -m artefatos build`
+    manifesto = artefatos.ler_manifesto(DIR_ARTEFATOS)
+    resultados = medicoes.executar('carregar_artefatos', obter_artefatos, DIR_ARTEFATOS, manifesto['gerado_em'])
+    impressao_resultados = f"{manifesto['impressao']}-{manifesto['gerado_em']}"
+else:
+    hospitais_pb, sih_completo, impressao_dados = medicoes.executar('carregar_dados', carregar_dados, atualizar=atualizar_dados)
+    impressao_resultados = impressao_dados
+
+    # entradas, saídas, taxa de óbitos e leitos ocupados por hospital e dia (ver ocupacao.py)
+    # as internações iniciadas antes de 2024 entram no censo até a data de saída
+    df_ocupacao_diaria = medicoes.executar('ocupacao_diaria', obter_ocupacao_diaria, impressao_dados, sih_completo, hospitais_pb)
+
+    # pega apenas as internações de 2024
+    sih_pb_2024 = medicoes.executar('filtrar_periodo', obter_sih_periodo, impressao_dados, sih_completo)
+
+    df_stats = medicoes.executar('stats', obter_stats, impressao_dados, df_ocupacao_diaria, sih_pb_2024, hospitais_pb, sih_completo)
+    regressao_simples, regressao_multipla = medicoes.executar('modelos_regressao', obter_modelos_regressao, impressao_dados, df_stats)
+    logistica_sem_municipio, logistica_com_municipio = medicoes.executar(
+        'modelos_logisticos', obter_modelos_logisticos, impressao_dados, sih_pb_2024, df_ocupacao_diaria)
+    resultados = {
+        'hospitais': hospitais_pb,
+        'df_ocupacao_diaria': df_ocupacao_diaria,
+        'df_stats': df_stats,
+        **medicoes.executar('cubos', obter_cubos, impressao_dados, df_ocupacao_diaria, sih_pb_2024, hospitais_pb, sih_completo),
+        'censo_especialidade': medicoes.executar('censo_especialidade', obter_censo_especialidade, impressao_dados, sih_completo, df_ocupacao_diaria),
+        'modelos': {
+            'regressao_simples': regressao_simples,
+            'regressao_multipla': regressao_multipla,
+            'logistica_sem_municipio': logistica_sem_municipio,
+            'logistica_com_municipio': logistica_com_municipio,
+        },
+    }
+
+# ### Filtros
+# respondidos pelos cubos pré-agregados (ver cubos.py), sem refazer os groupbys sobre as AIHs;
+# seleção vazia não filtra. Os modelos continuam ajustados com todos os dados.
+st.sidebar.header('Filtros')
+st.sidebar.caption('Valem para gráficos, estatísticas e CIDs; os modelos usam todos os dados.')
+cubo_hospital_mes = resultados['cubo_hospital_mes']
+atributos_hospitais = resultados['hospitais'].atributos
+meses = sorted(cubo_hospital_mes['mes_ano'].unique().tolist())
+periodo = st.sidebar.select_slider('Período (AAAAMM)', options=meses, value=(meses[0], meses[-1]))
+municipios = st.sidebar.multiselect('Município', list(cubo_hospital_mes['MUNICIPIO'].cat.categories))
+tipos_unidade = st.sidebar.multiselect('Tipo de unidade', list(cubo_hospital_mes['DS_TIPO_UNIDADE'].cat.categories))
+tipos_gestao = st.sidebar.multiselect('Tipo de gestão', list(cubo_hospital_mes['TIPO_GESTAO'].cat.categories))
+cnes = st.sidebar.multiselect(
+    'Hospital',
+    atributos_hospitais.index.tolist(),
+    format_func=lambda c: f"{atributos_hospitais.at[c, 'NOME_ESTABELECIMENTO']} ({c})",
+)
+filtros = {
+    'periodo': tuple(periodo),
+    'municipios': tuple(municipios),
+    'tipos_unidade': tuple(tipos_unidade),
+    'tipos_gestao': tuple(tipos_gestao),
+    'cnes': tuple(cnes),
+}
+filtrados = medicoes.executar('filtros', obter_resultados_filtrados, impressao_resultados, **filtros, _resultados=resultados)
+# as figuras em cache também dependem dos filtros
+impressao_painel = f"{impressao_resultados}-{json.dumps(filtros, sort_keys=True, default=str)}"
+
+cubo_filtrado = filtrados['cubo_hospital_mes']
+df_stats = filtrados['df_stats']
+if df_stats.empty:
+    st.warning('Nenhum hospital com leitos SUS para os filtros escolhidos.')
+    st.stop()
+
+
+def exibir_figura(nome, desenhar, filtrada=True, **params):
+    # a figura só é desenhada quando não está no cache para estes dados e parâmetros;
+    # as dos modelos (filtrada=False) não dependem dos filtros
+    with medicoes.etapa(f'figura:{nome}'):
+        imagem = figuras.figura_em_cache(nome, desenhar, impressao_painel if filtrada else impressao_resultados, **params)
+    st.image(imagem)
 
-url_sih_pb_2024 = f"https://www.dropbox.com/scl/fi/6pbph1llgydgsbhwi054x/dados_sih_pb_2024.csv?rlkey=ke7suvsvakniipj0hszb85xyk&st=qgipi74x&dl=1"
-
-# Baixando o arquivo CSV
-with st.spinner('Carregando os dados...'):
-    sih_pb_2024 = pd.read_csv(url_sih_pb_2024, low_memory=False)
-
-# Limpeza de dados
-sih_pb_2024 = sih_pb_2024.drop(['UF_ZI', 'CGC_HOSP', 'N_AIH', 'IDENT', 'CEP', 'MUNIC_RES', 'NASC', 'SEXO',
-                                'UTI_MES_IN', 'UTI_MES_AN', 'UTI_MES_AL', 'UTI_MES_TO','UTI_INT_IN', 
-                                'UTI_INT_AN', 'UTI_INT_AL', 'UTI_INT_TO', 'DIAR_ACOM', 'QT_DIARIAS',
-                                'PROC_SOLIC', 'VAL_SH', 'VAL_SP', 'VAL_SADT', 'VAL_RN', 'VAL_ACOMP',
-                                'VAL_ORTP', 'VAL_SANGUE', 'VAL_SADTSR', 'VAL_TRANSP', 'VAL_OBSANG',
-                                'VAL_PED1AC', 'VAL_UTI', 'US_TOT', 'DIAG_SECUN','COBRANCA', 'NATUREZA',
-                                'NAT_JUR', 'GESTAO', 'RUBRICA', 'IND_VDRL', 'COD_IDADE', 'NACIONAL', 'NUM_PROC',
-                                'CAR_INT', 'TOT_PT_SP', 'INSTRU', 'CID_NOTIF', 'CONTRACEP1', 'CONTRACEP2', 'GESTRISCO',
-                                'INSC_PN', 'GESTOR_COD', 'GESTOR_TP', 'GESTOR_CPF', 'GESTOR_DT', 'CNPJ_MANT', 'INFEHOSP', 'CID_ASSO',
-                                'CID_MORTE', 'COMPLEX', 'FINANC', 'FAEC_TP', 'REGCT', 'AUD_JUST', 'SIS_JUST', 'VAL_SH_FED', 'DIAGSEC6',
-                                'DIAGSEC7', 'DIAGSEC8', 'DIAGSEC9', 'TPDISEC1', 'TPDISEC4', 'TPDISEC5', 'TPDISEC6', 'TPDISEC7', 'TPDISEC8', 'TPDISEC9', 
-                                'CBOR', 'CNAER', 'VINCPREV', 'CPF_AUT', 'HOMONIMO', 'NUM_FILHOS', 'SEQ_AIH5', 'RACA_COR', 'ETNIA', 'SEQUENCIA', 'REMESSA',
-                                'VAL_SP_FED', 'VAL_SH_GES', 'VAL_SP_GES', 'VAL_UCI', 'MARCA_UCI', 'DIAGSEC1', 'DIAGSEC2', 'DIAGSEC3', 'DIAGSEC4', 'DIAGSEC5',
-                                'TPDISEC2', 'TPDISEC3', 'MARCA_UTI'], axis=1)
-
-
-sih_pb_2024 = sih_pb_2024.rename(columns={
-    'ESPEC': 'especialidade_leito',
-    'PROC_REA': 'procedimento_realizado',
-    'VAL_TOT': 'valor_total_aih',
-    'DT_INTER': 'dt_internacao',
-    'DT_SAIDA': 'dt_saida',
-    'DIAG_PRINC': 'cid_principal',
-    'MUNIC_MOV': 'municipio_estabelecimento',
-    'DIAS_PERM': 'dias_permanencia',
-    'MORTE': 'obito',
-    'CNES': 'id_cnes',
-})
-
-sih_pb_2024 = sih_pb_2024[sih_pb_2024['MES_CMPT'] <= 11]
-
-# In[3]:
-
-# pegando apenas o ano e mes e inserindo em nova coluna
-sih_pb_2024['mes_ano'] = sih_pb_2024['dt_internacao'].astype(str).str[:6]
-sih_pb_2024['mes_ano_saida'] = sih_pb_2024['dt_saida'].astype(str).str[:6]
-sih_pb_2024 = sih_pb_2024[sih_pb_2024['mes_ano'] >= '202401'] # pega apenas o ano de 2024
-hospital_e_leitos_pb['mes_ano_leitos'] = hospital_e_leitos_pb['ANO_MES_COMPETENCIA'].astype(str)
-
-# pegando as quantidade de entrada, saidas e leitos por hospital e mês
-qtd_entradas = sih_pb_2024.groupby(['id_cnes', 'mes_ano', 'dt_internacao']).size().reset_index(name='qtd_entradas')
-qtd_saidas = sih_pb_2024.groupby(['id_cnes', 'mes_ano_saida', 'dt_saida']).size().reset_index(name='qtd_saidas')
-qtd_saidas = qtd_saidas.rename(columns={'mes_ano_saida': 'mes_ano', 'dt_saida': 'data'})
-qtd_entradas = qtd_entradas.rename(columns={'dt_internacao': 'data'})
-qtd_leitos_sus = hospital_e_leitos_pb[['ID_CNES', 'mes_ano_leitos', 'LEITOS_SUS']]
-sih_pb_2024['data'] = sih_pb_2024['dt_internacao']
-taxa_obitos_pct = sih_pb_2024.groupby(['id_cnes', 'mes_ano', 'data'])['obito'].mean().mul(100).round(2).reset_index(name='taxa_obito_pct')
-
-# juntando e limpando o novo df
-df_ocupacao_diaria = pd.merge(qtd_entradas, qtd_saidas, on=['id_cnes', 'mes_ano', 'data'], how='outer')
-df_ocupacao_diaria = pd.merge(df_ocupacao_diaria, hospital_e_leitos_pb[['ID_CNES', 'mes_ano_leitos', 'LEITOS_SUS', 'DS_TIPO_UNIDADE', 'MUNICIPIO']], left_on=['id_cnes', 'mes_ano'], right_on=['ID_CNES', 'mes_ano_leitos'], how='left')
-df_ocupacao_diaria = pd.merge(df_ocupacao_diaria, taxa_obitos_pct, on=['id_cnes', 'mes_ano', 'data'], how='left')
-
-df_ocupacao_diaria = df_ocupacao_diaria.drop(['mes_ano_leitos', 'ID_CNES'], axis=1)
-df_ocupacao_diaria = df_ocupacao_diaria.rename(columns={'LEITOS_SUS': 'total_leitos_sus'})
-df_ocupacao_diaria = df_ocupacao_diaria[df_ocupacao_diaria['total_leitos_sus'].notna()]
-df_ocupacao_diaria['qtd_entradas'] = df_ocupacao_diaria['qtd_entradas'].fillna(0).astype(int)
-df_ocupacao_diaria['qtd_saidas'] = df_ocupacao_diaria['qtd_saidas'].fillna(0).astype(int)
-df_ocupacao_diaria['total_leitos_sus'] = df_ocupacao_diaria['total_leitos_sus'].astype(int)
-df_ocupacao_diaria['taxa_obito_pct'] = df_ocupacao_diaria['taxa_obito_pct'].fillna(0)
-
-df_ocupacao_diaria['dif_entrada_saida'] = df_ocupacao_diaria['qtd_entradas'] - df_ocupacao_diaria['qtd_saidas']
-df_ocupacao_diaria['leitos_ocupados'] = df_ocupacao_diaria.groupby(['id_cnes'])['dif_entrada_saida'].cumsum() 
-
-# Calculando a taxa de ocupação diária
-df_ocupacao_diaria['taxa_ocupacao_diaria_pct'] = (df_ocupacao_diaria['leitos_ocupados'] / df_ocupacao_diaria['total_leitos_sus']) * 100
-df_ocupacao_diaria['taxa_ocupacao_diaria_pct'] = df_ocupacao_diaria['taxa_ocupacao_diaria_pct'].round(2)
 
 # Exibindo gráficos
 # ==================================================================================
 st.header("Distribuição Temporal")
 
-fig1, ax1 = plt.subplots(figsize=(10, 6))
-sns.lineplot(
-    data=df_ocupacao_diaria,
-    x="mes_ano",
-    y="taxa_ocupacao_diaria_pct",
-    hue="DS_TIPO_UNIDADE",
-    palette="bright",
-    marker="o",
-    ax=ax1
-)
-ax1.set_title('Distribuição da Taxa de Ocupação dos Leitos SUS na Paraíba')
-ax1.set_ylabel('Taxa de Ocupação (%)')
-ax1.grid(True)
-ax1.tick_params(axis='x', rotation=45)
-ax1.legend(loc='upper left', bbox_to_anchor=(1, 1))
+# as linhas mensais partem de médias já agregadas por mês e tipo de unidade
+mostrar_ic = st.sidebar.checkbox('Intervalo de confiança nos gráficos mensais', value=True)
+
+def desenhar_linha_mensal(coluna, titulo, ylabel, ic):
+    medias = cubos.medias_mensais(cubo_filtrado, coluna, por='DS_TIPO_UNIDADE', ic=ic)
+    return figuras.grafico_linha_mensal(medias, coluna, titulo, ylabel, por='DS_TIPO_UNIDADE')
 
 st.subheader("Taxa de Ocupação dos Leitos SUS na Paraíba")
-st.pyplot(fig1)
-plt.close(fig1)
+exibir_figura('fig1', desenhar_linha_mensal, coluna='taxa_ocupacao_diaria_pct', ic=mostrar_ic,
+              titulo='Distribuição da Taxa de Ocupação dos Leitos SUS na Paraíba', ylabel='Taxa de Ocupação (%)')
 
 # ==================================================================================
-fig2, ax2 = plt.subplots(figsize=(10, 6))
-sns.lineplot(
-    data=df_ocupacao_diaria,
-    x="mes_ano",
-    y="total_leitos_sus",
-    hue="DS_TIPO_UNIDADE",
-    palette="bright",
-    marker="o",
-    ax=ax2 
-)
-ax2.set_title('Distribuição de Leitos SUS na Paraíba')
-ax2.set_ylabel('Média Leitos SUS')
-ax2.grid(True)
-ax2.tick_params(axis='x', rotation=45)
-ax2.legend(loc='upper left', bbox_to_anchor=(1, 1))
-
 st.subheader("Leitos SUS na Paraíba")
-st.pyplot(fig2)
-plt.close(fig2)
+exibir_figura('fig2', desenhar_linha_mensal, coluna='total_leitos_sus', ic=mostrar_ic,
+              titulo='Distribuição de Leitos SUS na Paraíba', ylabel='Média Leitos SUS')
 
 # ==================================================================================
-fig3, ax3 = plt.subplots(figsize=(10, 6))
-sns.lineplot(
-    data=df_ocupacao_diaria,
-    x="mes_ano",
-    y="taxa_obito_pct",
-    hue="DS_TIPO_UNIDADE",
-    palette="bright",
-    marker="o",
-    ax=ax3
-)
-ax3.set_title('Distribuição da Taxa de Óbitos na Paraíba')
-ax3.set_ylabel('Taxa de Óbitos (%)')
-ax3.grid(True)
-ax3.tick_params(axis='x', rotation=45)
-ax3.legend(loc='upper left', bbox_to_anchor=(1, 1))
-
 st.subheader("Taxa de Óbitos na Paraíba")
-st.pyplot(fig3)
-plt.close(fig3)
+exibir_figura('fig3', desenhar_linha_mensal, coluna='taxa_obito_pct', ic=mostrar_ic,
+              titulo='Distribuição da Taxa de Óbitos na Paraíba', ylabel='Taxa de Óbitos (%)')
+
+# artefatos anteriores ao censo por especialidade não trazem a tabela
+if 'censo_especialidade' in resultados:
+    with st.expander('Leitos ocupados por especialidade do leito'):
+        st.caption('Média diária de leitos ocupados no mês, pelos intervalos de internação das AIHs, somada nos hospitais filtrados.')
+        censo = resultados['censo_especialidade'].merge(cubo_filtrado[['id_cnes', 'mes_ano']], on=['id_cnes', 'mes_ano'])
+        media = censo.assign(leitos_ocupados=censo['leito_dias'] / censo['dias']).pivot_table(
+            index='especialidade_leito', columns='mes_ano', values='leitos_ocupados', aggfunc='sum', fill_value=0)
+        st.dataframe(media.rename(index=lambda e: pipeline.ESPECIALIDADES_LEITO.get(e, str(e))).rename_axis('Especialidade').round(1),
+                     use_container_width=True)
 st.divider()
 
 
@@ -227,180 +320,156 @@ st.header("Média de Ocupacão Diária")
 st.markdown('''Vamos entender a demanda dos hospitais localizados no estado da Paraíba.
             ''')
 
-entrada_stats = df_ocupacao_diaria.groupby(['id_cnes'])['qtd_entradas'].mean(numeric_only=True).round(2)
-permanencia_stats = sih_pb_2024.groupby(['id_cnes'])['dias_permanencia'].mean().round(2)
-leitos_sus_mean = df_ocupacao_diaria.groupby(['id_cnes'])['total_leitos_sus'].mean().round(2)
-obitos_mean = sih_pb_2024.groupby(['id_cnes'])['obito'].mean().mul(100).round(0)
-taxa_ocupacao_mean_pct = df_ocupacao_diaria.groupby(['id_cnes'])['taxa_ocupacao_diaria_pct'].mean().round(2)
-
-df_stats = pd.DataFrame({
-    'qtd_entradas_mean': entrada_stats,
-    'dias_permanencia_mean': permanencia_stats,
-    'leitos_sus_mean': leitos_sus_mean,
-    'obitos_mean': obitos_mean,
-    'taxa_ocupacao_mean_pct': taxa_ocupacao_mean_pct
-    })
-
-df_stats = df_stats.dropna(subset=['leitos_sus_mean'])
-# Em leitos_sus_mean está faltando 5 hospitais que estão registrados em sih_pb_2024, mas não estão em hospital_e_leitos_pb
-# Porém, esses hospitais tiveram a ocupacão média diária igual a 0, devido a baixa quantidade de entradas e nenhum dia de permanêcia
-
-df_stats['qtd_entradas_mean'] = df_stats['qtd_entradas_mean'].fillna(0)
-df_stats['dias_permanencia_mean'] = df_stats['dias_permanencia_mean'].fillna(0)
-
-# ocupacao_media_diaria = entrada_media * dias_permanencia_media
-df_stats['ocupacao_media_diaria'] = df_stats['qtd_entradas_mean'] * df_stats['dias_permanencia_mean']
-df_stats['ocupacao_media_diaria'] = df_stats['ocupacao_media_diaria'].round(2)
-
-hospital_e_leitos_pb['ID_CNES'] = hospital_e_leitos_pb['ID_CNES'].astype(int)
-df_stats['tipo_unidade'] = hospital_e_leitos_pb.groupby(['ID_CNES'])['DS_TIPO_UNIDADE'].first()
-df_stats['nome_hospital'] = hospital_e_leitos_pb.groupby(['ID_CNES'])['NOME_ESTABELECIMENTO'].first()
-df_stats['municipio'] = hospital_e_leitos_pb.groupby(['ID_CNES'])['MUNICIPIO'].first()
-
 # distribuição geral da média de ocupação em 2024
-fig4, ax4 = plt.subplots(figsize=(10, 6))
-sns.histplot(
-    data=df_stats,
-    x='ocupacao_media_diaria',
-    kde=True,
-    ax=ax4
-)
-ax4.set_title('Distribuição da Média de Ocupação Diária')
-ax4.set_xlabel('Média de Ocupação Diária')
-ax4.grid(True)
+def desenhar_fig4():
+    fig4, ax4 = plt.subplots(figsize=(10, 6))
+    sns.histplot(
+        data=df_stats,
+        x='ocupacao_media_diaria',
+        kde=True,
+        ax=ax4
+    )
+    ax4.set_title('Distribuição da Média de Ocupação Diária')
+    ax4.set_xlabel('Média de Ocupação Diária')
+    ax4.grid(True)
+    return fig4
 
 st.subheader("Distribuição da Média de Ocupação Diária na Paraíba")
-st.pyplot(fig4)
-plt.close(fig4)
+exibir_figura('fig4', desenhar_fig4)
 
 # ### Média de Ocupação Hospitalar
 # Vamos entender a demanda dos hospitais localizados no Estado da Paraíba.
 
 # In[5]:
 
-fig5, ax5 = plt.subplots(figsize=(10, 6))
-sns.barplot(
-    data=df_stats,
-    y='ocupacao_media_diaria',
-    hue='tipo_unidade',
-    errorbar=None,
-    palette='bright',
-    ax=ax5
-)
-ax5.set_title('Distribuição da Ocupação Diária por Tipo de Unidade')
-ax5.set_ylabel('Ocupação Média Diária')
-ax5.set_xlabel('Tipo de Unidade')
-ax5.grid(True)
-ax5.legend(loc='upper left', bbox_to_anchor=(1, 1))
+def desenhar_fig5():
+    fig5, ax5 = plt.subplots(figsize=(10, 6))
+    sns.barplot(
+        data=df_stats,
+        y='ocupacao_media_diaria',
+        hue='tipo_unidade',
+        errorbar=None,
+        palette='bright',
+        ax=ax5
+    )
+    ax5.set_title('Distribuição da Ocupação Diária por Tipo de Unidade')
+    ax5.set_ylabel('Ocupação Média Diária')
+    ax5.set_xlabel('Tipo de Unidade')
+    ax5.grid(True)
+    ax5.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig5
 
 st.subheader("Distribuição da Ocupação Diária por Tipo de Unidade")
-st.pyplot(fig5)
-plt.close(fig5)
+exibir_figura('fig5', desenhar_fig5)
 
 # ==================================================================================
 
 # quantificar os tipos de unidades na Paraíba
-tipos_unidades_sus = hospital_e_leitos_pb[hospital_e_leitos_pb['LEITOS_SUS'] > 0]
-contagem_tipos = tipos_unidades_sus['DS_TIPO_UNIDADE'].value_counts()
-
-fig6, ax6 = plt.subplots(figsize=(10, 6))
-contagem_tipos.plot(
-    kind='bar',
-    grid=True,
-    ax=ax6
-)
-ax6.set_title('Distribuição de Unidades com Leitos SUS na Paraíba')
-ax6.set_ylabel('Quantidade de Unidades')
-ax6.set_xlabel('Tipo de Unidade')
+contagem_tipos = filtrados['contagem_tipos']
+
+def desenhar_fig6():
+    fig6, ax6 = plt.subplots(figsize=(10, 6))
+    contagem_tipos.plot(
+        kind='bar',
+        grid=True,
+        ax=ax6
+    )
+    ax6.set_title('Distribuição de Unidades com Leitos SUS na Paraíba')
+    ax6.set_ylabel('Quantidade de Unidades')
+    ax6.set_xlabel('Tipo de Unidade')
+    return fig6
 
 st.subheader("Distribuição de Unidades com Leitos SUS na Paraíba")
-st.pyplot(fig6)
-plt.close(fig6)
+exibir_figura('fig6', desenhar_fig6)
 
 
 # In[6]:
 
 # Relação entre Ocupação Diária e Tipos de Unidade
-fig7, ax7 = plt.subplots(figsize=(10, 6))
-sns.violinplot(
-    data=df_stats,
-    hue='tipo_unidade',
-    y='ocupacao_media_diaria',
-    palette='bright',
-    ax=ax7
-)
-ax7.set_title('Relação entre Ocupação Diária e Tipos de Unidade')
-ax7.set_ylabel('Ocupação Média Diária')
-ax7.set_xlabel('Tipo de Unidade')
-ax7.grid(True)
-ax7.legend(loc='upper left', bbox_to_anchor=(1, 1))
+def desenhar_fig7():
+    fig7, ax7 = plt.subplots(figsize=(10, 6))
+    sns.violinplot(
+        data=df_stats,
+        hue='tipo_unidade',
+        y='ocupacao_media_diaria',
+        palette='bright',
+        ax=ax7
+    )
+    ax7.set_title('Relação entre Ocupação Diária e Tipos de Unidade')
+    ax7.set_ylabel('Ocupação Média Diária')
+    ax7.set_xlabel('Tipo de Unidade')
+    ax7.grid(True)
+    ax7.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig7
 
 st.subheader("Relação entre Ocupação Diária e Tipos de Unidade")
-st.pyplot(fig7)
-plt.close(fig7)
+exibir_figura('fig7', desenhar_fig7)
 
 # ==================================================================================
 
 # top 6 hospitais mais ocupados
 top_6_hospitais = df_stats.nlargest(6, 'ocupacao_media_diaria')
-fig8, ax8 = plt.subplots(figsize=(10, 6))
-sns.barplot(
-    data=top_6_hospitais,
-    y='ocupacao_media_diaria',
-    hue='municipio',
-    errorbar=None,
-    palette='bright',
-    ax=ax8
-)
-ax8.set_title('Cidades com os Hospitais Mais Ocupados da Paraíba')
-ax8.set_ylabel('Ocupação Média Diária')
-ax8.set_xlabel('Município')
-ax8.grid(True)
-ax8.legend(loc='upper left', bbox_to_anchor=(1, 1))
+def desenhar_fig8():
+    fig8, ax8 = plt.subplots(figsize=(10, 6))
+    sns.barplot(
+        data=top_6_hospitais,
+        y='ocupacao_media_diaria',
+        hue='municipio',
+        errorbar=None,
+        palette='bright',
+        ax=ax8
+    )
+    ax8.set_title('Cidades com os Hospitais Mais Ocupados da Paraíba')
+    ax8.set_ylabel('Ocupação Média Diária')
+    ax8.set_xlabel('Município')
+    ax8.grid(True)
+    ax8.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig8
 
 st.subheader("Cidades com os Hospitais Mais Ocupados da Paraíba")
-st.pyplot(fig8)
-plt.close(fig8)
+exibir_figura('fig8', desenhar_fig8)
 
 # ==================================================================================
 
-# medidas de centralidade
-def medidas_centralidade(df, coluna):
-    media = df[coluna].mean()
-    mediana = df[coluna].median()
-    moda = df[coluna].mode()[0]
-
-    st.subheader(f"Medidas de Centralidade - Coluna: {coluna}")
-    st.markdown(f"**Média:** `{media:.2f}`  \n**Mediana:** `{mediana:.2f}`  \n**Moda:** `{moda:.2f}`")
-
-medidas_centralidade(df_stats, 'ocupacao_media_diaria')
-
-# medidas de variabilidade
-def medidas_variabilidade(df, coluna):
-    q1 = df[coluna].quantile(0.25)
-    q3 = df[coluna].quantile(0.75)
-    IQR = q3 - q1
-    lim_inferior = q1 - 1.5 * IQR
-    lim_superior = q3 + 1.5 * IQR
-    print(f"IQR: {IQR:.2f}")
-    print(f"Limite Inferior: {lim_inferior:.2f}")
-    print(f"Limite Superior: {lim_superior:.2f}")
-    outliers = df[(df[coluna] < lim_inferior) | (df[coluna] > lim_superior)]
-
-    st.subheader(f"Medidas de Variabilidade — Coluna: {coluna}")
-    st.markdown(f"""
-    **IQR:** `{IQR:.2f}`  
-    **Limite Inferior:** `{lim_inferior:.2f}`  
-    **Limite Superior:** `{lim_superior:.2f}`
-    """)
+# medidas de centralidade e de variabilidade de todas as colunas, no total e por tipo de unidade e município
+resumo_stats = medicoes.executar('resumo', obter_resumo, impressao_painel, df_stats)
+COLUNAS_RESUMO = {
+    'n': 'N', 'media': 'Média', 'desvio': 'Desvio padrão', 'minimo': 'Mínimo', 'q05': 'P5', 'q25': 'Q1', 'mediana': 'Mediana',
+    'q75': 'Q3', 'q95': 'P95', 'maximo': 'Máximo', 'iqr': 'IQR', 'mad': 'MAD', 'n_outliers': 'Outliers',
+}
+
+
+def exibir_resumo(coluna):
+    resumo_coluna = resumo_stats[resumo_stats['coluna'] == coluna]
+    todos = resumo_coluna[resumo_coluna['agrupamento'] == 'Todos'].iloc[0]
+
+    st.subheader(f"Medidas de Centralidade e Variabilidade — Coluna: {coluna}")
+    st.markdown(
+        f"**Média:** `{todos['media']:.2f}`  \n**Mediana:** `{todos['mediana']:.2f}`  \n"
+        f"**Desvio padrão:** `{todos['desvio']:.2f}`  \n**MAD:** `{todos['mad']:.2f}`  \n**IQR:** `{todos['iqr']:.2f}`  \n"
+        f"**Limite Inferior:** `{todos['limite_inferior']:.2f}`  \n**Limite Superior:** `{todos['limite_superior']:.2f}`"
+    )
 
     st.subheader("Outliers:")
-    st.dataframe(outliers[['municipio', coluna, 'tipo_unidade']], use_container_width=True)
+    outliers = mascara_outliers_stats[coluna]
+    st.dataframe(df_stats.loc[outliers, ['municipio', coluna, 'tipo_unidade']], use_container_width=True)
 
     st.subheader("📋 Resumo Estatístico:")
-    st.dataframe(df[coluna].describe().round(2), use_container_width=True)
-
-medidas_variabilidade(df_stats, 'ocupacao_media_diaria')
+    por_tipo = resumo_coluna[resumo_coluna['agrupamento'].isin(['Todos', 'tipo_unidade'])]
+    st.dataframe(
+        por_tipo.set_index('grupo')[list(COLUNAS_RESUMO)].rename(columns=COLUNAS_RESUMO).rename_axis('Tipo de unidade').round(2),
+        use_container_width=True,
+    )
+    with st.expander('Por município'):
+        por_municipio = resumo_coluna[resumo_coluna['agrupamento'] == 'municipio']
+        st.dataframe(
+            por_municipio.set_index('grupo')[list(COLUNAS_RESUMO)].rename(columns=COLUNAS_RESUMO).rename_axis('Município').round(2),
+            use_container_width=True,
+        )
+
+
+mascara_outliers_stats = resumo.mascara_outliers(df_stats, resumo_stats)
+exibir_resumo('ocupacao_media_diaria')
 st.subheader("Top 6 Hospitais Mais Ocupados")
 st.dataframe(top_6_hospitais[['nome_hospital', 'municipio', 'ocupacao_media_diaria']].sort_values(by='ocupacao_media_diaria', ascending=False), use_container_width=True)
 
@@ -417,56 +486,45 @@ st.divider()
 st.header("CIDs Principais Mais Frequentes")
 st.markdown('CID é um código da Classificação Internacional de Doenças (CID) que identifica a condição de saúde pela qual o paciente foi internado. Veremos as CIDs principais mais frequetes nos 10 hospitais mais ocupados da Paraíba.')
 
-top_10_ocupacao = df_stats.nlargest(10, 'ocupacao_media_diaria')
-cids_frequentes = sih_pb_2024[sih_pb_2024['id_cnes'].isin(top_10_ocupacao.index)]
+cids_freq_hospitais = filtrados['cids_freq_hospitais']
+
+
+def desenhar_fig9():
+    fig9, ax9 = plt.subplots(figsize=(10, 6))
+    sns.barplot(
+        data=cids_freq_hospitais,
+        x='nome_hospital',
+        y='qtd_cids_frequentes',
+        hue='cid_principal',
+        dodge=False,
+        ax=ax9
+    )
+    ax9.set_title('Frequência de CIDs por Hospital')
+    ax9.set_xlabel('Nome do Hospital')
+    ax9.set_ylabel('Quantidade de CIDs Frequentes')
+    ax9.tick_params(axis='x', rotation=90)
+    ax9.legend(
+        title='CID Principal',
+        bbox_to_anchor=(1.05, 1),
+        loc='upper left',
+        borderaxespad=0.)
+    return fig9
+
+exibir_figura('fig9', desenhar_fig9)
 
-cids_frequentes = (cids_frequentes.groupby(['id_cnes', 'cid_principal']).size().reset_index(name='qtd_cids_frequentes')
-                   .sort_values(['id_cnes', 'qtd_cids_frequentes'], ascending=[True, False]))
+st.dataframe(cids_freq_hospitais, use_container_width=True)
 
-cids_freq_hospitais = cids_frequentes.groupby(['id_cnes']).first().reset_index()
-cids_freq_hospitais = cids_freq_hospitais.merge(
-    hospital_e_leitos_pb[['ID_CNES', 'NOME_ESTABELECIMENTO', 'MUNICIPIO', 'DS_TIPO_UNIDADE']],
-    left_on='id_cnes',
-    right_on='ID_CNES',
-    how='left'
-)
-cids_freq_hospitais = cids_freq_hospitais.drop(['ID_CNES'], axis=1)
-cids_freq_hospitais = cids_freq_hospitais.rename(columns={'NOME_ESTABELECIMENTO': 'nome_hospital', 'MUNICIPIO': 'municipio'})
-cids_freq_hospitais = cids_freq_hospitais.drop_duplicates()
-cids_freq_hospitais['cid_principal'] = cids_freq_hospitais['cid_principal'].replace({
-    'K359': 'Apendicite aguda',
-    'S525': 'Fratura da extremidade distal do rádio',
-    'Z302': 'Esterilização',
-    'O800': 'Parto espontâneo cefálico',
-    'I64 ': 'Acidente vascular cerebral',
-    'I219': 'Infarto agudo do miocárdio',
-    'O82 ': 'Parto por cesariana',
-    'F192': 'Síndrome de dependência'
-})
-
-
-fig9, ax9 = plt.subplots(figsize=(10, 6))
-sns.barplot(
-    data=cids_freq_hospitais,
-    x='nome_hospital',
-    y='qtd_cids_frequentes',
-    hue='cid_principal',
-    dodge=False,
-    ax=ax9
-)
-ax9.set_title('Frequência de CIDs por Hospital')
-ax9.set_xlabel('Nome do Hospital')
-ax9.set_ylabel('Quantidade de CIDs Frequentes')
-ax9.tick_params(axis='x', rotation=90)
-ax9.legend(
-    title='CID Principal',
-    bbox_to_anchor=(1.05, 1),
-    loc='upper left',
-    borderaxespad=0.)
-st.pyplot(fig9)
-plt.close(fig9)
+with st.expander('Top 10 CIDs de cada hospital'):
+    cids_top_hospitais = filtrados['cids_top_hospitais']
+    hospital = st.selectbox('Hospital', sorted(cids_top_hospitais['nome_hospital'].dropna().unique()))
+    st.dataframe(
+        cids_top_hospitais.loc[cids_top_hospitais['nome_hospital'] == hospital, ['posicao', 'cid_principal', 'descricao', 'capitulo', 'qtd_aih', 'participacao_pct']],
+        hide_index=True,
+        use_container_width=True,
+    )
 
-st.dataframe(cids_freq_hospitais, use_container_width=True)
+with st.expander('Internações por capítulo da CID-10'):
+    st.dataframe(filtrados['internacoes_por_capitulo'], hide_index=True, use_container_width=True)
 
 st.subheader("Conclusões Preliminares")
 st.markdown('Cada hospital tem suas especialidades de referência e diferentes tipos de leitos disponibilizados.')
@@ -480,15 +538,16 @@ st.header("Taxa de Ocupação de Leitos SUS")
 st.markdown('Vamos ententer a eficiência hospitalar de janeiro a novembro de 2024.')
 
 # taxa_ocupacao_mean_pct
-fig11, ax11 = plt.subplots(figsize=(10, 6))
-sns.histplot(data=df_stats, x='taxa_ocupacao_mean_pct', kde=True, ax=ax11)
-ax11.set_title('Distribuição da Taxa de Ocupação Média dos Leitos SUS')
-ax11.set_xlabel('Taxa de Ocupação Média (%)')
+def desenhar_fig11():
+    fig11, ax11 = plt.subplots(figsize=(10, 6))
+    sns.histplot(data=df_stats, x='taxa_ocupacao_mean_pct', kde=True, ax=ax11)
+    ax11.set_title('Distribuição da Taxa de Ocupação Média dos Leitos SUS')
+    ax11.set_xlabel('Taxa de Ocupação Média (%)')
+    return fig11
+
 st.subheader("Distribuição da Taxa de Ocupação Média dos Leitos SUS na Paraíba")
-st.pyplot(fig11)
-plt.close(fig11)
-medidas_centralidade(df_stats, 'taxa_ocupacao_mean_pct')
-medidas_variabilidade(df_stats, 'taxa_ocupacao_mean_pct')
+exibir_figura('fig11', desenhar_fig11)
+exibir_resumo('taxa_ocupacao_mean_pct')
 
 st.subheader('Top 10 Hospitais Mais Lotados')
 top_10_lotados = df_stats.nlargest(10, 'taxa_ocupacao_mean_pct').sort_values(by='taxa_ocupacao_mean_pct', ascending=False)
@@ -507,26 +566,41 @@ st.header("Análises de Correlação")
 
 st.subheader("Relação entre a Taxa de Ocupação e Leitos SUS")
 
-fig12, ax12 = plt.subplots(figsize=(10, 6))
-sns.scatterplot(data=df_stats, x='taxa_ocupacao_mean_pct', y='leitos_sus_mean', hue='tipo_unidade', palette='bright', ax=ax12)
-ax12.set_title('Relação entre Taxa de Ocupação e Leitos SUS')
-ax12.set_xlabel('Taxa de Ocupação Média (%)')    
-ax12.set_ylabel('Média de Leitos SUS')
-ax12.legend(loc='upper left', bbox_to_anchor=(1, 1))
-st.pyplot(fig12)
-plt.close(fig12)
-
-corr_pearson = df_stats['leitos_sus_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='pearson')
-corr_spearman = df_stats['leitos_sus_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='spearman')
-corr_kendall = df_stats['leitos_sus_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='kendall')
-
-st.markdown(f"""
-### Correlação entre a Média de Leitos SUS e a Taxa de Ocupação
-
-- Correlação de Pearson: `{corr_pearson:.2f}`  
-- Correlação de Spearman: `{corr_spearman:.2f}`  
-- Correlação de Kendall: `{corr_kendall:.2f}`
-""")
+def desenhar_fig12():
+    fig12, ax12 = plt.subplots(figsize=(10, 6))
+    sns.scatterplot(data=df_stats, x='taxa_ocupacao_mean_pct', y='leitos_sus_mean', hue='tipo_unidade', palette='bright', ax=ax12)
+    ax12.set_title('Relação entre Taxa de Ocupação e Leitos SUS')
+    ax12.set_xlabel('Taxa de Ocupação Média (%)')    
+    ax12.set_ylabel('Média de Leitos SUS')
+    ax12.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig12
+
+exibir_figura('fig12', desenhar_fig12)
+
+testes_correlacao = medicoes.executar('correlacoes', obter_correlacoes, impressao_painel, df_stats)
+NOMES_METODOS = {'pearson': 'Pearson', 'spearman': 'Spearman', 'kendall': 'Kendall'}
+
+
+def exibir_correlacoes(titulo, coluna_x, coluna_y='taxa_ocupacao_mean_pct'):
+    # coeficiente, IC de 95% por bootstrap e p-valor por permutação; por tipo de unidade numa tabela
+    testes = testes_correlacao[(testes_correlacao['x'] == coluna_x) & (testes_correlacao['y'] == coluna_y)]
+    linhas = [
+        f"- Correlação de {NOMES_METODOS[t.metodo]}: `{t.coeficiente:.2f}` "
+        f"(IC 95%: `[{t.ic_inferior:.2f}, {t.ic_superior:.2f}]`, p-valor: `{t.p_valor:.3f}`)"
+        for t in testes[testes['grupo'] == 'Todos'].itertuples()
+    ]
+    st.markdown(f"### {titulo}\n\n" + "\n".join(linhas))
+    with st.expander('Por tipo de unidade'):
+        por_tipo = testes[testes['grupo'] != 'Todos'].assign(metodo=lambda d: d['metodo'].map(NOMES_METODOS))
+        st.dataframe(
+            por_tipo[['grupo', 'metodo', 'n', 'coeficiente', 'ic_inferior', 'ic_superior', 'p_valor']]
+            .rename(columns={'grupo': 'Tipo de unidade', 'metodo': 'Método', 'coeficiente': 'Coeficiente',
+                             'ic_inferior': 'IC inferior', 'ic_superior': 'IC superior', 'p_valor': 'p-valor'}),
+            hide_index=True, use_container_width=True,
+        )
+
+
+exibir_correlacoes('Correlação entre a Média de Leitos SUS e a Taxa de Ocupação', 'leitos_sus_mean')
 
 st.markdown('''A média de leitos do SUS apresenta uma relação moderada com a taxa de ocupação desses leitos em hospitais da Paraíba, 
             conforme demonstrado pelas correlações de Spearman (0,66) e Kendall (0,45). 
@@ -539,26 +613,19 @@ st.markdown('''A média de leitos do SUS apresenta uma relação moderada com a
 
 st.subheader("Relação entre Média de Óbitos e Taxa de Ocupação")
 
-fig13, ax13 = plt.subplots(figsize=(10, 6))
-sns.scatterplot(data=df_stats, x='taxa_ocupacao_mean_pct', y='obitos_mean', hue='tipo_unidade', palette='bright', ax=ax13)
-ax13.set_title('Relação entre Óbitos e Taxa de Ocupacão')
-ax13.set_ylabel('Média de Óbitos (%)')
-ax13.set_xlabel('Taxa de Ocupação (%)')
-ax13.legend(loc='upper left', bbox_to_anchor=(1, 1))
-st.pyplot(fig13)
-plt.close(fig13)
+def desenhar_fig13():
+    fig13, ax13 = plt.subplots(figsize=(10, 6))
+    sns.scatterplot(data=df_stats, x='taxa_ocupacao_mean_pct', y='obitos_mean', hue='tipo_unidade', palette='bright', ax=ax13)
+    ax13.set_title('Relação entre Óbitos e Taxa de Ocupacão')
+    ax13.set_ylabel('Média de Óbitos (%)')
+    ax13.set_xlabel('Taxa de Ocupação (%)')
+    ax13.legend(loc='upper left', bbox_to_anchor=(1, 1))
+    return fig13
+
+exibir_figura('fig13', desenhar_fig13)
 
 # Pode ter uma relacao mais forte com tipos de unidades
-corr_pearson = df_stats['obitos_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='pearson')
-corr_spearman = df_stats['obitos_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='spearman')
-corr_kendall = df_stats['obitos_mean'].corr(df_stats['taxa_ocupacao_mean_pct'], method='kendall')
-st.markdown(f"""
-### Correlação entre a Média de Óbitos e a Taxa Ocupacão
-            
-- Correlação de Pearson: `{corr_pearson:.2f}`  
-- Correlação de Spearman: `{corr_spearman:.2f}`  
-- Correlação de Kendall: `{corr_kendall:.2f}`
-""")
+exibir_correlacoes('Correlação entre a Média de Óbitos e a Taxa Ocupacão', 'obitos_mean')
 
 st.markdown('''A média de óbitos apresenta uma relação muito fraca ou quase inexistente com a taxa de ocupação dos leitos SUS.
             Isso indica que, em geral, a taxa de ocupação dos leitos não está diretamente relacionada à média de óbitos nos hospitais da Paraíba,
@@ -583,42 +650,36 @@ st.header("Análise de Regressão Linear")
 
 st.subheader("Prevendo a Taxa de Ocupação com Base na Média de Leitos SUS")
 
-import sklearn.model_selection as ms
-import sklearn.linear_model as lm
-from sklearn.metrics import mean_squared_error, r2_score
-
-x = df_stats[['leitos_sus_mean']]
-y = df_stats[['taxa_ocupacao_mean_pct']]
-
-# Separar os dados em Treino e Teste
-x_train, x_test, y_train, y_test = ms.train_test_split(x, y, test_size=0.2, random_state=0)
-
-# Treinando o modelo
-regressor = lm.LinearRegression()
-regressor.fit(x_train, y_train)
-
-# Previsão
-y_pred = regressor.predict(x_test)
+regressao_simples = resultados['modelos']['regressao_simples']
+regressao_multipla = resultados['modelos']['regressao_multipla']
+regressor = regressao_simples['modelo']
+x = regressao_simples['x']
+x_train, y_train = regressao_simples['x_train'], regressao_simples['y_train']
+x_test, y_test = regressao_simples['x_test'], regressao_simples['y_test']
 
 # Vizualizar o treino
-fig14, ax14 = plt.subplots(figsize=(10, 6))
-ax14.scatter(x_train, y_train, color='red')
-ax14.plot(x_train, regressor.predict(x_train), color='blue')
-ax14.set_title('Dados de Treinamento')
-ax14.set_xlabel('Média de Leitos SUS')
-ax14.set_ylabel('Taxa de Ocupação Média (%)')
-st.pyplot(fig14)
-plt.close(fig14)
+def desenhar_fig14():
+    fig14, ax14 = plt.subplots(figsize=(10, 6))
+    ax14.scatter(x_train, y_train, color='red')
+    ax14.plot(x_train, regressor.predict(x_train), color='blue')
+    ax14.set_title('Dados de Treinamento')
+    ax14.set_xlabel('Média de Leitos SUS')
+    ax14.set_ylabel('Taxa de Ocupação Média (%)')
+    return fig14
+
+exibir_figura('fig14', desenhar_fig14, filtrada=False)
 
 # Vizualizar o teste
-fig15, ax15 = plt.subplots(figsize=(10, 6))
-ax15.scatter(x_test, y_test, color='green')
-ax15.plot(x_test, y_pred, color='blue')
-ax15.set_title('Dados de teste')
-ax15.set_xlabel('Média de Leitos SUS')
-ax15.set_ylabel('Taxa de Ocupação Média (%)')
-st.pyplot(fig15)
-plt.close(fig15)
+def desenhar_fig15():
+    fig15, ax15 = plt.subplots(figsize=(10, 6))
+    ax15.scatter(x_test, y_test, color='green')
+    ax15.plot(x_test, regressao_simples['y_pred'], color='blue')
+    ax15.set_title('Dados de teste')
+    ax15.set_xlabel('Média de Leitos SUS')
+    ax15.set_ylabel('Taxa de Ocupação Média (%)')
+    return fig15
+
+exibir_figura('fig15', desenhar_fig15, filtrada=False)
 
 # Valor especificado
 valor_especificado = pd.DataFrame({'leitos_sus_mean': [260]}) 
@@ -629,26 +690,23 @@ st.write(f"b0 (intercept): `{regressor.intercept_.round(2)}`")
 st.write(f"b1 (coefficient): `{regressor.coef_[0].round(2)}`")
 
 # Erro residual
-fitted = regressor.predict(df_stats[['leitos_sus_mean']])	
-residuals = y - fitted
-
-fig16, ax16 = plt.subplots(figsize=(10, 6))
-ax16.scatter(x, residuals, color='orange')
-ax16.axhline(y=0, color='black', linestyle='--')
-ax16.set_title('Resíduos do Modelo')
-ax16.set_xlabel('Média de Leitos SUS')
-ax16.set_ylabel('Resíduos')
-st.pyplot(fig16)
-plt.close(fig16)
+def desenhar_fig16():
+    fig16, ax16 = plt.subplots(figsize=(10, 6))
+    ax16.scatter(x, regressao_simples['residuals'], color='orange')
+    ax16.axhline(y=0, color='black', linestyle='--')
+    ax16.set_title('Resíduos do Modelo')
+    ax16.set_xlabel('Média de Leitos SUS')
+    ax16.set_ylabel('Resíduos')
+    return fig16
+
+exibir_figura('fig16', desenhar_fig16, filtrada=False)
 
 # Avaliando o modelo
-RMSE = np.sqrt(mean_squared_error(y, fitted))
-r2 = r2_score(y, fitted)
 st.markdown(f'''
             ### Avaliação do Modelo
 
-            - Root Mean Square Error (RMSE): `{RMSE:.2f}`
-            - Coefficiente of determination (r2): `{r2:.4f}`
+            - Root Mean Square Error (RMSE): `{regressao_simples['rmse']:.2f}`
+            - Coefficiente of determination (r2): `{regressao_simples['r2']:.4f}`
 ''')
 
 st.header("Regressão Linear Múltipla")
@@ -656,53 +714,33 @@ st.markdown("Vamos fazer uma regressão linear múltipla considerando os tipos d
 
 # In[12]:
 
-
-x = df_stats[['leitos_sus_mean', 'tipo_unidade', 'obitos_mean', 'ocupacao_media_diaria']]
-y = df_stats[['taxa_ocupacao_mean_pct']]
-
-# Transformar a variável categórica 'tipo_unidade' em variáveis dummy
-# Hospital especializado é o dummies de referência
-x_dummies = pd.get_dummies(x, drop_first=True)
-
-# Separar os dados em Treino e Teste
-x_train, x_test, y_train, y_test = ms.train_test_split(x_dummies, y, test_size=0.2, random_state=0)
-
-# Treinando o modelo
-regressor_multiple = lm.LinearRegression()
-regressor_multiple.fit(x_train, y_train)
+regressor_multiple = regressao_multipla['modelo']
 
 # Coeficientes
 st.markdown(f'Intercept: `{regressor_multiple.intercept_.round(3)}`')
 st.markdown('Coefficientes:')
-for name, coef in zip(x_dummies.columns, regressor_multiple.coef_.flatten()):
+for name, coef in zip(regressao_multipla['colunas'], regressor_multiple.coef_.flatten()):
     st.markdown(f' {name}: `{coef:.3f}`')
 
-# Previsão
-y_pred = regressor_multiple.predict(x_test)
-
 # Avaliando o modelo
-fitted = regressor_multiple.predict(x_dummies)
-RMSE = np.sqrt(mean_squared_error(y, fitted))
-r2 = r2_score(y, fitted)
 st.markdown(f'''
             ### Avaliação do Modelo
 
-            - Root Mean Square Error (RMSE): `{RMSE:.2f}`
-            - Coefficiente of determination (r2): `{r2:.4f}`
+            - Root Mean Square Error (RMSE): `{regressao_multipla['rmse']:.2f}`
+            - Coefficiente of determination (r2): `{regressao_multipla['r2']:.4f}`
             ''')
 
-# Calcular os resíduos
-residuals = y - fitted
-
 # Gráfico de Resíduos vs Valores Ajustados
-fig17, ax17 = plt.subplots(figsize=(10, 6))
-ax17.scatter(fitted, residuals, color='orange')
-ax17.axhline(y=0, color='black', linestyle='--')
-ax17.set_title('Resíduos vs Valores Ajustados')
-ax17.set_xlabel('Valores Ajustados (Fitted)')
-ax17.set_ylabel('Resíduos')
-st.pyplot(fig17)
-plt.close(fig17)
+def desenhar_fig17():
+    fig17, ax17 = plt.subplots(figsize=(10, 6))
+    ax17.scatter(regressao_multipla['fitted'], regressao_multipla['residuals'], color='orange')
+    ax17.axhline(y=0, color='black', linestyle='--')
+    ax17.set_title('Resíduos vs Valores Ajustados')
+    ax17.set_xlabel('Valores Ajustados (Fitted)')
+    ax17.set_ylabel('Resíduos')
+    return fig17
+
+exibir_figura('fig17', desenhar_fig17, filtrada=False)
 
 # ### Regressão Logística
 # Sem 'MUNICIPIO' como variável preditora.
@@ -714,121 +752,66 @@ st.markdown("Vamos fazer uma regressão logística para prever a probabilidade d
 # In[13]:
 
 
-from sklearn.metrics import confusion_matrix, accuracy_score, classification_report
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from imblearn.over_sampling import SMOTE
-
-df_combined = sih_pb_2024.merge(df_ocupacao_diaria, on=['id_cnes', 'mes_ano', 'data'], how='left')
-df_combined = df_combined.dropna(subset=['taxa_ocupacao_diaria_pct'])
-
-x_predictors = df_combined[['DS_TIPO_UNIDADE', 'IDADE', 'taxa_ocupacao_diaria_pct']]
-y_outcome = df_combined['obito']
+def exibir_avaliacao_logistica(resultado):
+    st.subheader("Avaliação do Modelo")
 
-# Dummies
-x_pred_dummies = pd.get_dummies(x_predictors, columns=['DS_TIPO_UNIDADE'], drop_first=True)
+    st.markdown("**Distribuição dos Valores Reais**")
+    st.write(resultado['distribuicao'])
 
-# Escalar os dados
-scaler = StandardScaler()
-x_pred_scaled = scaler.fit_transform(x_pred_dummies)
+    st.markdown("**Matriz de Confusão**")
+    st.write(resultado['matriz_confusao'])
 
-# Separar os dados em Treino e Teste
-x_train, x_test, y_train, y_test = ms.train_test_split(x_pred_scaled, y_outcome, test_size=0.2, random_state=0)
-
-# SMOTE balanceia as classes, aumentando a quantidade de amostras da classe minoritária
-smote = SMOTE(random_state=0)
-x_train_balanced, y_train_balanced = smote.fit_resample(x_train, y_train)
-
-# Treinando o modelo
-logistic_regressor = LogisticRegression(class_weight='balanced', max_iter=1000)
-logistic_regressor.fit(x_train_balanced, y_train_balanced)
-
-# Previsao
-y_pred = logistic_regressor.predict(x_test)
-y_pred_proba = logistic_regressor.predict_proba(x_test)
-
-# Avaliando o modelo
-st.subheader("Avaliação do Modelo")
+    st.markdown("**Relatório de Classificação**")
+    st.dataframe(resultado['relatorio'], use_container_width=True)
 
-st.markdown("**Distribuição dos Valores Reais**")
-st.write(y_outcome.value_counts())
+    st.markdown("**Coeficientes do Modelo**")
+    st.write(f"Intercept: `{resultado['modelo'].intercept_[0].round(3)}`")
+    st.dataframe(resultado['coeficientes'], use_container_width=True)
 
-st.markdown("**Matriz de Confusão**")
-st.write(confusion_matrix(y_test, y_pred))
 
-st.markdown("**Relatório de Classificação**")
-report = classification_report(y_test, y_pred, output_dict=True)
-st.dataframe(pd.DataFrame(report).transpose(), use_container_width=True)
-
-# Coeficientes
-coef_df = pd.DataFrame({
-    'Variável': x_pred_dummies.columns,
-    'Coeficiente': logistic_regressor.coef_[0].round(3)
-}).sort_values(by='Coeficiente', ascending=False)
-
-st.markdown("**Coeficientes do Modelo**")
-st.write(f"Intercept: `{logistic_regressor.intercept_[0].round(3)}`")
-st.dataframe(coef_df, use_container_width=True)
+exibir_avaliacao_logistica(resultados['modelos']['logistica_sem_municipio'])
 
 # Com 'MUNICIPIO' como variável preditora.
 st.subheader("Com 'MUNICIPIO' como variável preditora.")
 
 # In[14]:
 
+exibir_avaliacao_logistica(resultados['modelos']['logistica_com_municipio'])
 
-x_predictors = df_combined[['MUNICIPIO', 'DS_TIPO_UNIDADE', 'IDADE', 'taxa_ocupacao_diaria_pct']]
-y_outcome = df_combined['obito']
-
-# Dummies
-x_pred_dummies = pd.get_dummies(x_predictors, columns=['MUNICIPIO', 'DS_TIPO_UNIDADE'], drop_first=True)
-
-# Separar os dados em Treino e Teste
-x_train, x_test, y_train, y_test = ms.train_test_split(x_pred_dummies, y_outcome, test_size=0.2, random_state=0)
-
-# Escalar os dados
-scaler = StandardScaler()
-x_train_scaled = scaler.fit_transform(x_train)
-x_test_scaled = scaler.transform(x_test)
-
-# SMOTE balanceia as classes, aumentando a quantidade de amostras da classe minoritária
-smote = SMOTE(random_state=0)
-x_train_balanced, y_train_balanced = smote.fit_resample(x_train, y_train)
-
-# Treinando o modelo
-logistic_regressor = LogisticRegression(class_weight='balanced', max_iter=2000)
-logistic_regressor.fit(x_train_balanced, y_train_balanced)
-
-# Previsao
-y_pred = logistic_regressor.predict(x_test)
-y_pred_proba = logistic_regressor.predict_proba(x_test)
-
-# Avaliando o modelo
-st.subheader("Avaliação do Modelo")
-
-st.markdown("**Distribuição dos Valores Reais**")
-st.write(y_outcome.value_counts())
-
-st.markdown("**Matriz de Confusão**")
-cm = confusion_matrix(y_test, y_pred)
-st.write(cm)
-
-st.markdown("**Relatório de Classificação**")
-report_dict = classification_report(y_test, y_pred, output_dict=True)
-report_df = pd.DataFrame(report_dict).transpose()
-st.dataframe(report_df, use_container_width=True)
-
-
-# In[15]:
-
-# Coeficientes do modelo
-coef_df = pd.DataFrame({
-    'Variável': x_pred_dummies.columns,
-    'Coeficiente': logistic_regressor.coef_[0].round(3)
-}).sort_values(by='Coeficiente', ascending=False)
-
-st.markdown("**Coeficientes do Modelo**")
-st.write(f"Intercept: `{logistic_regressor.intercept_[0].round(3)}`")
-st.dataframe(coef_df, use_container_width=True)
+# ### Comparação dos modelos
+st.header("Comparação dos Modelos")
+st.markdown('''
+            Validação cruzada em 5 dobras com busca de hiperparâmetros (regularização, solver e pesos das classes).
+            Nas regressões logísticas as dobras são agrupadas por hospital. A tabela mostra a média e o desvio
+            de cada métrica nas dobras de teste, do melhor para o pior candidato de cada modelo.
+''')
+avaliacao_modelos = resultados.get('avaliacao_modelos')
+if avaliacao_modelos is None and not artefatos.existem(DIR_ARTEFATOS):
+    if st.toggle('Rodar validação cruzada'):
+        # mesmos dados (sem os filtros da barra lateral) dos modelos ajustados e da chave impressao_dados
+        avaliacao_modelos = medicoes.executar('avaliacao_modelos', obter_avaliacao_modelos, impressao_dados, resultados['df_stats'],
+                                              sih_pb_2024, df_ocupacao_diaria)
+if avaliacao_modelos is None:
+    st.info('A comparação é gerada por `python -m artefatos build --avaliar`.' if artefatos.existem(DIR_ARTEFATOS)
+            else 'Ative a validação cruzada acima para comparar os modelos.')
+else:
+    st.dataframe(avaliacao_modelos, use_container_width=True, hide_index=True)
+
+# Pontuação de novos dados com os modelos já ajustados (ver registro_modelos.py)
+with st.expander('Pontuar novos dados'):
+    st.markdown('''
+                Envie um CSV ou Parquet de hospitais (colunas de `df_stats`) para prever a taxa de ocupação,
+                ou de AIHs (`IDADE`, `taxa_ocupacao_diaria_pct`, `DS_TIPO_UNIDADE`, `MUNICIPIO`) para a probabilidade de óbito.
+                Os modelos não são reajustados.
+    ''')
+    arquivo_pontuacao = st.file_uploader('Arquivo', type=['csv', 'parquet'])
+    if arquivo_pontuacao is not None:
+        novos = pd.read_csv(arquivo_pontuacao) if arquivo_pontuacao.name.endswith('.csv') else pd.read_parquet(arquivo_pontuacao)
+        pontuacao = registro_modelos.pontuar_modelos(resultados['modelos'], novos)
+        if pontuacao.empty:
+            st.warning('Nenhum modelo tem todas as variáveis no arquivo enviado.')
+        else:
+            st.dataframe(novos.join(pontuacao.add_prefix('pontuacao_')), use_container_width=True)
 
 st.divider()
 st.header("Conclusões")
@@ -850,4 +833,12 @@ st.markdown("""
             Para mais informações ou sugestões, entre em contato: 
             - 📩 [Email](mailto:maria.paiva@dcx.ufpb.br)
             - 💼 [LinkedIn](https://www.linkedin.com/in/ceciliapaiva/)
-            """)
\ No newline at end of file
+            """)
+
+with st.expander('Performance'):
+    st.markdown('Tempo de relógio, tempo de CPU, pico de memória do processo e linhas de cada etapa desta execução da página.')
+    st.dataframe(medicoes.para_dataframe(), hide_index=True, use_container_width=True)
+    caminho_desempenho = os.path.join(DIR_ARTEFATOS, 'desempenho.csv')
+    if artefatos.existem(DIR_ARTEFATOS) and os.path.exists(caminho_desempenho):
+        st.markdown('Etapas do `python -m artefatos build` que gerou os artefatos:')
+        st.dataframe(pd.read_csv(caminho_desempenho), hide_index=True, use_container_width=True)
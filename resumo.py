@@ -0,0 +1,117 @@
+# coding: utf-8
+
+# Resumo robusto de várias colunas em vários agrupamentos de uma só vez:
+# n, média, desvio, mínimo, quantis, mediana, máximo, IQR, limites de outliers
+# (Tukey), MAD e quantidade de outliers, em uma tabela longa com uma linha por
+# (agrupamento, grupo, coluna).
+#
+# Os valores de todas as colunas e agrupamentos viram um único vetor com uma
+# chave (grupo, coluna); uma ordenação por (chave, valor) deixa cada grupo
+# contíguo e ordenado, e as estatísticas saem por reduceat e por índice
+# (quantis), sem um groupby por coluna. O MAD pede só mais uma ordenação, dos
+# desvios absolutos em relação à mediana.
+
+import numpy as np
+import pandas as pd
+
+# além destes, q25 e q75 entram sempre (IQR)
+QUANTIS = (0.05, 0.25, 0.75, 0.95)
+
+COLUNAS_PADRAO = ['ocupacao_media_diaria', 'taxa_ocupacao_mean_pct', 'leitos_sus_mean', 'obitos_mean']
+
+
+def _nome_quantil(p):
+    return f'q{round(p * 100):02d}'
+
+
+def _quantil(ordenados, inicio, contagem, p):
+    # quantil p de cada grupo já ordenado, com interpolação linear (como Series.quantile)
+    posicao = inicio + p * (contagem - 1)
+    abaixo = np.floor(posicao).astype(np.int64)
+    acima = np.minimum(abaixo + 1, inicio + contagem - 1)
+    return ordenados[abaixo] + (posicao - abaixo) * (ordenados[acima] - ordenados[abaixo])
+
+
+def resumir(df, colunas=COLUNAS_PADRAO, por=(), quantis=QUANTIS, fator_iqr=1.5):
+    """Tabela longa com as medidas de cada coluna numérica de `colunas`.
+
+    Sempre inclui o agrupamento 'Todos' (grupo 'Todos'); cada coluna de `por`
+    (ex.: 'tipo_unidade', 'municipio') acrescenta uma linha por grupo. Valores
+    NaN são ignorados, como no pandas. Os limites de outliers são
+    q25 - fator_iqr * IQR e q75 + fator_iqr * IQR; o MAD é a mediana dos
+    desvios absolutos em relação à mediana, sem fator de escala.
+    """
+    colunas = list(colunas)
+    quantis = sorted(set(quantis) | {0.25, 0.75})
+    x = df[colunas].to_numpy(dtype=np.float64)
+    n, c = x.shape
+
+    # um código de grupo por agrupamento, deslocado para não colidir com os dos outros
+    codigos, agrupamentos, grupos = [np.zeros(n, dtype=np.int64)], ['Todos'], ['Todos']
+    for coluna in por:
+        codigo, niveis = pd.factorize(df[coluna], sort=True)
+        codigos.append(np.where(codigo >= 0, codigo + len(grupos), -1))
+        agrupamentos += [coluna] * len(niveis)
+        grupos += [str(nivel) for nivel in niveis]
+    grupo = np.repeat(np.concatenate(codigos), c)
+    chave = grupo * c + np.tile(np.arange(c), n * len(codigos))
+    valores = np.tile(x.ravel(), len(codigos))
+    validos = (grupo >= 0) & ~np.isnan(valores)
+    chave, valores = chave[validos], valores[validos]
+
+    ordem = np.lexsort((valores, chave))
+    chave, valores = chave[ordem], valores[ordem]
+    chaves, inicio, contagem = np.unique(chave, return_index=True, return_counts=True)
+
+    media = np.add.reduceat(valores, inicio) / contagem if len(chaves) else np.empty(0)
+    desvios = valores - np.repeat(media, contagem)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        desvio = np.sqrt(np.add.reduceat(desvios ** 2, inicio) / (contagem - 1)) if len(chaves) else np.empty(0)
+    mediana = _quantil(valores, inicio, contagem, 0.5)
+    por_quantil = {_nome_quantil(p): _quantil(valores, inicio, contagem, p) for p in quantis}
+    iqr = por_quantil['q75'] - por_quantil['q25']
+    limite_inferior = por_quantil['q25'] - fator_iqr * iqr
+    limite_superior = por_quantil['q75'] + fator_iqr * iqr
+
+    # chave já ordenada: ordenar os desvios absolutos por (chave, desvio) mantém os grupos no lugar
+    absolutos = np.abs(valores - np.repeat(mediana, contagem))
+    mad = _quantil(absolutos[np.lexsort((absolutos, chave))], inicio, contagem, 0.5)
+    fora = (valores < np.repeat(limite_inferior, contagem)) | (valores > np.repeat(limite_superior, contagem))
+
+    indice_grupo = chaves // c
+    return pd.DataFrame({
+        'agrupamento': np.asarray(agrupamentos, dtype=object)[indice_grupo],
+        'grupo': np.asarray(grupos, dtype=object)[indice_grupo],
+        'coluna': np.asarray(colunas, dtype=object)[chaves % c],
+        'n': contagem,
+        'media': media,
+        'desvio': desvio,
+        'minimo': valores[inicio],
+        **{_nome_quantil(p): por_quantil[_nome_quantil(p)] for p in quantis if p < 0.5},
+        'mediana': mediana,
+        **{_nome_quantil(p): por_quantil[_nome_quantil(p)] for p in quantis if p > 0.5},
+        'maximo': valores[inicio + contagem - 1],
+        'iqr': iqr,
+        'limite_inferior': limite_inferior,
+        'limite_superior': limite_superior,
+        'mad': mad,
+        'n_outliers': np.add.reduceat(fora, inicio) if len(chaves) else np.empty(0, dtype=np.int64),
+    })
+
+
+def mascara_outliers(df, resumo, agrupamento='Todos'):
+    """DataFrame booleano (índice de `df`, uma coluna por coluna do resumo): linha fora dos limites do seu grupo.
+
+    Com `agrupamento` (ex.: 'tipo_unidade') cada linha é comparada aos limites
+    do próprio grupo; NaN nunca é outlier.
+    """
+    limites = resumo[resumo['agrupamento'] == agrupamento]
+    grupos = pd.Series('Todos', index=df.index) if agrupamento == 'Todos' else df[agrupamento].astype(str)
+    mascara = pd.DataFrame(False, index=df.index, columns=list(limites['coluna'].unique()))
+    for coluna, parte in limites.groupby('coluna', sort=False):
+        parte = parte.set_index('grupo')
+        inferior = grupos.map(parte['limite_inferior']).to_numpy(dtype=np.float64)
+        superior = grupos.map(parte['limite_superior']).to_numpy(dtype=np.float64)
+        valores = df[coluna].to_numpy(dtype=np.float64)
+        mascara[coluna] = (valores < inferior) | (valores > superior)
+    return mascara
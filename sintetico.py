@@ -0,0 +1,198 @@
+# coding: utf-8
+
+# Gerador de dados sintéticos no formato das fontes reais: AIHs do SIH/RD
+# (colunas de carregamento.ESQUEMA_SIH) e Hospitais e Leitos do OpenDataSUS.
+# Serve para rodar o pipeline e os benchmarks sem baixar os arquivos
+# publicados, em qualquer escala (de dezenas de milhares a dezenas de
+# milhões de AIHs).
+#
+# Exemplo:
+#   python -m sintetico --aih 1000000 --hospitais 120 --saida dados/sintetico
+# grava dados/sintetico/hospitais_leitos.csv, o SIH particionado em
+# dados/sintetico/sih (mesmo layout de extrai-dados-pysus.py, uf=/ano=/mes=)
+# e os CSVs da CID-10 dos códigos sorteados em dados/sintetico/cid10 (mesmo
+# formato dos do DATASUS).
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import cid10
+from ocupacao import aaaammdd_para_dias, dias_para_aaaammdd
+
+TIPOS_UNIDADE = ['HOSPITAL GERAL', 'HOSPITAL ESPECIALIZADO', 'UNIDADE MISTA']
+PROPORCAO_TIPOS = [0.6, 0.15, 0.25]
+# permanência média (dias) e taxa de óbito de referência por tipo de unidade
+PERMANENCIA_MEDIA = {'HOSPITAL GERAL': 4.5, 'HOSPITAL ESPECIALIZADO': 6.0, 'UNIDADE MISTA': 2.5}
+TAXA_OBITO = {'HOSPITAL GERAL': 0.05, 'HOSPITAL ESPECIALIZADO': 0.07, 'UNIDADE MISTA': 0.02}
+
+# CIDs frequentes nas AIHs da Paraíba vêm primeiro; o restante é uma cauda longa
+CIDS_FREQUENTES = ['O800', 'O82 ', 'K359', 'Z302', 'S525', 'I64 ', 'I219', 'F192', 'J189', 'A419', 'N390', 'J159']
+LETRAS_CID = 'ABCDEFGIJKLMNOQRST'
+N_CIDS = 2000
+
+
+def _municipios(n, rng):
+    codigos = 250000 + np.sort(rng.choice(np.arange(10, 9990, 10), n, replace=False))
+    return codigos, np.array([f'MUNICIPIO {c}' for c in codigos], dtype=object)
+
+
+def _cids(n):
+    # Zipf: poucos CIDs concentram a maioria das internações; a lista só
+    # depende de n, para ser a mesma em todos os lotes
+    rng = np.random.default_rng(n)
+    cauda = {f'{rng.choice(list(LETRAS_CID))}{rng.integers(0, 100):02d}{rng.integers(0, 10)}' for _ in range(n * 2)}
+    cids = CIDS_FREQUENTES + sorted(cauda - set(CIDS_FREQUENTES))[:max(n - len(CIDS_FREQUENTES), 0)]
+    pesos = 1.0 / np.arange(1, len(cids) + 1) ** 1.1
+    return np.array(cids, dtype=object), pesos / pesos.sum()
+
+
+def gerar_hospitais_leitos(n_hospitais=80, ano=2024, uf='PB', n_municipios=40, semente=0):
+    """Tabela de Hospitais e Leitos (OpenDataSUS), uma linha por hospital e competência.
+
+    Inclui alguns hospitais de outra UF, como no arquivo nacional.
+    """
+    rng = np.random.default_rng(semente)
+    n_total = n_hospitais + max(n_hospitais // 10, 1)
+    cnes = (2_400_000 + np.sort(rng.choice(600_000, n_total, replace=False))).astype(np.int32)
+    ufs = np.array([uf] * n_hospitais + ['PE'] * (n_total - n_hospitais), dtype=object)
+    tipos = rng.choice(TIPOS_UNIDADE, n_total, p=PROPORCAO_TIPOS)
+    _, nomes_municipio = _municipios(n_municipios, rng)
+    # poucos municípios (capital e polos regionais) concentram os hospitais
+    pesos_municipio = 1.0 / np.arange(1, n_municipios + 1)
+    municipios = rng.choice(nomes_municipio, n_total, p=pesos_municipio / pesos_municipio.sum())
+    leitos = np.maximum(np.round(rng.lognormal(np.log(40), 0.9, n_total)), 5).astype(int)
+    sus = np.round(leitos * rng.uniform(0.5, 1.0, n_total)).astype(int)
+    gestao = rng.choice(list('MED'), n_total, p=[0.5, 0.35, 0.15])
+
+    competencias = [ano * 100 + mes for mes in range(1, 13)]
+    linhas = len(competencias) * n_total
+    repetir = np.tile(np.arange(n_total), len(competencias))
+    variacao = rng.integers(-2, 3, linhas)
+    return pd.DataFrame({
+        'COMP': np.repeat(competencias, n_total),
+        'REGIAO': 'NORDESTE',
+        'UF': ufs[repetir],
+        'MUNICIPIO': municipios[repetir],
+        'MOTIVO_DESABILITACAO': None,
+        'CNES': cnes[repetir],
+        'NOME_ESTABELECIMENTO': [f'HOSPITAL {c}' for c in cnes[repetir]],
+        'RAZAO_SOCIAL': [f'RAZAO SOCIAL {c}' for c in cnes[repetir]],
+        'TP_GESTAO': gestao[repetir],
+        'CO_TIPO_UNIDADE': 5,
+        'DS_TIPO_UNIDADE': tipos[repetir],
+        'NATUREZA_JURIDICA': 1023,
+        'DESC_NATUREZA_JURIDICA': 'ORGAO PUBLICO',
+        'NO_LOGRADOURO': 'RUA',
+        'NU_ENDERECO': '1',
+        'NO_COMPLEMENTO': None,
+        'NO_BAIRRO': 'CENTRO',
+        'CO_CEP': 58000000,
+        'NU_TELEFONE': None,
+        'NO_EMAIL': None,
+        'LEITOS_EXISTENTES': leitos[repetir] + np.maximum(variacao, 0),
+        'LEITOS_SUS': np.maximum(sus[repetir] + variacao, 1),
+    })
+
+
+def gerar_sih(n_aih, hospital_e_leitos, ano=2024, uf='PB', n_cids=N_CIDS, semente=0):
+    """AIHs do SIH/RD com as colunas de carregamento.ESQUEMA_SIH (e UF_ZI, SEXO).
+
+    O hospital é sorteado proporcionalmente aos leitos SUS; a permanência e
+    o óbito dependem do tipo de unidade e da idade. As internações começam
+    um mês antes do ano, como as AIHs de dezembro pagas em janeiro.
+    """
+    rng = np.random.default_rng(semente)
+    hospitais = (hospital_e_leitos[hospital_e_leitos['UF'] == uf]
+                 .groupby('CNES').agg(leitos=('LEITOS_SUS', 'mean'), tipo=('DS_TIPO_UNIDADE', 'first'), municipio=('MUNICIPIO', 'first')))
+    # 'MUNICIPIO 250750' -> 250750, o código do município do hospital
+    codigo_municipio = hospitais['municipio'].str.split().str[-1].astype(int).to_numpy()
+    pesos = hospitais['leitos'].to_numpy() / hospitais['leitos'].sum()
+    hospital = rng.choice(len(hospitais), n_aih, p=pesos)
+    tipo = hospitais['tipo'].to_numpy()[hospital]
+
+    idade = np.clip(np.round(rng.gamma(2.0, 20.0, n_aih)), 0, 110).astype(np.int16)
+    permanencia_media = pd.Series(PERMANENCIA_MEDIA).reindex(tipo).to_numpy() * (1 + idade / 100)
+    dias_perm = rng.poisson(permanencia_media).astype(np.int32)
+    # óbito cresce com a idade e a permanência
+    chance = pd.Series(TAXA_OBITO).reindex(tipo).to_numpy() * (0.4 + idade / 50) * (1 + dias_perm / 20)
+    morte = (rng.random(n_aih) < np.clip(chance, 0, 0.9)).astype(np.int8)
+
+    # datas como dias desde 1970-01-01
+    inicio, fim = aaaammdd_para_dias([(ano - 1) * 10000 + 1201, ano * 10000 + 1231]).astype(np.int64)
+    entrada = rng.integers(inicio, fim + 1, n_aih)
+    saida = np.minimum(entrada + dias_perm, fim)
+    dt_saida = dias_para_aaaammdd(saida.astype('datetime64[D]'))
+    cids, pesos_cid = _cids(n_cids)
+
+    return pd.DataFrame({
+        'UF_ZI': 250000,
+        'ESPEC': rng.choice([1, 2, 3, 4, 7, 10], n_aih, p=[0.3, 0.3, 0.2, 0.1, 0.05, 0.05]).astype(np.int8),
+        'PROC_REA': rng.integers(301010000, 417000000, n_aih),
+        'VAL_TOT': np.round(rng.gamma(1.5, 800.0, n_aih), 2),
+        'DT_INTER': dias_para_aaaammdd(entrada.astype('datetime64[D]')),
+        'DT_SAIDA': dt_saida,
+        'DIAG_PRINC': rng.choice(cids, n_aih, p=pesos_cid),
+        'MUNIC_MOV': codigo_municipio[hospital],
+        'DIAS_PERM': (saida - entrada).astype(np.int32),
+        'MORTE': morte,
+        'CNES': hospitais.index.to_numpy()[hospital].astype(np.int32),
+        'IDADE': idade,
+        # competência: mês da saída; saídas ainda no ano anterior entram em janeiro
+        'MES_CMPT': np.where(dt_saida // 10000 == ano, (dt_saida // 100) % 100, 1).astype(np.int8),
+        'SEXO': rng.integers(1, 3, n_aih).astype(np.int8),
+    })
+
+
+def gravar_cid10(diretorio, n_cids=N_CIDS):
+    # CSVs da CID-10 (como os do DATASUS) com as categorias e subcategorias sorteadas por gerar_sih
+    os.makedirs(diretorio, exist_ok=True)
+    codigos = sorted({c.strip() for c in _cids(n_cids)[0]})
+    categorias = sorted({c[:3] for c in codigos})
+    tabelas = {
+        'CID-10-GRUPOS.CSV': pd.DataFrame({'CATINIC': [c[1] for c in cid10.CAPITULOS], 'CATFIM': [c[2] for c in cid10.CAPITULOS],
+                                           'DESCRICAO': [c[3] for c in cid10.CAPITULOS]}),
+        'CID-10-CATEGORIAS.CSV': pd.DataFrame({'CAT': categorias, 'DESCRICAO': [f'Categoria {c}' for c in categorias]}),
+        'CID-10-SUBCATEGORIAS.CSV': pd.DataFrame({'SUBCAT': [c for c in codigos if len(c) == 4],
+                                                  'DESCRICAO': [f'Subcategoria {c}' for c in codigos if len(c) == 4]}),
+    }
+    for nome, tabela in tabelas.items():
+        tabela.to_csv(os.path.join(diretorio, nome), sep=';', index=False, encoding='ISO-8859-1')
+
+
+def gravar(saida, n_aih, n_hospitais=80, ano=2024, uf='PB', semente=0, tamanho_lote=5_000_000):
+    # leitos em CSV (como o arquivo do OpenDataSUS), SIH particionado por
+    # uf/ano/mes (como extrai-dados-pysus.py), gerado em lotes, e CSVs da CID-10
+    os.makedirs(saida, exist_ok=True)
+    gravar_cid10(os.path.join(saida, 'cid10'))
+    hospital_e_leitos = gerar_hospitais_leitos(n_hospitais, ano=ano, uf=uf, semente=semente)
+    hospital_e_leitos.to_csv(os.path.join(saida, 'hospitais_leitos.csv'), index=False, encoding='ISO-8859-1')
+
+    diretorio_sih = os.path.join(saida, 'sih')
+    for numero, inicio in enumerate(range(0, n_aih, tamanho_lote)):
+        sih = gerar_sih(min(tamanho_lote, n_aih - inicio), hospital_e_leitos, ano=ano, uf=uf, semente=semente + numero)
+        for mes, parte in sih.groupby('MES_CMPT'):
+            destino = os.path.join(diretorio_sih, f'uf={uf}', f'ano={ano}', f'mes={mes}')
+            os.makedirs(destino, exist_ok=True)
+            parte.to_parquet(os.path.join(destino, f'parte-{numero}.parquet'), index=False)
+    return hospital_e_leitos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera SIH e Hospitais e Leitos sintéticos.')
+    parser.add_argument('--aih', type=int, default=100_000)
+    parser.add_argument('--hospitais', type=int, default=80)
+    parser.add_argument('--ano', type=int, default=2024)
+    parser.add_argument('--uf', default='PB')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', default=os.path.join('dados', 'sintetico'))
+    args = parser.parse_args(argv)
+
+    gravar(args.saida, args.aih, args.hospitais, args.ano, args.uf.upper(), args.semente)
+    print(f'{args.aih} AIHs sintéticas gravadas em {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
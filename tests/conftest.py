@@ -0,0 +1,66 @@
+# coding: utf-8
+
+# Testes do pipeline sobre dados pequenos (sintetico.py ou CSVs locais), sem
+# acesso à rede. Rodar da raiz do projeto:
+#   pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cid10  # noqa: E402
+import pipeline  # noqa: E402
+import sintetico  # noqa: E402
+from carregamento import carregar_hospitais_leitos, ler_sih_particionado  # noqa: E402
+from hospitais import DimensaoHospitais  # noqa: E402
+
+N_AIH = 20_000
+N_HOSPITAIS = 12
+ANO = 2024
+
+
+@pytest.fixture(autouse=True)
+def tabela_cid10(tmp_path_factory, monkeypatch):
+    # a tabela da CID-10 gravada pelos builds fica fora de tabelas/ do projeto
+    caminho = tmp_path_factory.getbasetemp() / 'cid10.parquet'
+    monkeypatch.setattr(cid10, 'CAMINHO_TABELA', str(caminho))
+    return caminho
+
+
+@pytest.fixture(scope='session')
+def diretorio_dados(tmp_path_factory):
+    # hospitais_leitos.csv, o SIH particionado em sih/ (uf=/ano=/mes=) e os CSVs da CID-10 em cid10/
+    diretorio = tmp_path_factory.mktemp('sintetico')
+    sintetico.gravar(str(diretorio), N_AIH, n_hospitais=N_HOSPITAIS, ano=ANO)
+    return diretorio
+
+
+@pytest.fixture(scope='session')
+def hospitais(diretorio_dados, tmp_path_factory):
+    hospital_e_leitos_br = carregar_hospitais_leitos((diretorio_dados / 'hospitais_leitos.csv').as_uri(),
+                                                     dir_cache=str(tmp_path_factory.mktemp('cache')))
+    return DimensaoHospitais(pipeline.limpar_hospitais_leitos(hospital_e_leitos_br, uf='PB'))
+
+
+@pytest.fixture(scope='session')
+def sih(diretorio_dados):
+    bruto = ler_sih_particionado(str(diretorio_dados / 'sih')).drop(columns=['uf', 'ano', 'mes'])
+    return pipeline.limpar_sih(bruto, ultimo_mes_cmpt=12)
+
+
+@pytest.fixture(scope='session')
+def df_ocupacao_diaria(sih, hospitais):
+    return pipeline.montar_ocupacao_diaria(sih, hospitais, inicio=ANO * 10000 + 101)
+
+
+@pytest.fixture(scope='session')
+def df_stats(df_ocupacao_diaria, sih, hospitais):
+    return pipeline.calcular_stats(df_ocupacao_diaria, pipeline.filtrar_periodo(sih, inicio_mes=ANO * 100 + 1), hospitais)
+
+
+@pytest.fixture(scope='session')
+def df_combined(sih, df_ocupacao_diaria):
+    return pipeline.montar_df_combined(pipeline.filtrar_periodo(sih, inicio_mes=ANO * 100 + 1), df_ocupacao_diaria)
@@ -0,0 +1,84 @@
+# coding: utf-8
+
+import pandas as pd
+import pytest
+
+import artefatos
+import pipeline
+
+
+def test_build_offline_com_leitos_locais(tmp_path, diretorio_dados, monkeypatch):
+    # o cache das fontes (relativo) fica no diretório temporário
+    monkeypatch.chdir(tmp_path)
+    saida = tmp_path / 'artefatos'
+    artefatos.main(['build', '--sih', str(diretorio_dados / 'sih'), '--leitos', str(diretorio_dados / 'hospitais_leitos.csv'),
+                    '--cid10', str(diretorio_dados / 'cid10'), '--saida', str(saida), '--balanceamento', 'pesos'])
+
+    manifesto = artefatos.ler_manifesto(str(saida))
+    # mesmo último mês do painel sem artefatos (pipeline.limpar_sih)
+    assert manifesto['ultimo_mes_cmpt'] == pipeline.ULTIMO_MES_CMPT
+    ocupacao = pd.read_parquet(saida / 'df_ocupacao_diaria.parquet')
+    assert ocupacao['id_cnes'].nunique() > 0
+
+
+def _build(diretorio_dados, saida, ultimo_mes):
+    artefatos.main(['build', '--sih', str(diretorio_dados / 'sih'), '--leitos', str(diretorio_dados / 'hospitais_leitos.csv'),
+                    '--cid10', str(diretorio_dados / 'cid10'), '--saida', str(saida), '--balanceamento', 'pesos', '--ultimo-mes', str(ultimo_mes)])
+
+
+def _ler(saida, nome, chaves):
+    tabela = pd.read_parquet(saida / f'{nome}.parquet')
+    return tabela.sort_values(chaves).reset_index(drop=True)
+
+
+def test_build_ate_n_e_atualizar_n_mais_1_igual_build_completo(tmp_path, diretorio_dados, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parcial, completo = tmp_path / 'parcial', tmp_path / 'completo'
+    _build(diretorio_dados, parcial, 11)
+    artefatos.main(['atualizar', '--mes', '12', '--sih', str(diretorio_dados / 'sih'),
+                    '--leitos', str(diretorio_dados / 'hospitais_leitos.csv'), '--saida', str(parcial)])
+    _build(diretorio_dados, completo, 12)
+
+    for nome, chaves in [('df_ocupacao_diaria', ['id_cnes', 'data']), ('df_stats', ['id_cnes']),
+                         ('cubo_hospital_mes', ['id_cnes', 'mes_ano']), ('cubo_cids', ['id_cnes', 'mes_ano', 'cid_principal']),
+                         ('censo_especialidade', ['id_cnes', 'mes_ano', 'especialidade_leito'])]:
+        pd.testing.assert_frame_equal(_ler(parcial, nome, chaves), _ler(completo, nome, chaves), check_dtype=False,
+                                      check_categorical=False, obj=nome)
+    assert artefatos.ler_manifesto(str(parcial))['competencias'] == artefatos.ler_manifesto(str(completo))['competencias']
+
+
+def test_atualizar_recusa_estado_que_nao_cobre_os_artefatos(tmp_path, diretorio_dados, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    saida = tmp_path / 'artefatos'
+    _build(diretorio_dados, saida, 11)
+    antes = pd.read_parquet(saida / 'df_ocupacao_diaria.parquet')
+
+    with pytest.raises(ValueError, match='não cobre'):
+        artefatos.atualizar_mes('PB', 2024, 12, str(diretorio_dados / 'sih'), str(saida), dir_estado=str(tmp_path / 'estado_novo'),
+                                leitos=str(diretorio_dados / 'hospitais_leitos.csv'))
+    pd.testing.assert_frame_equal(pd.read_parquet(saida / 'df_ocupacao_diaria.parquet'), antes)
+
+
+def test_build_em_lotes_sem_carregar_o_sih_inteiro(tmp_path, diretorio_dados, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    completo, em_lotes = tmp_path / 'completo', tmp_path / 'lotes'
+    _build(diretorio_dados, completo, 12)
+
+    def proibido(*args, **kwargs):
+        raise AssertionError('o SIH inteiro não deve ser carregado no caminho em lotes')
+
+    monkeypatch.setattr(artefatos, 'ler_sih_particionado', proibido)
+    monkeypatch.setattr(pipeline, 'montar_df_combined', proibido)
+    artefatos.main(['build', '--sih', str(diretorio_dados / 'sih'), '--leitos', str(diretorio_dados / 'hospitais_leitos.csv'),
+                    '--cid10', str(diretorio_dados / 'cid10'), '--saida', str(em_lotes), '--balanceamento', 'pesos',
+                    '--ultimo-mes', '12', '--lotes', '3000'])
+
+    for nome, chaves in [('df_ocupacao_diaria', ['id_cnes', 'data']), ('df_stats', ['id_cnes']),
+                         ('cubo_hospital_mes', ['id_cnes', 'mes_ano']), ('cubo_cids', ['id_cnes', 'mes_ano', 'cid_principal']),
+                         ('censo_especialidade', ['id_cnes', 'mes_ano', 'especialidade_leito']),
+                         ('internacoes_por_capitulo', ['capitulo'])]:
+        pd.testing.assert_frame_equal(_ler(em_lotes, nome, chaves), _ler(completo, nome, chaves), check_dtype=False,
+                                      check_categorical=False, obj=nome)
+    # o mesmo estado incremental do build com o SIH inteiro
+    estado = pd.read_parquet(em_lotes / artefatos.DIR_ESTADO / 'grade.parquet')
+    pd.testing.assert_frame_equal(estado, pd.read_parquet(completo / artefatos.DIR_ESTADO / 'grade.parquet'))
@@ -0,0 +1,59 @@
+# coding: utf-8
+
+import os
+
+import numpy as np
+import pytest
+
+import avaliacao
+
+# poucos candidatos e dobras: o que se testa é o cache e a divisão, não a busca
+PARAMETROS = {'busca': 'aleatoria', 'n_candidatos': 2, 'dobras': 3, 'n_jobs': 1}
+
+
+@pytest.mark.parametrize('nome', ['regressao_multipla', 'logistica_sem_municipio'])
+def test_cache_por_dobra(nome, df_stats, df_combined, tmp_path):
+    df = df_stats if avaliacao.MODELOS[nome]['tipo'] == 'regressao' else df_combined
+    primeira = avaliacao.avaliar(nome, df, dir_cache=tmp_path, **PARAMETROS)
+    assert len(primeira) == 2 * 3 and not primeira['em_cache'].any()
+    arquivos = sorted((tmp_path / nome).glob('*.json'))
+    assert len(arquivos) == 6
+
+    segunda = avaliacao.avaliar(nome, df, dir_cache=tmp_path, **PARAMETROS)
+    assert segunda['em_cache'].all()
+    metricas = [c for c in primeira.columns if c not in ('em_cache', 'tempo_ajuste_s')]
+    assert segunda[metricas].equals(primeira[metricas])
+
+    # só a dobra apagada é ajustada de novo, e com o mesmo resultado
+    os.remove(arquivos[0])
+    terceira = avaliacao.avaliar(nome, df, dir_cache=tmp_path, **PARAMETROS)
+    assert (~terceira['em_cache']).sum() == 1
+    assert terceira[metricas].equals(primeira[metricas])
+    assert arquivos[0].exists()
+
+
+def test_sem_cache_nao_grava(df_stats, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    resultado = avaliacao.avaliar('regressao_simples', df_stats, dir_cache=None, **PARAMETROS)
+    assert not resultado['em_cache'].any()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cache_muda_com_os_dados(df_stats, tmp_path):
+    avaliacao.avaliar('regressao_simples', df_stats, dir_cache=tmp_path, **PARAMETROS)
+    outro = df_stats.assign(leitos_sus_mean=df_stats['leitos_sus_mean'] + 1)
+    assert not avaliacao.avaliar('regressao_simples', outro, dir_cache=tmp_path, **PARAMETROS)['em_cache'].any()
+
+
+@pytest.mark.parametrize('nome', ['logistica_sem_municipio', 'logistica_com_municipio'])
+def test_dobras_das_logisticas_separam_hospitais(nome, df_combined):
+    grupos = df_combined['id_cnes'].to_numpy()
+    divisoes = avaliacao.dividir(df_combined, nome, dobras=4)
+    assert len(divisoes) == 4
+    testes = []
+    for treino, teste in divisoes:
+        assert len(np.intersect1d(treino, teste)) == 0
+        assert len(np.intersect1d(np.unique(grupos[treino]), np.unique(grupos[teste]))) == 0
+        testes.append(teste)
+    # cada AIH fica no teste de exatamente uma dobra
+    assert np.array_equal(np.sort(np.concatenate(testes)), np.arange(len(df_combined)))
@@ -0,0 +1,65 @@
+# coding: utf-8
+
+import os
+
+import pandas as pd
+
+import artefatos
+from carregamento import ARQUIVO_INDICE, _ler_indice, invalidar_cache, ler_csv_em_cache
+
+
+def _csv(diretorio, nome, valores):
+    caminho = diretorio / nome
+    pd.DataFrame({'a': valores}).to_csv(caminho, index=False)
+    return caminho.as_uri()
+
+
+def _parquets(dir_cache):
+    return sorted(f for f in os.listdir(dir_cache) if f.endswith('.parquet'))
+
+
+def test_cache_reaproveita_parquet(tmp_path):
+    url = _csv(tmp_path, 'a.csv', [1, 2, 3])
+    dir_cache = str(tmp_path / 'cache')
+    assert ler_csv_em_cache(url, dir_cache=dir_cache)['a'].tolist() == [1, 2, 3]
+    # o CSV muda, mas sem atualizar vale o Parquet em cache
+    _csv(tmp_path, 'a.csv', [4])
+    assert ler_csv_em_cache(url, dir_cache=dir_cache)['a'].tolist() == [1, 2, 3]
+    assert ler_csv_em_cache(url, atualizar=True, dir_cache=dir_cache)['a'].tolist() == [4]
+    # a versão anterior é removida
+    assert len(_parquets(dir_cache)) == 1
+
+
+def test_caminho_local_usa_o_mesmo_cache(tmp_path):
+    _csv(tmp_path, 'a.csv', [7, 8])
+    dir_cache = str(tmp_path / 'cache')
+    assert ler_csv_em_cache(str(tmp_path / 'a.csv'), dir_cache=dir_cache)['a'].tolist() == [7, 8]
+    assert len(_parquets(dir_cache)) == 1
+
+
+def test_invalidar_cache_de_uma_url(tmp_path):
+    url_a, url_b = _csv(tmp_path, 'a.csv', [1]), _csv(tmp_path, 'b.csv', [2])
+    dir_cache = str(tmp_path / 'cache')
+    ler_csv_em_cache(url_a, dir_cache=dir_cache)
+    ler_csv_em_cache(url_b, dir_cache=dir_cache)
+
+    invalidar_cache(url_a, dir_cache=dir_cache)
+    assert [e['url'] for e in _ler_indice(dir_cache).values()] == [url_b]
+    assert len(_parquets(dir_cache)) == 1
+
+    # a próxima leitura baixa de novo
+    _csv(tmp_path, 'a.csv', [5])
+    assert ler_csv_em_cache(url_a, dir_cache=dir_cache)['a'].tolist() == [5]
+
+
+def test_limpar_cache_pela_linha_de_comando(tmp_path):
+    url = _csv(tmp_path, 'a.csv', [1])
+    dir_cache = str(tmp_path / 'cache')
+    ler_csv_em_cache(url, dir_cache=dir_cache)
+
+    artefatos.main(['limpar-cache', '--cache', dir_cache, '--url', url])
+    assert _parquets(dir_cache) == []
+    assert os.path.exists(os.path.join(dir_cache, ARQUIVO_INDICE))
+
+    artefatos.main(['limpar-cache', '--cache', dir_cache])
+    assert not os.path.exists(dir_cache)
@@ -0,0 +1,36 @@
+# coding: utf-8
+
+import os
+import zipfile
+
+import pandas as pd
+
+import artefatos
+import cid10
+
+
+def test_tabela_do_zip_igual_a_do_diretorio(tmp_path, diretorio_dados):
+    arquivo_zip = tmp_path / 'CID10CSV.zip'
+    with zipfile.ZipFile(arquivo_zip, 'w') as destino:
+        for nome in os.listdir(diretorio_dados / 'cid10'):
+            destino.write(diretorio_dados / 'cid10' / nome, nome)
+
+    do_diretorio = cid10.montar_tabela_datasus(str(diretorio_dados / 'cid10'))
+    pd.testing.assert_frame_equal(cid10.montar_tabela_datasus(str(arquivo_zip)), do_diretorio)
+    assert do_diretorio['descricao'].notna().all()
+    # os códigos sintéticos fora dos capítulos (ex.: D49) ficam sem grupo, como na tabela real
+    assert do_diretorio.loc[do_diretorio['capitulo'].notna(), 'grupo'].notna().all()
+
+
+def test_build_grava_a_tabela_e_descreve_todos_os_cids(tmp_path, diretorio_dados, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    caminho = tmp_path / 'tabelas' / 'cid10.parquet'
+    monkeypatch.setattr(cid10, 'CAMINHO_TABELA', str(caminho))
+    saida = tmp_path / 'artefatos'
+    artefatos.main(['build', '--sih', str(diretorio_dados / 'sih'), '--leitos', str(diretorio_dados / 'hospitais_leitos.csv'),
+                    '--cid10', str(diretorio_dados / 'cid10'), '--saida', str(saida), '--balanceamento', 'pesos'])
+
+    assert caminho.exists()
+    assert len(cid10.carregar_tabela()) > len(cid10.DESCRICOES_CONHECIDAS)
+    cids_top_hospitais = pd.read_parquet(saida / 'cids_top_hospitais.parquet')
+    assert cids_top_hospitais['descricao'].notna().all()
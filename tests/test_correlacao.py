@@ -0,0 +1,84 @@
+# coding: utf-8
+
+import numpy as np
+import pytest
+from scipy import stats
+
+import correlacao
+
+
+def _coeficientes(x, y):
+    px, py = correlacao._postos_densos(x), correlacao._postos_densos(y)
+    resultado = correlacao._coeficientes(x[None], y[None], px[None], py[None], correlacao.METODOS)
+    return {metodo: valores[0] for metodo, valores in resultado.items()}
+
+
+def _referencia(x, y):
+    return {
+        'pearson': np.corrcoef(x, y)[0, 1],
+        'spearman': stats.spearmanr(x, y).statistic,
+        'kendall': stats.kendalltau(x, y).statistic,
+    }
+
+
+# n pequeno (< base), potências de dois e vizinhos, e n que não é potência de dois
+@pytest.mark.parametrize('n', [3, 4, 7, 31, 32, 33, 64, 100, 129, 200])
+@pytest.mark.parametrize('valores_distintos', [3, 10, None])
+def test_coeficientes_iguais_aos_do_scipy(n, valores_distintos):
+    rng = np.random.default_rng(n * 100 + (valores_distintos or 0))
+    for _ in range(5):
+        if valores_distintos is None:
+            x, y = rng.normal(size=n), rng.normal(size=n)
+        else:
+            # muitos empates em x, em y e nos dois ao mesmo tempo
+            x = rng.integers(0, valores_distintos, n).astype(np.float64)
+            y = (x + rng.integers(0, valores_distintos, n)).astype(np.float64)
+        if np.ptp(x) == 0 or np.ptp(y) == 0:
+            continue
+        obtidos, esperados = _coeficientes(x, y), _referencia(x, y)
+        for metodo in correlacao.METODOS:
+            assert obtidos[metodo] == pytest.approx(esperados[metodo], abs=1e-10), metodo
+
+
+def test_coeficientes_com_postos_int64():
+    # a partir de 2**16 valores os postos deixam de ser uint16
+    rng = np.random.default_rng(0)
+    n = 70_000
+    x = rng.normal(size=n)
+    y = np.round(x + rng.normal(size=n), 1)
+    assert correlacao._postos_densos(x).dtype == np.int64
+    obtidos, esperados = _coeficientes(x, y), _referencia(x, y)
+    for metodo in correlacao.METODOS:
+        assert obtidos[metodo] == pytest.approx(esperados[metodo], abs=1e-10), metodo
+
+
+def test_coluna_constante_da_nan():
+    x = np.arange(10, dtype=np.float64)
+    obtidos = _coeficientes(x, np.full(10, 3.0))
+    assert all(np.isnan(obtidos[metodo]) for metodo in correlacao.METODOS)
+
+
+def test_linhas_independentes():
+    # várias reamostras de uma vez dão o mesmo que cada uma sozinha
+    rng = np.random.default_rng(1)
+    x, y = rng.integers(0, 5, 50).astype(np.float64), rng.integers(0, 5, 50).astype(np.float64)
+    px, py = correlacao._postos_densos(x), correlacao._postos_densos(y)
+    indices = rng.integers(0, 50, size=(20, 50))
+    juntos = correlacao._coeficientes(x[indices], y[indices], px[indices], py[indices], correlacao.METODOS)
+    for i, linha in enumerate(indices):
+        sozinha = correlacao._coeficientes(x[linha][None], y[linha][None], px[linha][None], py[linha][None], correlacao.METODOS)
+        for metodo in correlacao.METODOS:
+            np.testing.assert_allclose(juntos[metodo][i], sozinha[metodo][0], equal_nan=True)
+
+
+def test_testar_par():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=80)
+    y = 0.5 * x + rng.normal(size=80)
+    x[3] = np.nan
+    testes, n = correlacao.testar_par(x, y, n_reamostras=500)
+    assert n == 79
+    for metodo, teste in testes.items():
+        assert teste['ic_inferior'] <= teste['coeficiente'] <= teste['ic_superior'], metodo
+        assert 0 < teste['p_valor'] <= 1, metodo
+    assert testes['pearson']['coeficiente'] == pytest.approx(np.corrcoef(x[~np.isnan(x)], y[~np.isnan(x)])[0, 1])
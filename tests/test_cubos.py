@@ -0,0 +1,26 @@
+# coding: utf-8
+
+import numpy as np
+import pytest
+
+import cubos
+import pipeline
+from conftest import ANO
+
+
+@pytest.mark.parametrize('coluna', ['taxa_ocupacao_diaria_pct', 'total_leitos_sus', 'taxa_obito_pct'])
+def test_medias_mensais_do_cubo_iguais_as_da_grade_diaria(coluna, sih, hospitais, df_ocupacao_diaria):
+    sih_periodo = pipeline.filtrar_periodo(sih, inicio_mes=ANO * 100 + 1)
+    cubo = pipeline.montar_cubos(df_ocupacao_diaria, sih_periodo, hospitais)['cubo_hospital_mes']
+    medias = cubos.medias_mensais(cubo, coluna).sort_values(['mes_ano', 'DS_TIPO_UNIDADE']).reset_index(drop=True)
+
+    # média, desvio e contagem direto sobre os dias
+    esperado = (df_ocupacao_diaria.groupby(['mes_ano', 'DS_TIPO_UNIDADE'], observed=True)[coluna]
+                .agg(['mean', 'std', 'count']).reset_index().sort_values(['mes_ano', 'DS_TIPO_UNIDADE']).reset_index(drop=True))
+    erro = (1.96 * esperado['std'] / np.sqrt(esperado['count'])).fillna(0)
+    np.testing.assert_array_equal(medias['mes_ano'], esperado['mes_ano'])
+    np.testing.assert_array_equal(medias['count'], esperado['count'])
+    np.testing.assert_allclose(medias[coluna], esperado['mean'])
+    np.testing.assert_allclose(medias['ic_inferior'], esperado['mean'] - erro, atol=1e-9)
+    np.testing.assert_allclose(medias['ic_superior'], esperado['mean'] + erro, atol=1e-9)
+    assert (medias['DS_TIPO_UNIDADE'].astype(str) == esperado['DS_TIPO_UNIDADE'].astype(str)).all()
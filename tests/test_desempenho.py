@@ -0,0 +1,31 @@
+# coding: utf-8
+
+import os
+
+import numpy as np
+import pytest
+
+import desempenho
+
+
+def test_rss_do_processo_e_da_etapa():
+    if desempenho.resource is None or not os.path.exists('/proc/self/statm'):
+        pytest.skip('sem ru_maxrss ou /proc (só Linux)')
+    medicoes = desempenho.Medicoes()
+    with medicoes.etapa('externa'):
+        with medicoes.etapa('alocacao') as etapa:
+            # o RSS atual mais 256 MiB passa de qualquer pico anterior da sessão de testes
+            with open('/proc/self/statm') as f:
+                atual_mb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+            bloco = np.ones(int(desempenho.rss_pico_mb() - atual_mb + 256) * 2 ** 17)
+            etapa['linhas'] = len(bloco)
+        del bloco
+        with medicoes.etapa('leve'):
+            sum(range(1000))
+    df = medicoes.para_dataframe().set_index('etapa')
+    assert list(df.columns[:5]) == ['nivel', 'tempo_s', 'cpu_s', 'rss_pico_processo_mb', 'rss_delta_mb']
+    # ru_maxrss é o pico do processo: não cai depois da etapa que alocou
+    assert df.loc['leve', 'rss_pico_processo_mb'] >= df.loc['alocacao', 'rss_pico_processo_mb']
+    assert df.loc['alocacao', 'rss_delta_mb'] >= 200
+    assert df.loc['leve', 'rss_delta_mb'] == 0
+    assert df.loc['externa', 'rss_delta_mb'] >= df.loc['alocacao', 'rss_delta_mb']
@@ -0,0 +1,142 @@
+# coding: utf-8
+
+# extrai-dados-pysus.py com um substituto local do PySUS (get_files/download),
+# sem acesso à rede.
+
+import importlib.util
+import os
+import sys
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importar_extrator():
+    # o nome do arquivo tem hífens; registrado em sys.modules para os processos de conversão
+    spec = importlib.util.spec_from_file_location('extrai_dados_pysus', os.path.join(RAIZ, 'extrai-dados-pysus.py'))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules['extrai_dados_pysus'] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+extrator = _importar_extrator()
+
+
+class SIHLocal:
+    """Substituto do pysus.SIH: cada arquivo RD vira um Parquet local com `linhas` AIHs.
+
+    `falhas` diz quantas vezes o download de cada arquivo falha antes de dar certo.
+    """
+
+    def __init__(self, diretorio, linhas=5, falhas=None):
+        self.diretorio = diretorio
+        self.linhas = linhas
+        self.falhas = Counter(falhas or {})
+        self.downloads = Counter()
+        self._trava = threading.Lock()
+
+    def get_files(self, grupo, uf, year, month):
+        assert grupo == 'RD'
+        return [SimpleNamespace(name=f'RD{u}{a % 100:02d}{m:02d}.dbc') for u in uf for a in year for m in month]
+
+    def download(self, arquivos):
+        (arquivo,) = arquivos
+        with self._trava:
+            self.downloads[arquivo.name] += 1
+            if self.falhas[arquivo.name] > 0:
+                self.falhas[arquivo.name] -= 1
+                raise ConnectionError('conexão recusada')
+        uf, ano, mes = extrator.particao_do_arquivo(arquivo.name)
+        caminho = os.path.join(self.diretorio, arquivo.name.replace('.dbc', '.parquet'))
+        pd.DataFrame({'CNES': range(self.linhas), 'MES_CMPT': mes, 'ANO_CMPT': ano}).to_parquet(caminho)
+        return SimpleNamespace(path=caminho)
+
+
+@pytest.fixture
+def sih_local(tmp_path):
+    os.makedirs(tmp_path / 'downloads')
+    return SIHLocal(str(tmp_path / 'downloads'))
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    # registra os atrasos do backoff sem esperar de fato
+    atrasos = []
+    monkeypatch.setattr(extrator.time, 'sleep', atrasos.append)
+    return atrasos
+
+
+def _ler_particao(saida, uf, ano, mes):
+    return pd.read_parquet(extrator.caminho_particao(saida, uf, ano, mes))
+
+
+def test_extrair_grava_uma_particao_por_mes(tmp_path, sih_local):
+    saida = str(tmp_path / 'sih')
+    falhas = extrator.extrair(['PB', 'PE'], [2024], [1, 2], saida, workers=2, sih=sih_local)
+
+    assert falhas == []
+    for uf in ('PB', 'PE'):
+        for mes in (1, 2):
+            particao = _ler_particao(saida, uf, 2024, mes)
+            assert len(particao) == 5
+            assert (particao['MES_CMPT'] == mes).all()
+    # nenhum diretório temporário sobra
+    assert not [d for _, dirs, _ in os.walk(saida) for d in dirs if d.endswith('.tmp')]
+
+
+def test_retentativas_com_backoff_exponencial(tmp_path, esperas):
+    sih = SIHLocal(str(tmp_path), falhas={'RDPB2403.dbc': 2})
+    saida = str(tmp_path / 'sih')
+    falhas = extrator.extrair(['PB'], [2024], [3], saida, workers=1, tentativas=3, sih=sih, espera=0.5)
+
+    assert falhas == []
+    assert sih.downloads['RDPB2403.dbc'] == 3
+    assert esperas == [0.5, 1.0]
+    assert len(_ler_particao(saida, 'PB', 2024, 3)) == 5
+
+
+def test_falha_depois_das_tentativas_nao_cria_particao(tmp_path, esperas):
+    sih = SIHLocal(str(tmp_path), falhas={'RDPB2401.dbc': 10})
+    saida = str(tmp_path / 'sih')
+    falhas = extrator.extrair(['PB'], [2024], [1, 2], saida, workers=2, tentativas=2, sih=sih, espera=1.0)
+
+    assert falhas == ['RDPB2401.dbc']
+    assert sih.downloads['RDPB2401.dbc'] == 2
+    assert not os.path.exists(extrator.caminho_particao(saida, 'PB', 2024, 1))
+    assert os.path.exists(extrator.caminho_particao(saida, 'PB', 2024, 2))
+
+
+def test_pula_particoes_existentes(tmp_path, sih_local):
+    saida = str(tmp_path / 'sih')
+    extrator.extrair(['PB'], [2024], [1], saida, workers=1, sih=sih_local)
+    # segunda execução: janeiro já existe e não é baixado de novo
+    extrator.extrair(['PB'], [2024], [1, 2], saida, workers=1, sih=sih_local)
+
+    assert sih_local.downloads == Counter({'RDPB2401.dbc': 1, 'RDPB2402.dbc': 1})
+
+
+def test_gravar_particao_e_atomica(tmp_path):
+    destino = str(tmp_path / 'uf=PB' / 'ano=2024' / 'mes=1')
+    # sobra de uma execução interrompida
+    os.makedirs(destino + '.tmp')
+    open(os.path.join(destino + '.tmp', 'lixo.parquet'), 'w').close()
+
+    class Quebrado:
+        def to_parquet(self, caminho, index=False):
+            open(caminho, 'w').close()
+            raise OSError('disco cheio')
+
+    with pytest.raises(OSError):
+        extrator.gravar_particao(Quebrado(), destino)
+    # a escrita interrompida não deixa a partição parecer completa
+    assert not os.path.exists(destino)
+
+    extrator.gravar_particao(pd.DataFrame({'CNES': [1, 2]}), destino)
+    assert os.listdir(destino) == ['parte-0.parquet']
+    assert not os.path.exists(destino + '.tmp')
@@ -0,0 +1,56 @@
+# coding: utf-8
+
+import os
+
+import matplotlib.pyplot as plt
+
+import artefatos
+import figuras
+
+
+def _desenhar(valor):
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, valor])
+    return fig
+
+
+def test_figura_desenhada_uma_vez(tmp_path):
+    chamadas = []
+
+    def desenhar(**params):
+        chamadas.append(params)
+        return _desenhar(**params)
+
+    primeira = figuras.figura_em_cache('linha', desenhar, 'dados1', dir_figuras=tmp_path, valor=1)
+    assert figuras.figura_em_cache('linha', desenhar, 'dados1', dir_figuras=tmp_path, valor=1) == primeira
+    assert len(chamadas) == 1
+    figuras.figura_em_cache('linha', desenhar, 'dados2', dir_figuras=tmp_path, valor=1)
+    assert len(chamadas) == 2 and len(list(tmp_path.iterdir())) == 2
+
+
+def test_podar_apaga_as_usadas_ha_mais_tempo(tmp_path, monkeypatch):
+    monkeypatch.setattr(figuras, 'MAX_MB_FIGURAS', 1)
+    for i in range(4):
+        caminho = tmp_path / f'f{i}.png'
+        caminho.write_bytes(b'x' * 2 ** 19)
+        os.utime(caminho, ns=(10 ** 18 + i * 10 ** 9,) * 2)
+    # f0 foi lida agora: passa a ser a mais recente
+    os.utime(tmp_path / 'f0.png')
+    figuras.podar(tmp_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['f0.png', 'f3.png']
+
+
+def test_teto_do_diretorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(figuras, 'MAX_MB_FIGURAS', 0)
+    for valor in range(3):
+        figuras.figura_em_cache('linha', _desenhar, 'dados', dir_figuras=tmp_path, valor=valor)
+    # com teto zero nada fica no disco, mas os bytes ainda voltam
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_limpar_cache_apaga_as_figuras(tmp_path, monkeypatch):
+    dir_figuras = tmp_path / 'figuras'
+    monkeypatch.setattr(figuras, 'DIR_FIGURAS', str(dir_figuras))
+    figuras.figura_em_cache('linha', _desenhar, 'dados', dir_figuras=dir_figuras, valor=1)
+    artefatos.main(['limpar-cache', '--cache', str(tmp_path / 'fontes')])
+    assert not dir_figuras.exists()
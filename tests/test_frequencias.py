@@ -0,0 +1,80 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import frequencias
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 5_000
+    df = pd.DataFrame({
+        'uf': rng.choice(['MG', 'SP', 'RJ'], n),
+        'cnes': rng.choice(np.arange(1000, 1020), n),
+        # poucos valores e distribuição plana: muitos empates de contagem
+        'cid': rng.choice([f'J{i:02d}' for i in range(12)], n),
+        'qtd_aih': rng.integers(1, 6, n),
+    })
+    df.loc[rng.choice(n, 100, replace=False), 'cid'] = None
+    df.loc[rng.choice(n, 100, replace=False), 'uf'] = None
+    return df
+
+
+def _referencia(df, grupos, valor, k, pesos=None):
+    # contagem ingênua: ordena todos os pares e pega as k primeiras linhas de cada grupo
+    validos = df.dropna(subset=grupos + [valor])
+    if pesos is None:
+        contagem = validos.groupby(grupos + [valor]).size()
+    else:
+        contagem = validos.groupby(grupos + [valor])[pesos].sum()
+    contagem = contagem.rename('qtd').reset_index()
+    contagem['participacao'] = contagem['qtd'] / contagem.groupby(grupos)['qtd'].transform('sum')
+    contagem = contagem.sort_values(grupos + ['qtd', valor], ascending=[True] * len(grupos) + [False, True])
+    topo = contagem.groupby(grupos).head(k).reset_index(drop=True)
+    topo.insert(len(grupos) + 1, 'posicao', topo.groupby(grupos).cumcount() + 1)
+    return topo
+
+
+def _comparar(obtido, esperado):
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize('grupos', [['uf'], ['cnes'], ['uf', 'cnes']])
+@pytest.mark.parametrize('k', [1, 3, 12, 50])
+@pytest.mark.parametrize('pesos', [None, 'qtd_aih'])
+def test_igual_a_referencia(df, grupos, k, pesos):
+    obtido = frequencias.mais_frequentes_por_grupo(df, grupos if len(grupos) > 1 else grupos[0], 'cid', k=k, pesos=pesos)
+    _comparar(obtido, _referencia(df, grupos, 'cid', k, pesos))
+
+
+def test_empate_fica_com_o_menor_codigo():
+    df = pd.DataFrame({'g': ['a'] * 6 + ['b'] * 2, 'v': ['Z', 'Z', 'M', 'M', 'B', 'B', 'Y', 'X']})
+    obtido = frequencias.mais_frequentes_por_grupo(df, 'g', 'v', k=2)
+    assert obtido['v'].tolist() == ['B', 'M', 'X', 'Y']
+    assert obtido['posicao'].tolist() == [1, 2, 1, 2]
+    assert obtido['participacao'].tolist() == pytest.approx([1 / 3, 1 / 3, 0.5, 0.5])
+
+    # em categóricas o "menor código" segue a ordem das categorias, não a alfabética
+    df['v'] = pd.Categorical(df['v'], categories=['Z', 'Y', 'X', 'M', 'B'])
+    obtido = frequencias.mais_frequentes_por_grupo(df, 'g', 'v', k=2)
+    assert obtido['v'].tolist() == ['Z', 'M', 'Y', 'X']
+    assert obtido['v'].dtype == df['v'].dtype
+
+
+@pytest.mark.parametrize('pesos', [None, 'qtd_aih'])
+def test_ramo_np_unique(df, monkeypatch, pesos):
+    esperado = frequencias.mais_frequentes_por_grupo(df, ['uf', 'cnes'], 'cid', k=4, pesos=pesos)
+    monkeypatch.setattr(frequencias, 'MAX_CELULAS_BINCOUNT', 10)
+    obtido = frequencias.mais_frequentes_por_grupo(df, ['uf', 'cnes'], 'cid', k=4, pesos=pesos)
+    pd.testing.assert_frame_equal(obtido, esperado)
+    _comparar(obtido, _referencia(df, ['uf', 'cnes'], 'cid', 4, pesos))
+
+
+def test_sem_linhas_validas():
+    df = pd.DataFrame({'g': ['a', None], 'v': [None, 'X']})
+    obtido = frequencias.mais_frequentes_por_grupo(df, 'g', 'v', k=3)
+    assert obtido.empty
+    assert list(obtido.columns) == ['g', 'v', 'posicao', 'qtd', 'participacao']
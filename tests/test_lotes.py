@@ -0,0 +1,28 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+import atributos
+import pipeline
+from conftest import ANO
+
+
+def _lotes(sih, tamanho):
+    return atributos.lotes_sih(sih, tamanho)
+
+
+def test_amostra_em_lotes(sih, hospitais, df_ocupacao_diaria):
+    df_combined = pipeline.montar_df_combined(pipeline.filtrar_periodo(sih, inicio_mes=ANO * 100 + 1), df_ocupacao_diaria)
+    chaves = ['id_cnes', 'data', 'dt_saida', 'IDADE', 'cid_principal']
+
+    # sem limite, todas as linhas de df_combined, na mesma ordem
+    _, todas = pipeline.somar_em_lotes(_lotes(sih, 3000), df_ocupacao_diaria, hospitais, inicio=ANO * 10000 + 101, amostra=len(sih))
+    pd.testing.assert_frame_equal(todas[chaves], df_combined[chaves].reset_index(drop=True), check_categorical=False)
+
+    # com limite, um subconjunto sorteado em todos os lotes
+    _, amostra = pipeline.somar_em_lotes(_lotes(sih, 3000), df_ocupacao_diaria, hospitais, inicio=ANO * 10000 + 101, amostra=1000)
+    assert len(amostra) == 1000
+    assert len(amostra.merge(df_combined[chaves].drop_duplicates(), on=chaves)) >= 1000
+    meses = amostra['mes_ano'].value_counts(normalize=True)
+    assert np.all(np.abs(meses - df_combined['mes_ano'].value_counts(normalize=True)[meses.index]) < 0.05)
@@ -0,0 +1,135 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+from imblearn.pipeline import Pipeline as PipelineReamostragem
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import modelos
+
+
+class ModeloEspiao(LogisticRegression):
+    # guarda as classes que chegam ao ajuste, depois das etapas de reamostragem
+    def fit(self, X, y, sample_weight=None):
+        self.classes_ajuste_ = pd.Series(y).value_counts().sort_index()
+        return super().fit(X, y, sample_weight=sample_weight)
+
+
+@pytest.fixture(scope='module')
+def desbalanceado():
+    rng = np.random.default_rng(0)
+    n = 4_000
+    x = pd.DataFrame({'idade': rng.normal(60, 15, n), 'taxa': rng.uniform(0, 120, n)})
+    y = (rng.random(n) < 0.1).astype(np.int64)
+    return x, y
+
+
+def _ajustar(x, y, balanceamento, **kwargs):
+    reamostragem, pesos_classes = modelos.etapas_balanceamento(balanceamento, **kwargs)
+    return PipelineReamostragem([
+        ('escala', StandardScaler()),
+        *reamostragem,
+        ('modelo', ModeloEspiao(class_weight=pesos_classes, max_iter=1000)),
+    ]).fit(x, y)
+
+
+@pytest.mark.parametrize('balanceamento', modelos.BALANCEAMENTOS)
+def test_reamostragem_so_no_ajuste(desbalanceado, balanceamento):
+    x, y = desbalanceado
+    modelo = _ajustar(x, y, balanceamento)
+    classes = modelo.named_steps['modelo'].classes_ajuste_
+    originais = pd.Series(y).value_counts().sort_index()
+
+    if balanceamento == 'pesos':
+        pd.testing.assert_series_equal(classes, originais)
+        assert modelo.named_steps['modelo'].class_weight == 'balanced'
+    else:
+        assert classes[0] == classes[1]
+        assert modelo.named_steps['modelo'].class_weight is None
+    if balanceamento == 'subamostragem':
+        assert classes[1] == originais[1]
+    if balanceamento == 'smote':
+        assert classes[0] == originais[0]
+
+    # a previsão usa as linhas como vieram
+    for parte in (x, x.iloc[:7], x.iloc[:1]):
+        assert modelo.predict_proba(parte).shape == (len(parte), 2)
+        assert modelo.predict(parte).shape == (len(parte),)
+
+
+def test_smote_sobre_amostra_limitada(desbalanceado):
+    x, y = desbalanceado
+    modelo = _ajustar(x, y, 'smote', max_amostras=1_000)
+    classes = modelo.named_steps['modelo'].classes_ajuste_
+    # amostra estratificada de 1000 linhas; o SMOTE completa a minoritária
+    assert classes[0] == classes[1] == round(1_000 * (y == 0).mean())
+    assert modelo.predict_proba(x).shape == (len(x), 2)
+
+
+def test_balanceamento_desconhecido():
+    with pytest.raises(ValueError, match='Balanceamento desconhecido: adasyn'):
+        modelos.etapas_balanceamento('adasyn')
+
+
+@pytest.fixture
+def aihs():
+    return pd.DataFrame({
+        'IDADE': [30.0, 45.0, 60.0, 75.0, 90.0],
+        'taxa': [50.0, 80.0, 95.0, 110.0, 70.0],
+        'MUNICIPIO': ['Patos', 'Sousa', 'Patos', None, 'Cajazeiras'],
+        'DS_TIPO_UNIDADE': ['GERAL', 'GERAL', 'ESPECIALIZADO', 'GERAL', 'MISTA'],
+    })
+
+
+def _codificador():
+    return modelos.CodificadorEsparso(numericas=('IDADE', 'taxa'), categoricas=('MUNICIPIO', 'DS_TIPO_UNIDADE'))
+
+
+def test_codificador_partial_fit_cresce_o_vocabulario(aihs):
+    codificador = _codificador().partial_fit(aihs.iloc[:2])
+    assert codificador.vocabulario_['MUNICIPIO'] == ['Patos', 'Sousa']
+    codificador.partial_fit(aihs.iloc[2:])
+    assert codificador.vocabulario_['MUNICIPIO'] == ['Cajazeiras', 'Patos', 'Sousa']
+    assert codificador.vocabulario_['DS_TIPO_UNIDADE'] == ['ESPECIALIZADO', 'GERAL', 'MISTA']
+
+    # em lotes, as mesmas médias e desvios do ajuste de uma vez; fit recomeça do zero
+    inteiro = _codificador().fit(aihs)
+    for c in ('IDADE', 'taxa'):
+        assert codificador.media_[c] == pytest.approx(aihs[c].mean())
+        assert codificador.desvio_[c] == pytest.approx(aihs[c].std(ddof=0))
+        assert inteiro.desvio_[c] == pytest.approx(codificador.desvio_[c])
+    assert codificador.fit(aihs.iloc[:2]).vocabulario_['MUNICIPIO'] == ['Patos', 'Sousa']
+
+
+def test_codificador_colunas_e_categorias_novas(aihs):
+    codificador = _codificador().fit(aihs)
+    assert codificador.get_feature_names_out().tolist() == [
+        'IDADE', 'taxa', 'MUNICIPIO_Cajazeiras', 'MUNICIPIO_Patos', 'MUNICIPIO_Sousa',
+        'DS_TIPO_UNIDADE_ESPECIALIZADO', 'DS_TIPO_UNIDADE_GERAL', 'DS_TIPO_UNIDADE_MISTA',
+    ]
+    matriz = codificador.transform(aihs).toarray()
+    assert matriz.shape == (5, 8)
+    np.testing.assert_array_equal(matriz[0, 2:], [0, 1, 0, 0, 1, 0])
+    # município ausente: bloco do município zerado
+    np.testing.assert_array_equal(matriz[3, 2:5], 0)
+
+    novas = aihs.assign(MUNICIPIO=['Campina Grande', 'Patos', None, 'Sousa', 'Bayeux'],
+                        DS_TIPO_UNIDADE=['HOSPITAL DIA', 'GERAL', 'GERAL', 'GERAL', 'GERAL'])
+    matriz = codificador.transform(novas).toarray()
+    assert matriz.shape == (5, 8)
+    np.testing.assert_array_equal(matriz[0, 2:], 0)
+    np.testing.assert_array_equal(matriz[4, 2:5], 0)
+    np.testing.assert_array_equal(matriz[:, 2:].sum(axis=1), [0, 2, 1, 2, 1])
+
+
+def test_codificador_salvar_e_carregar_vocabulario(aihs, tmp_path):
+    codificador = _codificador().fit(aihs.iloc[:3])
+    caminho = tmp_path / 'vocabulario.json'
+    codificador.salvar_vocabulario(caminho)
+    carregado = modelos.CodificadorEsparso.carregar_vocabulario(caminho)
+
+    assert carregado.numericas == codificador.numericas and carregado.categoricas == codificador.categoricas
+    assert carregado.get_feature_names_out().tolist() == codificador.get_feature_names_out().tolist()
+    np.testing.assert_array_equal(carregado.transform(aihs).toarray(), codificador.transform(aihs).toarray())
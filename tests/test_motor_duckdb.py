@@ -0,0 +1,69 @@
+# coding: utf-8
+
+# O motor DuckDB (motor_duckdb.py) dá os mesmos resultados do caminho em
+# pandas, lendo o dataset particionado ou um DataFrame já limpo.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import pipeline
+from conftest import ANO
+
+pytest.importorskip('duckdb')
+
+import motor_duckdb  # noqa: E402
+
+INICIO_MES = ANO * 100 + 1
+
+
+@pytest.fixture(scope='module', params=['particionado', 'dataframe'])
+def motor(request, diretorio_dados, sih):
+    fonte = str(diretorio_dados / 'sih') if request.param == 'particionado' else sih
+    return motor_duckdb.MotorDuckDB(fonte, ufs=['PB'], anos=[ANO], ultimo_mes_cmpt=12)
+
+
+@pytest.fixture(scope='module')
+def sih_periodo(sih):
+    return pipeline.filtrar_periodo(sih, inicio_mes=INICIO_MES)
+
+
+def test_ocupacao_diaria(motor, hospitais, df_ocupacao_diaria):
+    pd.testing.assert_frame_equal(motor.montar_ocupacao_diaria(hospitais, inicio=ANO * 10000 + 101), df_ocupacao_diaria)
+
+
+def test_stats(motor, df_ocupacao_diaria, hospitais, sih_periodo):
+    pd.testing.assert_frame_equal(motor.calcular_stats(df_ocupacao_diaria, hospitais, inicio_mes=INICIO_MES),
+                                  pipeline.calcular_stats(df_ocupacao_diaria, sih_periodo, hospitais))
+
+
+def test_cubos(motor, df_ocupacao_diaria, hospitais, sih_periodo):
+    resultado = motor.montar_cubos(df_ocupacao_diaria, hospitais, inicio_mes=INICIO_MES)
+    esperado = pipeline.montar_cubos(df_ocupacao_diaria, sih_periodo, hospitais)
+    pd.testing.assert_frame_equal(resultado['cubo_hospital_mes'], esperado['cubo_hospital_mes'])
+    # no Parquet os CIDs vêm como texto e a categoria só tem os observados
+    pd.testing.assert_frame_equal(resultado['cubo_cids'], esperado['cubo_cids'], check_categorical=False)
+
+
+def test_tipos_unidade(motor, hospitais):
+    pd.testing.assert_series_equal(motor.contar_tipos_unidade(hospitais), pipeline.contar_tipos_unidade(hospitais))
+
+
+def test_consultas_simultaneas_no_mesmo_motor(motor, df_ocupacao_diaria, hospitais, sih_periodo):
+    # no painel o motor é compartilhado entre sessões (st.cache_resource)
+    esperado_stats = pipeline.calcular_stats(df_ocupacao_diaria, sih_periodo, hospitais)
+    esperado_tipos = pipeline.contar_tipos_unidade(hospitais)
+
+    def consultar(i):
+        if i % 2:
+            return motor.calcular_stats(df_ocupacao_diaria, hospitais, inicio_mes=INICIO_MES)
+        return motor.contar_tipos_unidade(hospitais)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(consultar, range(32)))
+    for i, resultado in enumerate(resultados):
+        if i % 2:
+            pd.testing.assert_frame_equal(resultado, esperado_stats)
+        else:
+            pd.testing.assert_series_equal(resultado, esperado_tipos)
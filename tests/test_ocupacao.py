@@ -0,0 +1,50 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+from ocupacao import censo_por_intervalos, ocupacao_diaria
+
+
+def _sih(linhas):
+    return pd.DataFrame(linhas, columns=['id_cnes', 'especialidade_leito', 'dt_internacao', 'dt_saida', 'obito'])
+
+
+def test_censo_conta_internacoes_anteriores_ao_periodo():
+    sih = _sih([
+        (1, 3, 20231230, 20240103, 0),  # aberta desde dezembro: ocupa 1 e 2 de janeiro
+        (1, 2, 20240102, 20240104, 0),
+        (2, 3, 20240101, 20240102, 1),
+    ])
+    censo = censo_por_intervalos(sih, inicio=20240101, fim=20240104, por_especialidade=True)
+    ocupados = censo.set_index(['id_cnes', 'especialidade_leito', 'data'])['leitos_ocupados']
+    assert ocupados.loc[(1, 3)].tolist() == [1, 1, 0, 0]
+    assert ocupados.loc[(1, 2)].tolist() == [0, 1, 1, 0]
+    assert ocupados.loc[(2, 3)].tolist() == [1, 0, 0, 0]
+
+
+def test_censo_por_especialidade_soma_o_censo_do_hospital(sih):
+    por_hospital = ocupacao_diaria(sih, inicio=20240101)
+    fim = int(por_hospital['data'].max())
+    por_especialidade = censo_por_intervalos(sih, inicio=20240101, fim=fim, por_especialidade=True)
+
+    assert por_especialidade['especialidade_leito'].nunique() > 1
+    somado = por_especialidade.groupby(['id_cnes', 'data'])['leitos_ocupados'].sum()
+    esperado = por_hospital.set_index(['id_cnes', 'data'])['leitos_ocupados']
+    pd.testing.assert_series_equal(somado.sort_index(), esperado.sort_index(), check_dtype=False)
+    # sem a quebra, o mesmo censo do hospital
+    sem_quebra = censo_por_intervalos(sih, inicio=20240101, fim=fim).set_index(['id_cnes', 'data'])['leitos_ocupados']
+    pd.testing.assert_series_equal(sem_quebra.sort_index(), esperado.sort_index(), check_dtype=False)
+
+
+def test_censo_especialidade_mensal(sih, df_ocupacao_diaria):
+    censo = pipeline.montar_censo_especialidade(sih, df_ocupacao_diaria, inicio=20240101)
+
+    leito_dias = censo.groupby(['id_cnes', 'mes_ano'])['leito_dias'].sum()
+    esperado = df_ocupacao_diaria.groupby(['id_cnes', 'mes_ano'])['leitos_ocupados'].sum()
+    esperado = esperado[esperado > 0]
+    pd.testing.assert_series_equal(leito_dias.sort_index(), esperado.sort_index(), check_dtype=False, check_names=False)
+
+    dias = df_ocupacao_diaria.groupby(['id_cnes', 'mes_ano']).size()
+    assert np.array_equal(censo['dias'].to_numpy(), dias.loc[list(zip(censo['id_cnes'], censo['mes_ano']))].to_numpy())
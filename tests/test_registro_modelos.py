@@ -0,0 +1,93 @@
+# coding: utf-8
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+import registro_modelos
+from registro_modelos import RegistroModelos
+
+
+@pytest.fixture(scope='module')
+def modelos(df_stats, df_combined):
+    return {
+        'regressao_multipla': pipeline.ajustar_regressao_multipla(df_stats),
+        'logistica_sem_municipio': pipeline.ajustar_logistica_sem_municipio(df_combined, balanceamento='pesos'),
+        'logistica_com_municipio': pipeline.ajustar_logistica_com_municipio(df_combined),
+    }
+
+
+@pytest.mark.parametrize('nome', ['regressao_multipla', 'logistica_sem_municipio', 'logistica_com_municipio'])
+def test_registrar_e_carregar(nome, modelos, df_stats, df_combined, tmp_path):
+    registro = RegistroModelos(str(tmp_path))
+    resultado = modelos[nome]
+    metadados = registro.registrar(nome, resultado, 'abc123')
+    assert metadados['variaveis'] == resultado['variaveis']
+    assert registro.nomes() == [nome]
+
+    carregado = registro.carregar(nome)
+    frame = (df_stats if nome.startswith('regressao') else df_combined)[resultado['variaveis']]
+    original, lido = resultado['pipeline'], carregado['pipeline']
+    np.testing.assert_array_equal(lido.predict(frame), original.predict(frame))
+    if hasattr(original, 'predict_proba'):
+        np.testing.assert_array_equal(lido.predict_proba(frame), original.predict_proba(frame))
+    assert registro.carregar(nome, 'outra') is None
+
+
+@pytest.mark.parametrize('tamanho_lote', [1, 7, 1000, 10 ** 9])
+def test_pontuar_em_lotes_igual_a_inteiro(modelos, df_combined, tamanho_lote):
+    frame = df_combined.iloc[:2500]
+    for nome in ('logistica_sem_municipio', 'logistica_com_municipio'):
+        inteiro = registro_modelos.pontuar(modelos[nome], frame)
+        assert inteiro.shape == (len(frame),) and ((inteiro >= 0) & (inteiro <= 1)).all()
+        np.testing.assert_allclose(registro_modelos.pontuar(modelos[nome], frame, tamanho_lote=tamanho_lote), inteiro,
+                                   rtol=1e-12, atol=1e-15)
+
+
+def test_metadados_da_entrada_mais_recente(modelos, tmp_path):
+    registro = RegistroModelos(str(tmp_path))
+    # registros no mesmo segundo: treinado_em tem microssegundos
+    for impressao in ['a', 'b', 'c']:
+        registro.registrar('regressao_multipla', modelos['regressao_multipla'], impressao)
+        assert registro.metadados('regressao_multipla')['impressao'] == impressao
+    assert registro.metadados('regressao_multipla', 'a')['impressao'] == 'a'
+    assert registro.metadados('logistica_sem_municipio') is None
+    assert len(registro.listar()) == 3
+
+
+def test_empate_em_treinado_em_fica_com_o_ultimo_gravado(modelos, tmp_path):
+    # entradas antigas, com treinado_em em segundos
+    registro = RegistroModelos(str(tmp_path))
+    for segundos, impressao in enumerate(['b', 'a', 'c']):
+        registro.registrar('regressao_multipla', modelos['regressao_multipla'], impressao)
+        caminho = tmp_path / 'regressao_multipla' / f'{impressao}.json'
+        metadados = json.loads(caminho.read_text(encoding='utf-8'))
+        metadados['treinado_em'] = '2024-06-01T12:00:00'
+        caminho.write_text(json.dumps(metadados), encoding='utf-8')
+        os.utime(caminho, ns=(10 ** 18 + segundos * 10 ** 9,) * 2)
+    assert registro.metadados('regressao_multipla')['impressao'] == 'c'
+
+
+def test_pontuar_modelos_sem_as_variaveis(modelos, df_stats, df_combined):
+    # sem `nomes`, só os modelos cujas variáveis estão no frame
+    aihs = registro_modelos.pontuar_modelos(modelos, df_combined.iloc[:100])
+    assert list(aihs.columns) == ['logistica_sem_municipio', 'logistica_com_municipio']
+    hospitais = registro_modelos.pontuar_modelos(modelos, df_stats)
+    assert list(hospitais.columns) == ['regressao_multipla']
+    pd.testing.assert_index_equal(hospitais.index, df_stats.index)
+
+    with pytest.raises(ValueError, match='Faltam variáveis para regressao_multipla'):
+        registro_modelos.pontuar_modelos(modelos, df_combined.iloc[:100], nomes=['regressao_multipla'])
+
+
+def test_registro_pontuar(modelos, df_stats, tmp_path):
+    registro = RegistroModelos(str(tmp_path))
+    registro.registrar('regressao_multipla', modelos['regressao_multipla'], 'abc')
+    np.testing.assert_array_equal(registro.pontuar(df_stats)['regressao_multipla'],
+                                  registro_modelos.pontuar(modelos['regressao_multipla'], df_stats))
+    with pytest.raises(ValueError, match='Modelo não registrado'):
+        registro.pontuar(df_stats, nomes=['regressao_simples'])
@@ -0,0 +1,77 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import resumo
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        'tipo_unidade': rng.choice(['GERAL', 'ESPECIALIZADO', 'MISTA'], n),
+        'a': rng.lognormal(size=n),
+        'b': rng.integers(0, 5, n).astype(np.float64),
+        'vazia': np.nan,
+    })
+    df.loc[rng.choice(n, 30, replace=False), 'a'] = np.nan
+    # grupo com uma única linha: desvio NaN
+    df.loc[0, 'tipo_unidade'] = 'UNICA'
+    df.loc[0, ['a', 'b']] = [1.0, 2.0]
+    return df
+
+
+def _referencia(valores, fator_iqr=1.5):
+    valores = valores.dropna()
+    q25, q75 = valores.quantile(0.25), valores.quantile(0.75)
+    inferior, superior = q25 - fator_iqr * (q75 - q25), q75 + fator_iqr * (q75 - q25)
+    return {
+        'n': len(valores), 'media': valores.mean(), 'desvio': valores.std(), 'minimo': valores.min(),
+        'q05': valores.quantile(0.05), 'q25': q25, 'mediana': valores.median(), 'q75': q75, 'q95': valores.quantile(0.95),
+        'maximo': valores.max(), 'iqr': q75 - q25, 'limite_inferior': inferior, 'limite_superior': superior,
+        'mad': (valores - valores.median()).abs().median(),
+        'n_outliers': int(((valores < inferior) | (valores > superior)).sum()),
+    }
+
+
+def test_resumir_igual_ao_pandas(df):
+    tabela = resumo.resumir(df, colunas=['a', 'b', 'vazia'], por=['tipo_unidade'])
+    # coluna sem valores não gera linhas
+    assert 'vazia' not in set(tabela['coluna'])
+
+    esperado = [('Todos', 'Todos', coluna, _referencia(df[coluna])) for coluna in ['a', 'b']]
+    esperado += [('tipo_unidade', grupo, coluna, _referencia(parte[coluna]))
+                 for grupo, parte in df.groupby('tipo_unidade') for coluna in ['a', 'b']]
+    assert len(tabela) == len(esperado)
+    for agrupamento, grupo, coluna, referencia in esperado:
+        linha = tabela[(tabela['agrupamento'] == agrupamento) & (tabela['grupo'] == grupo) & (tabela['coluna'] == coluna)]
+        assert len(linha) == 1
+        for medida, valor in referencia.items():
+            obtido = linha[medida].iloc[0]
+            if pd.isna(valor):
+                assert pd.isna(obtido), (grupo, coluna, medida)
+            else:
+                assert obtido == pytest.approx(valor, rel=1e-12, abs=1e-12), (grupo, coluna, medida)
+
+    unica = tabela[tabela['grupo'] == 'UNICA']
+    assert (unica['n'] == 1).all() and unica['desvio'].isna().all()
+
+
+def test_mascara_outliers_pelos_limites(df):
+    tabela = resumo.resumir(df, colunas=['a', 'b'], por=['tipo_unidade'])
+    for agrupamento in ['Todos', 'tipo_unidade']:
+        mascara = resumo.mascara_outliers(df, tabela, agrupamento=agrupamento)
+        limites = tabela[tabela['agrupamento'] == agrupamento]
+        grupos = pd.Series('Todos', index=df.index) if agrupamento == 'Todos' else df['tipo_unidade']
+        for coluna in ['a', 'b']:
+            por_grupo = limites[limites['coluna'] == coluna].set_index('grupo')
+            inferior = grupos.map(por_grupo['limite_inferior'])
+            superior = grupos.map(por_grupo['limite_superior'])
+            esperado = (df[coluna] < inferior) | (df[coluna] > superior)
+            pd.testing.assert_series_equal(mascara[coluna], esperado, check_names=False)
+            # NaN nunca é outlier; a contagem bate com n_outliers
+            assert not mascara.loc[df[coluna].isna(), coluna].any()
+            assert mascara[coluna].groupby(grupos).sum().sort_index().tolist() == por_grupo['n_outliers'].sort_index().tolist()